@@ -16,7 +16,7 @@ class AiExtractionService
 
   # Check if AI service is available
   def health_check
-    response = self.class.get('/health', @options)
+    response = self.class.get('/health', default_options)
     if response.success?
       result = response.parsed_response
       Rails.logger.info "AI Service health: #{result['status']} (#{result['mode']})"
@@ -32,7 +32,7 @@ class AiExtractionService
 
   # Get available AI providers (Ollama + Basic)
   def available_providers
-    response = self.class.get('/ai-providers', @options)
+    response = self.class.get('/ai-providers', default_options)
     if response.success?
       result = response.parsed_response
       Rails.logger.info "Available AI providers: #{result['providers'].keys.join(', ')}"
@@ -63,6 +63,7 @@ class AiExtractionService
     File.open(file_path, 'rb') do |file|
       response = self.class.post('/extract/text', {
         body: { file: file },
+        headers: tenant_headers,
         timeout: 60
       })
       
@@ -108,6 +109,7 @@ class AiExtractionService
           file: file,
           provider: provider
         },
+        headers: request_headers(timeout),
         timeout: timeout
       })
       
@@ -151,7 +153,7 @@ class AiExtractionService
         job_description: job_description,
         provider: provider
       }.to_json,
-      **@options,
+      headers: @options[:headers].merge(request_headers(timeout)),
       timeout: timeout
     })
     
@@ -194,6 +196,7 @@ class AiExtractionService
           job_description: job_description,
           provider: provider
         },
+        headers: tenant_headers,
         timeout: 30
       })
       
@@ -211,7 +214,7 @@ class AiExtractionService
 
   # Check async job status
   def job_status(job_id)
-    response = self.class.get("/job/#{job_id}/status", @options)
+    response = self.class.get("/job/#{job_id}/status", default_options)
     response.success? ? response.parsed_response : nil
   rescue => e
     Rails.logger.error "Job status check failed: #{e.message}"
@@ -220,6 +223,21 @@ class AiExtractionService
 
   private
 
+  # Lets the AI service schedule LLM capacity fairly between tenants.
+  # Read per request: one service instance can outlive an Apartment::Tenant.switch
+  def tenant_headers
+    { 'X-Tenant-Id' => Apartment::Tenant.current.to_s }
+  end
+
+  def default_options
+    @options.merge(headers: @options[:headers].merge(tenant_headers))
+  end
+
+  # Our timeout, so the AI service can pick a cheaper quality tier rather than run past it
+  def request_headers(timeout)
+    tenant_headers.merge('X-Request-Timeout-Ms' => (timeout * 1000).to_s)
+  end
+
   def handle_file_upload(file_path)
     # Ensure file exists and is readable
     unless File.exist?(file_path) && File.readable?(file_path)
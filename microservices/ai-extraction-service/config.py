@@ -8,6 +8,11 @@ class Settings:
     
     # Service URLs
     OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    OLLAMA_BASE_URLS: List[str] = [url.strip() for url in os.getenv("OLLAMA_BASE_URLS", "").split(",") if url.strip()] or [OLLAMA_BASE_URL]  # model servers to balance across
+    OLLAMA_HEALTH_INTERVAL: float = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))  # seconds between /api/tags probes of each server
+    OLLAMA_HEALTH_TIMEOUT: float = float(os.getenv("OLLAMA_HEALTH_TIMEOUT", "3"))  # seconds
+    OLLAMA_EJECT_AFTER_FAILURES: int = int(os.getenv("OLLAMA_EJECT_AFTER_FAILURES", "3"))  # consecutive failed requests or probes
+    OLLAMA_READMIT_AFTER_PROBES: int = int(os.getenv("OLLAMA_READMIT_AFTER_PROBES", "2"))  # consecutive good probes before an ejected server gets traffic again
     HUGGINGFACE_BASE_URL: str = os.getenv("HUGGINGFACE_BASE_URL", "https://api-inference.huggingface.co/models")
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
     
@@ -23,19 +28,97 @@ class Settings:
     
     # File Processing
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
+    PREFLIGHT_SNIFF_BYTES: int = 8192  # first chunk read to identify the file type
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # uploads are spooled to disk in chunks of this size
     ALLOWED_FILE_TYPES: List[str] = [
         "application/pdf",
         "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
     ]
+    PDF_BACKEND: str = os.getenv("PDF_BACKEND", "pypdf2")  # see services/pdf_backends.py
+    PDF_PAGES_PER_TASK: int = int(os.getenv("PDF_PAGES_PER_TASK", "4"))  # first range read, and the fewest pages handed to a pool process
+    PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))  # smaller PDFs parse in one task
+    DOCX_STREAMING: bool = os.getenv("DOCX_STREAMING", "true").lower() == "true"  # false = python-docx only
+    
+    # Responses
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes; smaller bodies go out as-is
     
     # AI Processing
     DEFAULT_AI_PROVIDER: str = "auto"
     AI_TIMEOUT: int = 60  # seconds
     MAX_TEXT_LENGTH: int = 10000  # characters
+    MATCH_SCORING: str = os.getenv("MATCH_SCORING", "keyword")  # keyword | semantic (needs EMBEDDING_MODEL pulled)
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))  # cached vectors
+    SEMANTIC_MATCH_THRESHOLD: float = float(os.getenv("SEMANTIC_MATCH_THRESHOLD", "0.6"))  # cosine similarity that counts as covered
+    EXTRACTION_LATENCY_SLO_MS: int = int(os.getenv("EXTRACTION_LATENCY_SLO_MS", "30000"))  # model routing target per task
+    ENHANCEMENT_LATENCY_SLO_MS: int = int(os.getenv("ENHANCEMENT_LATENCY_SLO_MS", "45000"))
+    EXTRACTION_SIMPLE_MAX_TOKENS: int = int(os.getenv("EXTRACTION_SIMPLE_MAX_TOKENS", "800"))  # smaller inputs use the smallest model within SLO
+    ENHANCEMENT_SIMPLE_MAX_TOKENS: int = int(os.getenv("ENHANCEMENT_SIMPLE_MAX_TOKENS", "600"))
+    ROUTING_MODEL_FAMILIES: List[str] = [family for family in os.getenv("ROUTING_MODEL_FAMILIES", "llama3.2,llama3.1,llama2,mistral,phi3,gemma").split(",") if family]  # empty = any pulled model
+    ROUTING_PRIOR_TOKENS_PER_SEC_GB: float = float(os.getenv("ROUTING_PRIOR_TOKENS_PER_SEC_GB", "40"))  # assumed generate speed x model size until measured
+    ROUTING_TABLE_TTL: int = int(os.getenv("ROUTING_TABLE_TTL", "60"))  # seconds to cache model list and routing decisions
+    LLM_PARALLEL_SLOTS: int = int(os.getenv("LLM_PARALLEL_SLOTS", "4"))  # generations in flight per model, server and worker; match OLLAMA_NUM_PARALLEL / workers
+    TENANT_WEIGHTS: str = os.getenv("TENANT_WEIGHTS", "")  # fair-queuing share of LLM slots, e.g. "acme=3,bulk=0.5"; unlisted tenants weigh 1
+    TENANT_MAX_CONCURRENCY: str = os.getenv("TENANT_MAX_CONCURRENCY", "")  # generations in flight per tenant and worker, e.g. "bulk=1"
+    TENANT_DEFAULT_MAX_CONCURRENCY: int = int(os.getenv("TENANT_DEFAULT_MAX_CONCURRENCY", "0"))  # for unlisted tenants; 0 = unlimited
+    TENANT_RATE_PER_MINUTE: str = os.getenv("TENANT_RATE_PER_MINUTE", "")  # generations started per minute per tenant and worker, e.g. "bulk=30"
+    TENANT_DEFAULT_RATE_PER_MINUTE: float = float(os.getenv("TENANT_DEFAULT_RATE_PER_MINUTE", "0"))  # for unlisted tenants; 0 = unlimited
+    QUALITY_TIERS: bool = os.getenv("QUALITY_TIERS", "true").lower() == "true"  # degrade to a smaller model / basic extraction when the LLM can't meet the deadline
+    QUALITY_DEADLINE_HEADROOM: float = float(os.getenv("QUALITY_DEADLINE_HEADROOM", "0.8"))  # share of the time left an LLM call may be expected to take
+    QUALITY_UPGRADE_QUEUE_SIZE: int = int(os.getenv("QUALITY_UPGRADE_QUEUE_SIZE", "100"))  # degraded extractions re-run at full quality when idle; 0 = never
+    QUALITY_UPGRADE_POLL_SECONDS: float = float(os.getenv("QUALITY_UPGRADE_POLL_SECONDS", "1"))
+    QUALITY_PROBE_SECONDS: float = float(os.getenv("QUALITY_PROBE_SECONDS", "30"))  # run the full tier at least this often even when degraded, so its latency estimate recovers; 0 = never
+    LLM_EARLY_STOP: bool = os.getenv("LLM_EARLY_STOP", "true").lower() == "true"  # cancel JSON generations once the object closes
+    LLM_ADAPTIVE_NUM_PREDICT: bool = os.getenv("LLM_ADAPTIVE_NUM_PREDICT", "true").lower() == "true"  # size num_predict from observed output lengths
+    VECTOR_INDEX_DIR: str = os.getenv("VECTOR_INDEX_DIR", "")  # persistent resume/JD index for /match search; empty = disabled
+    MATCH_TOP_K: int = int(os.getenv("MATCH_TOP_K", "10"))
+    MATCH_MAX_K: int = int(os.getenv("MATCH_MAX_K", "100"))  # largest k a /match search may ask for
+    ENHANCEMENT_CACHE_SIZE: int = int(os.getenv("ENHANCEMENT_CACHE_SIZE", "5000"))  # cached resume sections
+    ENHANCEMENT_CACHE_TTL: int = int(os.getenv("ENHANCEMENT_CACHE_TTL", "86400"))  # seconds
+    
+    # Document store (extracted text referenced by job_id / content hash)
+    DOCUMENT_STORE_SIZE: int = int(os.getenv("DOCUMENT_STORE_SIZE", "2000"))  # documents kept in memory per worker
+    DOCUMENT_STORE_TTL: int = int(os.getenv("DOCUMENT_STORE_TTL", "3600"))  # seconds
+    DOCUMENT_STORE_REDIS: bool = os.getenv("DOCUMENT_STORE_REDIS", "false").lower() == "true"  # share via REDIS_URL
+    NEAR_DUPLICATE_REUSE: bool = os.getenv("NEAR_DUPLICATE_REUSE", "true").lower() == "true"  # reuse results of lightly edited resubmissions
+    NEAR_DUPLICATE_THRESHOLD: float = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))  # estimated Jaccard similarity of word 3-grams
+    NEAR_DUPLICATE_MAX_CHANGED_LINES: int = int(os.getenv("NEAR_DUPLICATE_MAX_CHANGED_LINES", "8"))  # more lines edited than this get a fresh extraction (added or removed lines always do)
+    NEAR_DUPLICATE_INDEX_SIZE: int = int(os.getenv("NEAR_DUPLICATE_INDEX_SIZE", "2000"))  # signatures kept per worker
+    
+    # Completion callbacks
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")  # HMAC key shared with the callback receiver; empty = callback_url refused
+    WEBHOOK_ALLOWED_HOSTS: List[str] = [host for host in os.getenv("WEBHOOK_ALLOWED_HOSTS", "").split(",") if host]  # only these hosts (internal ones included); empty = any host resolving to public addresses
+    WEBHOOK_SPOOL_DIR: str = os.getenv("WEBHOOK_SPOOL_DIR", "/tmp/ai-service-webhooks")  # pending deliveries
+    WEBHOOK_TIMEOUT: int = int(os.getenv("WEBHOOK_TIMEOUT", "10"))  # seconds per delivery attempt
+    WEBHOOK_MAX_ATTEMPTS: int = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+    WEBHOOK_BACKOFF_BASE: float = float(os.getenv("WEBHOOK_BACKOFF_BASE", "2"))  # seconds, doubled per attempt
+    WEBHOOK_BACKOFF_MAX: float = float(os.getenv("WEBHOOK_BACKOFF_MAX", "300"))  # seconds
+    WEBHOOK_CONCURRENCY: int = int(os.getenv("WEBHOOK_CONCURRENCY", "4"))  # deliveries in flight per worker
+    
+    # Tracing (W3C traceparent accepted from callers; spans exported off the request path)
+    TRACE_FILE: str = os.getenv("TRACE_FILE", "")  # append finished spans as JSON lines; empty = off
+    TRACE_OTLP_ENDPOINT: str = os.getenv("TRACE_OTLP_ENDPOINT", "")  # OTLP/HTTP JSON, e.g. http://otel-collector:4318/v1/traces
+    TRACE_SAMPLE_RATIO: float = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))  # new traces only; a caller's sampled flag wins
+    TRACE_EXPORT_INTERVAL: float = float(os.getenv("TRACE_EXPORT_INTERVAL", "5"))  # seconds
+    TRACE_BUFFER_SIZE: int = int(os.getenv("TRACE_BUFFER_SIZE", "10000"))  # spans awaiting export; oldest dropped beyond this
+    
+    # Debugging (GET /debug/profile)
+    DEBUG_PROFILE_TOKEN: str = os.getenv("DEBUG_PROFILE_TOKEN", "")  # required in X-Debug-Token; empty = endpoint disabled
+    DEBUG_PROFILE_MAX_SECONDS: float = float(os.getenv("DEBUG_PROFILE_MAX_SECONDS", "60"))
+    DEBUG_PROFILE_INTERVAL_MS: float = float(os.getenv("DEBUG_PROFILE_INTERVAL_MS", "10"))  # stack sampling interval
+    DEBUG_PROFILE_ALLOC_FRAMES: int = int(os.getenv("DEBUG_PROFILE_ALLOC_FRAMES", "25"))  # traceback depth kept per allocation
     
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     
+    # Production server (gunicorn.conf.py)
+    SERVER_WORKERS: int = int(os.getenv("WEB_CONCURRENCY", "0"))  # 0 = one per available CPU
+    PARSE_POOL_SIZE: int = int(os.getenv("PARSE_POOL_SIZE", "0"))  # processes per worker, 0 = parse inline
+    GRACEFUL_TIMEOUT: int = int(os.getenv("GRACEFUL_TIMEOUT", "130"))  # seconds, longer than the slowest LLM call
+    
+    # Startup
+    IMPORT_TIME_BUDGET_MS: int = int(os.getenv("IMPORT_TIME_BUDGET_MS", "1200"))  # cold `import main` budget; measures 0.7-1.0 s, about 0.6 s of it FastAPI itself
+    
     # Service Info
     SERVICE_NAME: str = "ai-extraction-service"
     SERVICE_VERSION: str = "1.0.0"
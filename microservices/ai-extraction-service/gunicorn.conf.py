@@ -0,0 +1,35 @@
+"""Production launcher: `gunicorn -c gunicorn.conf.py main:app`
+
+The app (and its parsers and keyword tables) is loaded once in the master and
+forked into a CPU-aware number of uvicorn workers. Each worker lazily starts
+its own parse process pool. SIGTERM stops accepting connections and lets
+in-flight requests finish for up to GRACEFUL_TIMEOUT seconds.
+"""
+import gc
+
+from config import settings
+from services.parse_pool import available_cpus, configure_parse_pool, shutdown_parse_pool
+from services.startup import preload_for_fork
+
+bind = f"0.0.0.0:{settings.SERVICE_PORT}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = settings.SERVER_WORKERS or available_cpus()
+preload_app = True
+graceful_timeout = settings.GRACEFUL_TIMEOUT
+timeout = settings.GRACEFUL_TIMEOUT
+keepalive = 5
+accesslog = "-"
+
+def on_starting(server):
+    preload_for_fork()
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the GC's reach so collections in
+    # the workers don't touch (and copy) the shared pages
+    gc.freeze()
+
+def post_fork(server, worker):
+    configure_parse_pool(settings.PARSE_POOL_SIZE or max(1, available_cpus() // workers))
+
+def worker_exit(server, worker):
+    shutdown_parse_pool()
@@ -1,46 +1,60 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
+from services.startup import startup_timer, lazy_import, configure_logging
+from fastapi import FastAPI, File, Form, Header, UploadFile, HTTPException, BackgroundTasks, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
-import tempfile
+import hmac
 import os
 import uuid
+from urllib.parse import urlparse
 import structlog
 from datetime import datetime
 
+startup_timer.mark("framework_imports")
+
 from services.pdf_extractor import PDFExtractor
 from services.ai_processor import AIProcessor
 from services.content_enhancer import ContentEnhancer
+from services.compression import CompressionMiddleware
+from services.preflight import receive_upload, PreflightError, FILE_TYPE_MIME, UploadLimitMiddleware
+from services.vector_index import MatchIndex
+from services.webhooks import WebhookDispatcher, CallbackNotAllowed, check_callback_url
+from services.model_router import model_router
+from services.ollama_pool import ollama_pool
+from services.ollama_stream import token_budget
+from services.llm_batcher import generation_batcher
+from services.combined_processor import CombinedProcessor
+from services.document_store import DocumentStore
+from services.job_status import JobStatusStore
+from services.near_duplicates import NearDuplicateIndex, apply_basic_diff, edited_line_count
+from services.resume_sections import content_hash
+from services.quality_tiers import DeadlineMiddleware, forced_tier, quality_planner, quality_upgrades, request_deadline
+from services.tenancy import TenantMiddleware
+from services.tracing import TracingMiddleware, tracer
+from services.profiler import profiler, ProfileBusyError
 from config import settings
-from models.extraction_models import ExtractionRequest, ExtractionResponse, EnhancementRequest
+from models.extraction_models import ExtractionRequest, ExtractionResponse, EnhancementRequest, MatchRequest, IndexRequest, MatchSearchRequest
+from models.response_profiles import select_fields, validate_profile
+
+startup_timer.mark("service_imports")
 
 # Configure structured logging
-structlog.configure(
-    processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
-    ],
-    context_class=dict,
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    wrapper_class=structlog.stdlib.BoundLogger,
-    cache_logger_on_first_use=True,
-)
+configure_logging()
+startup_timer.mark("logging")
 
 logger = structlog.get_logger()
 
 app = FastAPI(
     title="AI Resume Extraction Service",
     description="Microservice for AI-powered resume parsing and enhancement",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+# Refuse oversized uploads from Content-Length, before the body is received; inside CORS so browsers see the 413
+app.add_middleware(UploadLimitMiddleware)
+
 # CORS middleware for frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -50,10 +64,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (full resume text, batch results) with brotli or gzip
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+
+# Caller's timeout from X-Request-Timeout-Ms; LLM calls degrade to a cheaper quality tier to meet it
+app.add_middleware(DeadlineMiddleware)
+
+# Tenant from X-Tenant-Id; scheduling, logs and the root span are per tenant
+app.add_middleware(TenantMiddleware)
+
+# Outermost, so the root span covers compression and continues the caller's traceparent
+app.add_middleware(TracingMiddleware)
+
 # Initialize services
 pdf_extractor = PDFExtractor()
 ai_processor = AIProcessor()
 content_enhancer = ContentEnhancer()
+combined_processor = CombinedProcessor(ai_processor, content_enhancer)
+document_store = DocumentStore()
+job_status = JobStatusStore()
+# Signatures of freshly extracted resumes; their results live in the document store
+near_duplicates = NearDuplicateIndex() if settings.NEAR_DUPLICATE_REUSE else None
+# Memory-mapped, so opening even a large index is instant; shares the enhancer's embedding cache
+match_index = MatchIndex(settings.VECTOR_INDEX_DIR, content_enhancer.embedder) if settings.VECTOR_INDEX_DIR else None
+webhooks = WebhookDispatcher()
+
+startup_timer.mark("service_init")
+
+@app.on_event("startup")
+async def record_startup():
+    """Record the time until the app is ready to serve"""
+    await webhooks.start()
+    await tracer.start()
+    await quality_upgrades.start()
+    await ollama_pool.start()
+    if match_index is not None:
+        await match_index.load()
+    startup_timer.mark_ready()
+    logger.info("Service ready", **startup_timer.summary())
+
+@app.on_event("shutdown")
+async def stop_webhooks():
+    await webhooks.stop()
+    await quality_upgrades.stop()
+    await ollama_pool.stop()
+    await tracer.stop()
 
 @app.get("/health")
 async def health_check():
@@ -65,11 +120,40 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/health/startup")
+async def startup_timing():
+    """Startup-timing breakdown, including modules imported lazily since boot"""
+    return startup_timer.summary()
+
 @app.get("/ai-providers")
 async def get_ai_providers():
     """Get available AI providers and their status"""
     return await ai_processor.get_provider_status()
 
+@app.get("/models/routing")
+async def model_routing():
+    """Routable Ollama models, observed throughput, cached routing decisions, adaptive token caps, batching, quality tiers and servers"""
+    await model_router.available_models()
+    return dict(
+        model_router.stats(),
+        token_budgets=token_budget.stats(),
+        batching=generation_batcher.stats(),
+        quality=quality_planner.stats(),
+        servers=ollama_pool.stats()
+    )
+
+async def _receive_upload(file: UploadFile, job_id: str):
+    """Run upload pre-flight, turning rejections into 4xx responses"""
+    with tracer.span("upload", job_id=job_id) as span:
+        try:
+            tmp_file_path, file_type = await receive_upload(file)
+        except PreflightError as e:
+            logger.warning("Upload rejected in pre-flight", job_id=job_id, filename=file.filename, reason=e.detail)
+            span.set_attributes(rejected=e.detail)
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        span.set_attributes(file_type=file_type, bytes=os.path.getsize(tmp_file_path))
+        return tmp_file_path, file_type
+
 @app.post("/extract/text", response_model=Dict[str, Any])
 async def extract_text_from_file(
     file: UploadFile = File(...),
@@ -83,39 +167,33 @@ async def extract_text_from_file(
     
     logger.info("Starting text extraction", job_id=job_id, filename=file.filename)
     
+    # Validate the file from its content (not the client's content type) and save it temporarily
+    tmp_file_path, file_type = await _receive_upload(file, job_id)
+    
     try:
-        # Validate file type
-        if not file.content_type in ['application/pdf', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document']:
-            raise HTTPException(status_code=400, detail="Unsupported file type")
-        
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
-        
         try:
             # Extract text based on file type
-            if file.content_type == 'application/pdf':
-                extracted_text = await pdf_extractor.extract_from_pdf(tmp_file_path)
-            else:
-                extracted_text = await pdf_extractor.extract_from_docx(tmp_file_path)
+            extraction = await pdf_extractor.extract_text(tmp_file_path, file_type)
+            extracted_text = extraction["text"]
+            document_ref = await document_store.put(extracted_text, job_id=job_id)
             
             response = {
                 "job_id": job_id,
                 "success": True,
                 "extracted_text": extracted_text,
+                "document_ref": document_ref,
                 "file_info": {
                     "filename": file.filename,
                     "size": file.size,
-                    "content_type": file.content_type
+                    "content_type": FILE_TYPE_MIME[file_type]
                 },
                 "extraction_method": "text_only",
+                "extraction_stats": extraction["metadata"],
                 "timestamp": datetime.utcnow().isoformat()
             }
             
             logger.info("Text extraction completed", job_id=job_id, text_length=len(extracted_text))
-            return response
+            return ORJSONResponse(response)
             
         finally:
             # Clean up temporary file
@@ -125,76 +203,368 @@ async def extract_text_from_file(
         logger.error("Text extraction failed", job_id=job_id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
 
+async def _validate_callback_url(callback_url: Optional[str]) -> None:
+    if callback_url is None:
+        return
+    # Unsigned (empty-key) callbacks could be forged, so none are sent without a secret
+    if not settings.WEBHOOK_SECRET:
+        raise HTTPException(status_code=400, detail="Callbacks are disabled: WEBHOOK_SECRET is not configured")
+    try:
+        await check_callback_url(callback_url)
+    except CallbackNotAllowed as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError:
+        raise HTTPException(status_code=400, detail=f"callback_url host '{urlparse(callback_url).hostname}' cannot be resolved")
+
+async def _run_with_callback(event: str, job_id: Optional[str], callback_url: str, work):
+    """Background half of a callback request: run the job and queue its result (or error) for delivery"""
+    # The caller stopped waiting at the 202; its timeout no longer bounds the work
+    request_deadline.set(None)
+    forced_tier.set("full")
+    try:
+        payload = await work()
+        webhooks.enqueue(callback_url, f"{event}.completed", payload)
+    except Exception as e:
+        logger.error(f"{event.capitalize()} failed", job_id=job_id, error=str(e))
+        webhooks.enqueue(callback_url, f"{event}.failed", {"job_id": job_id, "success": False, "error": str(e)})
+
+def _accepted(job_id: Optional[str], callback_url: str) -> ORJSONResponse:
+    return ORJSONResponse(
+        {"job_id": job_id, "success": True, "status": "accepted", "callback_url": callback_url},
+        status_code=202
+    )
+
 @app.post("/extract/structured", response_model=ExtractionResponse)
 async def extract_structured_data(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     job_id: Optional[str] = None,
-    ai_provider: Optional[str] = "auto"
+    ai_provider: Optional[str] = "auto",
+    profile: str = "full",
+    fields: Optional[str] = None,
+    callback_url: Optional[str] = None,
+    progressive: bool = False
 ):
-    """Extract structured resume data using AI processing"""
+    """Extract structured resume data using AI processing
+    
+    `profile` (minimal, structured, full) or a comma-separated `fields` list of
+    dotted paths (e.g. `structured_data.skills`) trims the response. When the
+    vector index is enabled the resume is indexed under `job_id` after responding.
+    With `callback_url` the request returns 202 right after the upload check and
+    the (trimmed) result is POSTed to the callback, signed with WEBHOOK_SECRET.
+    
+    With `progressive=true` the response comes right after parsing, with the
+    basic extraction and a `refinement_job_id`; the model's extraction runs
+    afterwards and is published at /job/{refinement_job_id}/status and, with
+    `callback_url`, POSTed as an extraction.refined event.
+    """
     
     if not job_id:
         job_id = str(uuid.uuid4())
     
+    try:
+        validate_profile(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await _validate_callback_url(callback_url)
+    
     logger.info("Starting structured extraction", job_id=job_id, filename=file.filename, ai_provider=ai_provider)
     
-    try:
-        # First extract text
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
-        
+    tmp_file_path, file_type = await _receive_upload(file, job_id)
+    file_info = {
+        "filename": file.filename,
+        "size": file.size,
+        "content_type": FILE_TYPE_MIME[file_type]
+    }
+    
+    async def extract():
         try:
-            # Extract text
-            if file.content_type == 'application/pdf':
-                extracted_text = await pdf_extractor.extract_from_pdf(tmp_file_path)
+            payload, extracted_text, name = await _extract_structured(tmp_file_path, file_type, file_info, job_id, ai_provider, callback_url, progressive)
+        finally:
+            os.unlink(tmp_file_path)
+        if payload.get("refinement_job_id"):
+            background_tasks.add_task(_refine_extraction, payload["refinement_job_id"], extracted_text, job_id, ai_provider, callback_url)
+        if match_index is not None:
+            meta = {"filename": file.filename, "name": name}
+            if callback_url:
+                await _index_document("resume", job_id, extracted_text, meta)  # already off the request path
             else:
-                extracted_text = await pdf_extractor.extract_from_docx(tmp_file_path)
-            
-            # Process with AI
-            structured_data = await ai_processor.process_resume(
-                text=extracted_text,
-                provider=ai_provider,
-                job_id=job_id
-            )
-            
-            response = ExtractionResponse(
-                job_id=job_id,
-                success=True,
-                original_text=extracted_text,
-                structured_data=structured_data,
-                file_info={
-                    "filename": file.filename,
-                    "size": file.size,
-                    "content_type": file.content_type
-                },
-                ai_provider=structured_data.get("provider_used", ai_provider),
-                timestamp=datetime.utcnow().isoformat()
+                background_tasks.add_task(_index_document, "resume", job_id, extracted_text, meta)
+        # Already validated as ExtractionResponse; render directly
+        # instead of letting FastAPI re-validate and re-encode it
+        return select_fields(payload, profile, fields)
+    
+    # Progressive requests answer now with the basic result; the callback only gets the refinement
+    if callback_url and not progressive:
+        background_tasks.add_task(_run_with_callback, "extraction", job_id, callback_url, extract)
+        return _accepted(job_id, callback_url)
+    
+    try:
+        return ORJSONResponse(await extract())
+    except Exception as e:
+        logger.error("Structured extraction failed", job_id=job_id, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
+
+async def _extract_structured(
+    tmp_file_path: str,
+    file_type: str,
+    file_info: Dict[str, Any],
+    job_id: str,
+    ai_provider: Optional[str],
+    callback_url: Optional[str] = None,
+    progressive: bool = False
+):
+    """Extract text and structure it; returns (response payload, extracted text, candidate name)
+    
+    A result degraded under load is re-run at full quality once the LLM is
+    idle; the upgrade replaces it in the document store and, with a
+    callback_url, is delivered as an extraction.upgraded webhook.
+    `progressive` structures with the basic extractor only and queues a
+    refinement job, whose id the payload carries; the caller starts it.
+    """
+    # First extract text
+    if file_type == "pdf":
+        extracted_text = await pdf_extractor.extract_from_pdf(tmp_file_path)
+    else:
+        extracted_text = await pdf_extractor.extract_from_docx(tmp_file_path)
+    
+    refinement_job_id = None
+    if progressive and ai_provider != "basic":
+        structured_data = await ai_processor.process_resume(text=extracted_text, provider="basic", job_id=job_id)
+        refinement_job_id = str(uuid.uuid4())
+        await job_status.set(refinement_job_id, "queued", parent_job_id=job_id)
+    else:
+        # Process with AI, unless an earlier version of this resume already was
+        structured_data = await _structure_resume(extracted_text, ai_provider, job_id)
+        if structured_data.get("degraded_reason"):
+            structured_data["upgrade_pending"] = quality_upgrades.schedule(
+                job_id, lambda: _upgrade_extraction(extracted_text, job_id, callback_url)
             )
+    document_ref = await document_store.put(extracted_text, structured_data, job_id)
+    
+    response = ExtractionResponse(
+        job_id=job_id,
+        success=True,
+        original_text=extracted_text,
+        structured_data=structured_data,
+        document_ref=document_ref,
+        file_info=file_info,
+        ai_provider=structured_data.get("provider_used", ai_provider),
+        refinement_job_id=refinement_job_id,
+        timestamp=datetime.utcnow().isoformat(),
+        error=None
+    )
+    
+    logger.info("Structured extraction completed", job_id=job_id)
+    name = (structured_data.get("contact_info") or {}).get("name")
+    return response.model_dump(), extracted_text, name
+
+async def _structure_resume(text: str, ai_provider: Optional[str], job_id: str) -> Dict[str, Any]:
+    """Structured data for the text, carried over from a near-duplicate resume when one was processed recently
+    
+    Resubmissions with a few lines edited in place reuse the earlier model
+    output with the changed phrases, skills and contact details patched in
+    (see apply_basic_diff), instead of costing a full generation; added or
+    removed lines always get a fresh extraction. Patched results report the
+    "reduced" quality tier; an unchanged resubmission keeps the original's.
+    """
+    if near_duplicates is None or ai_provider == "basic":
+        return await ai_processor.process_resume(text=text, provider=ai_provider, job_id=job_id)
+    
+    with tracer.span("near_duplicate.lookup") as span:
+        signature = near_duplicates.signature(text)
+        for ref, similarity in near_duplicates.find(signature):
+            prior = await document_store.get(ref)
+            # The stored result may since have been replaced by a basic or degraded one (progressive mode, load)
+            if prior is None or (prior.get("structured_data") or {}).get("quality_tier") != "full":
+                continue
+            changed_lines = edited_line_count(prior["text"], text)
+            if changed_lines is None or changed_lines > settings.NEAR_DUPLICATE_MAX_CHANGED_LINES:
+                continue
             
-            logger.info("Structured extraction completed", job_id=job_id)
-            return response
-            
+            structured_data = apply_basic_diff(prior["text"], prior["structured_data"], text)
+            structured_data.update(extraction_method="near_duplicate", near_duplicate_of=ref, similarity=round(similarity, 3))
+            if changed_lines:
+                # Patched model output, not a model run on this text
+                structured_data["quality_tier"] = "reduced"
+            span.set_attributes(reused_from=ref, similarity=round(similarity, 3), changed_lines=changed_lines)
+            logger.info("Reused near-duplicate extraction", job_id=job_id, reused_from=ref, similarity=round(similarity, 3), changed_lines=changed_lines)
+            return structured_data
+    
+    structured_data = await ai_processor.process_resume(text=text, provider=ai_provider, job_id=job_id)
+    # Only fresh full-quality model output is worth reusing; carried-over results would drift further with each edit
+    if structured_data.get("quality_tier") == "full" and structured_data.get("provider_used") != "basic":
+        near_duplicates.add(content_hash(text), signature)
+    return structured_data
+
+async def _refine_extraction(refinement_job_id: str, text: str, job_id: str, ai_provider: Optional[str], callback_url: Optional[str]):
+    """Background half of a progressive extraction: structure with the model and publish the result"""
+    # The caller already has its answer; the refinement isn't racing its timeout
+    request_deadline.set(None)
+    forced_tier.set("full")
+    await job_status.set(refinement_job_id, "running", parent_job_id=job_id)
+    try:
+        structured_data = await _structure_resume(text, ai_provider, job_id)
+        document_ref = await document_store.put(text, structured_data, job_id)
+    except Exception as e:
+        logger.error("Extraction refinement failed", job_id=job_id, refinement_job_id=refinement_job_id, error=str(e))
+        await job_status.set(refinement_job_id, "failed", parent_job_id=job_id, error=str(e))
+        if callback_url:
+            webhooks.enqueue(callback_url, "extraction.refinement_failed", {
+                "job_id": job_id, "refinement_job_id": refinement_job_id, "success": False, "error": str(e)
+            })
+        return
+    
+    result = {
+        "job_id": job_id,
+        "success": True,
+        "structured_data": structured_data,
+        "document_ref": document_ref,
+        "ai_provider": structured_data.get("provider_used", ai_provider)
+    }
+    await job_status.set(refinement_job_id, "completed", parent_job_id=job_id, result=result)
+    if callback_url:
+        webhooks.enqueue(callback_url, "extraction.refined", dict(result, refinement_job_id=refinement_job_id))
+    logger.info("Extraction refined", job_id=job_id, refinement_job_id=refinement_job_id, quality_tier=structured_data.get("quality_tier"))
+
+async def _upgrade_extraction(text: str, job_id: str, callback_url: Optional[str]) -> None:
+    """Full-quality re-run of an extraction that was degraded under load"""
+    structured_data = await ai_processor.process_resume(text=text, provider="ollama", job_id=job_id)
+    if structured_data.get("quality_tier") != "full" or structured_data.get("provider_used") == "basic":
+        raise Exception("Full-quality extraction fell back to basic")
+    
+    structured_data["upgraded"] = True
+    document_ref = await document_store.put(text, structured_data, job_id)
+    if near_duplicates is not None:
+        near_duplicates.add(document_ref, near_duplicates.signature(text))
+    if callback_url:
+        webhooks.enqueue(callback_url, "extraction.upgraded", {
+            "job_id": job_id,
+            "success": True,
+            "structured_data": structured_data,
+            "document_ref": document_ref,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+
+@app.post("/extract/enhance")
+async def extract_and_enhance(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    job_description: Optional[str] = Form(None),
+    job_id: Optional[str] = None,
+    ai_provider: Optional[str] = "auto",
+    scoring: Optional[str] = None,
+    profile: str = "full",
+    fields: Optional[str] = None,
+    callback_url: Optional[str] = None
+):
+    """Extract structured data and enhancement suggestions from one LLM generation
+    
+    Equivalent to /extract/structured followed by /enhance on the extracted
+    text, without the second generation or sending the text back. The JD is
+    an optional form field; `profile`, `fields` and `callback_url` work as on
+    /extract/structured.
+    """
+    
+    if not job_id:
+        job_id = str(uuid.uuid4())
+    
+    try:
+        validate_profile(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await _validate_callback_url(callback_url)
+    
+    logger.info("Starting extract and enhance", job_id=job_id, filename=file.filename, ai_provider=ai_provider)
+    
+    tmp_file_path, file_type = await _receive_upload(file, job_id)
+    
+    async def process():
+        try:
+            extracted_text = (await pdf_extractor.extract_text(tmp_file_path, file_type))["text"]
         finally:
             os.unlink(tmp_file_path)
-            
+        
+        result = await combined_processor.process(extracted_text, job_description, ai_provider, job_id, scoring)
+        structured_data = result["structured_data"]
+        response = {
+            "job_id": job_id,
+            "success": True,
+            "original_text": extracted_text,
+            "structured_data": structured_data,
+            "document_ref": await document_store.put(extracted_text, structured_data, job_id),
+            "enhancement": result["enhancement"],
+            "file_info": {
+                "filename": file.filename,
+                "size": file.size,
+                "content_type": FILE_TYPE_MIME[file_type]
+            },
+            "ai_provider": structured_data.get("provider_used", ai_provider),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        
+        logger.info("Extract and enhance completed", job_id=job_id)
+        if match_index is not None:
+            meta = {"filename": file.filename, "name": (structured_data.get("contact_info") or {}).get("name")}
+            if callback_url:
+                await _index_document("resume", job_id, extracted_text, meta)
+            else:
+                background_tasks.add_task(_index_document, "resume", job_id, extracted_text, meta)
+        return select_fields(response, profile, fields)
+    
+    if callback_url:
+        background_tasks.add_task(_run_with_callback, "extraction", job_id, callback_url, process)
+        return _accepted(job_id, callback_url)
+    
+    try:
+        return ORJSONResponse(await process())
     except Exception as e:
-        logger.error("Structured extraction failed", job_id=job_id, error=str(e))
-        raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
+        logger.error("Extract and enhance failed", job_id=job_id, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Extract and enhance failed: {str(e)}")
+
+async def _resolve_resume(resume_content: Optional[str], resume_ref: Optional[str]) -> str:
+    """Resume text from the request body, or from the document store by reference"""
+    if resume_content:
+        return resume_content
+    if not resume_ref:
+        raise HTTPException(status_code=400, detail="Provide resume_content or resume_ref")
+    document = await document_store.get(resume_ref)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Document '{resume_ref}' not found or expired")
+    return document["text"]
 
 @app.post("/enhance")
-async def enhance_content(request: EnhancementRequest):
-    """Enhance resume content for specific job descriptions"""
+async def enhance_content(
+    request: EnhancementRequest,
+    background_tasks: BackgroundTasks,
+    profile: str = "full",
+    fields: Optional[str] = None
+):
+    """Enhance resume content for specific job descriptions
     
-    logger.info("Starting content enhancement", job_id=request.job_id)
+    The resume is either `resume_content` or `resume_ref`, the job_id or
+    document_ref returned by an earlier extraction. With `callback_url` the request returns 202 immediately and the result is
+    POSTed to the callback when the LLM finishes.
+    """
     
     try:
+        validate_profile(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await _validate_callback_url(request.callback_url)
+    if request.callback_url and not request.job_id:
+        request.job_id = str(uuid.uuid4())  # the caller needs something to correlate the callback with
+    resume_content = await _resolve_resume(request.resume_content, request.resume_ref)
+    
+    logger.info("Starting content enhancement", job_id=request.job_id)
+    
+    async def enhance():
         enhancement_result = await content_enhancer.enhance_resume(
-            resume_content=request.resume_content,
+            resume_content=resume_content,
             job_description=request.job_description,
             provider=request.ai_provider,
-            job_id=request.job_id
+            job_id=request.job_id,
+            scoring=request.scoring
         )
         
         response = {
@@ -203,35 +573,149 @@ async def enhance_content(request: EnhancementRequest):
             "enhanced_content": enhancement_result["enhanced_content"],
             "suggestions": enhancement_result["suggestions"],
             "match_score": enhancement_result.get("match_score", 0),
+            "match_details": enhancement_result.get("requirements", []),
             "ai_provider": enhancement_result.get("provider_used", request.ai_provider),
             "timestamp": datetime.utcnow().isoformat()
         }
         
         logger.info("Content enhancement completed", job_id=request.job_id)
-        return response
-        
+        return select_fields(response, profile, fields)
+    
+    if request.callback_url:
+        background_tasks.add_task(_run_with_callback, "enhancement", request.job_id, request.callback_url, enhance)
+        return _accepted(request.job_id, request.callback_url)
+    
+    try:
+        return ORJSONResponse(await enhance())
     except Exception as e:
         logger.error("Content enhancement failed", job_id=request.job_id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Enhancement failed: {str(e)}")
 
+@app.post("/match/score")
+async def score_match(request: MatchRequest):
+    """Score a resume against a job description without generating suggestions
+    
+    With semantic scoring, resume embeddings are cached by content hash, so
+    re-scoring the same resume against a new JD only embeds the new JD.
+    """
+    resume_content = await _resolve_resume(request.resume_content, request.resume_ref)
+    try:
+        result = await content_enhancer.score_match(resume_content, request.job_description, request.scoring)
+        return ORJSONResponse(dict(result, success=True, timestamp=datetime.utcnow().isoformat()))
+    except Exception as e:
+        logger.error("Match scoring failed", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Match scoring failed: {str(e)}")
+
+async def _index_document(kind: str, item_id: str, content: str, meta: Optional[Dict[str, Any]] = None):
+    """Background indexing; a failure (e.g. embedding model not pulled) must not affect the request"""
+    try:
+        await match_index.add(kind, item_id, content, meta)
+        logger.info("Document indexed", kind=kind, item_id=item_id)
+    except Exception as e:
+        logger.warning("Document indexing failed", kind=kind, item_id=item_id, error=str(e))
+
+def _require_match_index() -> MatchIndex:
+    if match_index is None:
+        raise HTTPException(status_code=503, detail="Vector index is disabled (set VECTOR_INDEX_DIR)")
+    return match_index
+
+@app.get("/documents/stats")
+async def document_store_stats():
+    """Size and hit rate of this worker's document store and near-duplicate index"""
+    stats = document_store.stats()
+    if near_duplicates is not None:
+        stats["near_duplicates"] = near_duplicates.stats()
+    return stats
+
+@app.get("/match/index")
+async def match_index_stats():
+    """Entry counts and embedding model of the resume and job indexes"""
+    return await _require_match_index().stats()
+
+@app.post("/match/index/{kind}")
+async def index_document(kind: str, request: IndexRequest):
+    """Add (or replace) a resume or job description in the vector index; `kind` is `resumes` or `jobs`"""
+    index = _require_match_index()
+    if kind not in ("resumes", "jobs"):
+        raise HTTPException(status_code=404, detail=f"Unknown index '{kind}'")
+    try:
+        await index.add(kind[:-1], request.item_id, request.content, request.metadata)
+        return {"success": True, "item_id": request.item_id, "entries": await index.count(kind[:-1])}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Indexing failed", kind=kind, item_id=request.item_id, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Indexing failed: {str(e)}")
+
+@app.post("/match/resumes")
+async def match_resumes(request: MatchSearchRequest):
+    """Top-k indexed resumes for a job description (text, or `query_id` of an indexed job)"""
+    return await _search_match_index("resume", "job", request)
+
+@app.post("/match/jobs")
+async def match_jobs(request: MatchSearchRequest):
+    """Top-k indexed job descriptions for a resume (text, or `query_id` of an indexed resume)"""
+    return await _search_match_index("job", "resume", request)
+
+async def _search_match_index(kind: str, query_kind: str, request: MatchSearchRequest):
+    index = _require_match_index()
+    try:
+        matches = await index.search(kind, query_kind, request.k or settings.MATCH_TOP_K, request.content, request.query_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Match search failed", kind=kind, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Match search failed: {str(e)}")
+    return ORJSONResponse({"success": True, "matches": matches, "timestamp": datetime.utcnow().isoformat()})
+
 @app.get("/job/{job_id}/status")
 async def get_job_status(job_id: str):
-    """Get the status of a processing job"""
-    # This would typically check Redis or a job queue
-    # For now, return a simple response
-    return {
-        "job_id": job_id,
-        "status": "completed",  # In reality, check actual job status
-        "timestamp": datetime.utcnow().isoformat()
-    }
+    """Status of a background job (queued, running, completed, failed), with its result once completed"""
+    job = await job_status.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found or expired")
+    return ORJSONResponse(job)
+
+@app.get("/debug/profile")
+async def debug_profile(
+    seconds: float = 10,
+    mode: str = "cpu",
+    format: str = "json",
+    x_debug_token: Optional[str] = Header(None)
+):
+    """Profile this worker under live traffic for `seconds`
+    
+    `mode=cpu` samples every thread's stack; `mode=alloc` diffs tracemalloc
+    snapshots and adds the top allocation sites. Stacks are in collapsed
+    format (`format=collapsed` returns them as text for flamegraph.pl).
+    Requires X-Debug-Token to match DEBUG_PROFILE_TOKEN.
+    """
+    # Don't advertise the endpoint where it isn't enabled
+    if not settings.DEBUG_PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest((x_debug_token or "").encode(), settings.DEBUG_PROFILE_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+    if format not in ("json", "collapsed"):
+        raise HTTPException(status_code=400, detail="format must be json or collapsed")
+    
+    try:
+        result = await profiler.profile(seconds, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ProfileBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if format == "collapsed":
+        return PlainTextResponse("\n".join(result["collapsed"]) + "\n")
+    return ORJSONResponse(result)
 
 @app.get("/metrics")
 async def get_metrics():
     """Prometheus metrics endpoint"""
-    from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
-    from fastapi import Response
-    
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    prometheus_client = lazy_import("prometheus_client")
+    return Response(prometheus_client.generate_latest(), media_type=prometheus_client.CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
     import uvicorn
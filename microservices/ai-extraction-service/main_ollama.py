@@ -1,46 +1,43 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
+from services.startup import startup_timer, lazy_import, configure_logging
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
-import tempfile
 import os
 import uuid
 import structlog
 from datetime import datetime
 
+startup_timer.mark("framework_imports")
+
 from services.pdf_extractor import PDFExtractor
 from services.ai_processor import AIProcessor
 from services.content_enhancer import ContentEnhancer
+from services.compression import CompressionMiddleware
+from services.preflight import receive_upload, PreflightError, UploadLimitMiddleware
 from config import settings
 from models.extraction_models import ExtractionRequest, ExtractionResponse, EnhancementRequest
+from models.response_profiles import select_fields, validate_profile
+
+startup_timer.mark("service_imports")
 
 # Configure structured logging
-structlog.configure(
-    processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
-    ],
-    context_class=dict,
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    wrapper_class=structlog.stdlib.BoundLogger,
-    cache_logger_on_first_use=True,
-)
+configure_logging()
+startup_timer.mark("logging")
 
 logger = structlog.get_logger()
 
 app = FastAPI(
     title="AI Resume Extraction Service - Ollama Edition",
     description="Simple microservice for resume parsing using local Ollama",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+# Refuse oversized uploads from Content-Length, before the body is received; inside CORS so browsers see the 413
+app.add_middleware(UploadLimitMiddleware)
+
 # CORS middleware for Rails frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -50,11 +47,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (full resume text, batch results) with brotli or gzip
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+
 # Initialize services
 pdf_extractor = PDFExtractor()
 ai_processor = AIProcessor()
 content_enhancer = ContentEnhancer()
 
+startup_timer.mark("service_init")
+
+@app.on_event("startup")
+async def record_startup():
+    """Record the time until the app is ready to serve"""
+    startup_timer.mark_ready()
+    logger.info("Service ready", **startup_timer.summary())
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint for service monitoring"""
@@ -66,6 +74,11 @@ async def health_check():
         "mode": "ollama-focused"
     }
 
+@app.get("/health/startup")
+async def startup_timing():
+    """Startup-timing breakdown, including modules imported lazily since boot"""
+    return startup_timer.summary()
+
 @app.get("/ai-providers")
 async def get_ai_providers():
     """Get available AI providers (Ollama + Basic fallback)"""
@@ -84,37 +97,35 @@ async def extract_text_from_file(
     
     logger.info("Starting text extraction", job_id=job_id, filename=file.filename)
     
-    # Validate file type
-    if not file.filename.lower().endswith(('.pdf', '.docx')):
-        raise HTTPException(status_code=400, detail="Only PDF and DOCX files are supported")
+    # Validate the file from its content (not its extension) and save it temporarily
+    try:
+        temp_path, file_type = await receive_upload(file)
+    except PreflightError as e:
+        logger.warning("Upload rejected in pre-flight", job_id=job_id, filename=file.filename, reason=e.detail)
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     
     try:
-        # Save uploaded file temporarily
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1])
-        temp_file.write(await file.read())
-        temp_file.close()
-        
         # Extract text
-        extracted_text = await pdf_extractor.extract_text(temp_file.name)
+        extracted_text = await pdf_extractor.extract_text(temp_path, file_type)
         
         # Clean up temp file
-        os.unlink(temp_file.name)
+        os.unlink(temp_path)
         
-        return {
+        return ORJSONResponse({
             "job_id": job_id,
             "filename": file.filename,
             "text": extracted_text["text"],
             "metadata": extracted_text.get("metadata", {}),
             "status": "success",
             "extraction_method": "pdf_extractor"
-        }
+        })
         
     except Exception as e:
         logger.error("Text extraction failed", job_id=job_id, error=str(e))
         # Clean up temp file if it exists
         try:
-            if 'temp_file' in locals():
-                os.unlink(temp_file.name)
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
         except:
             pass
         raise HTTPException(status_code=500, detail=f"Text extraction failed: {str(e)}")
@@ -123,7 +134,9 @@ async def extract_text_from_file(
 async def extract_structured_data(
     file: UploadFile = File(...),
     provider: str = "ollama",
-    job_id: Optional[str] = None
+    job_id: Optional[str] = None,
+    profile: str = "full",
+    fields: Optional[str] = None
 ):
     """Extract structured data from resume using AI (Ollama preferred)"""
     
@@ -131,20 +144,23 @@ async def extract_structured_data(
     if not job_id:
         job_id = str(uuid.uuid4())
     
+    try:
+        validate_profile(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     logger.info("Starting structured extraction", job_id=job_id, provider=provider, filename=file.filename)
     
-    # Validate file type
-    if not file.filename.lower().endswith(('.pdf', '.docx')):
-        raise HTTPException(status_code=400, detail="Only PDF and DOCX files are supported")
+    # Validate the file from its content (not its extension) and save it temporarily
+    try:
+        temp_path, file_type = await receive_upload(file)
+    except PreflightError as e:
+        logger.warning("Upload rejected in pre-flight", job_id=job_id, filename=file.filename, reason=e.detail)
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     
     try:
-        # Save uploaded file temporarily
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1])
-        temp_file.write(await file.read())
-        temp_file.close()
-        
         # First extract text
-        extracted_text = await pdf_extractor.extract_text(temp_file.name)
+        extracted_text = await pdf_extractor.extract_text(temp_path, file_type)
         text_content = extracted_text["text"]
         
         # Then use AI to structure the data
@@ -155,23 +171,23 @@ async def extract_structured_data(
         )
         
         # Clean up temp file
-        os.unlink(temp_file.name)
+        os.unlink(temp_path)
         
-        return {
+        return ORJSONResponse(select_fields({
             "job_id": job_id,
             "filename": file.filename,
             "raw_text": text_content,
             "structured_data": structured_data,
             "provider_used": provider,
             "status": "success"
-        }
+        }, profile, fields))
         
     except Exception as e:
         logger.error("Structured extraction failed", job_id=job_id, error=str(e))
         # Clean up temp file if it exists
         try:
-            if 'temp_file' in locals():
-                os.unlink(temp_file.name)
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
         except:
             pass
         raise HTTPException(status_code=500, detail=f"Structured extraction failed: {str(e)}")
@@ -181,14 +197,26 @@ async def enhance_resume_content(
     resume_data: Dict[str, Any],
     job_description: Optional[str] = None,
     provider: str = "ollama",
-    job_id: Optional[str] = None
+    job_id: Optional[str] = None,
+    profile: str = "full",
+    fields: Optional[str] = None,
+    scoring: Optional[str] = None
 ):
-    """Enhance resume content for better job matching using Ollama"""
+    """Enhance resume content for better job matching using Ollama
+    
+    Use `profile=structured` to skip echoing `original_data` back, or
+    `profile=minimal` / `fields=` for just the scores and suggestions.
+    """
     
     # Generate job ID if not provided
     if not job_id:
         job_id = str(uuid.uuid4())
     
+    try:
+        validate_profile(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     logger.info("Starting content enhancement", job_id=job_id, provider=provider)
     
     try:
@@ -218,16 +246,17 @@ Education: {resume_data.get('education', 'N/A')}
             resume_text,
             job_description,
             provider=provider,
-            job_id=job_id
+            job_id=job_id,
+            scoring=scoring
         )
         
-        return {
+        return ORJSONResponse(select_fields({
             "job_id": job_id,
             "original_data": resume_data,
             "enhanced_result": enhanced_result,
             "provider_used": provider,
             "status": "success"
-        }
+        }, profile, fields))
         
     except Exception as e:
         logger.error("Content enhancement failed", job_id=job_id, error=str(e))
@@ -246,8 +275,8 @@ async def get_job_status(job_id: str):
 async def get_metrics():
     """Get service metrics for monitoring"""
     try:
-        from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
-        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+        prometheus_client = lazy_import("prometheus_client")
+        return Response(prometheus_client.generate_latest(), media_type=prometheus_client.CONTENT_TYPE_LATEST)
     except ImportError:
         return {
             "message": "Prometheus client not installed",
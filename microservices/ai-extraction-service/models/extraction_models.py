@@ -1,26 +1,52 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
+from config import settings
+
 class ExtractionRequest(BaseModel):
     job_id: Optional[str] = None
     ai_provider: Optional[str] = "auto"
     
 class ExtractionResponse(BaseModel):
+    # Only job_id and success are guaranteed; the rest depend on the requested profile/fields
     job_id: str
     success: bool
-    original_text: str
-    structured_data: Dict[str, Any]
-    file_info: Dict[str, Any]
-    ai_provider: str
-    timestamp: str
+    original_text: Optional[str] = None
+    structured_data: Optional[Dict[str, Any]] = None
+    document_ref: Optional[str] = None  # pass as resume_ref to /enhance or /match/score instead of the text
+    file_info: Optional[Dict[str, Any]] = None
+    ai_provider: Optional[str] = None
+    refinement_job_id: Optional[str] = None  # progressive mode: the model's result appears at /job/{id}/status
+    timestamp: Optional[str] = None
     error: Optional[str] = None
 
 class EnhancementRequest(BaseModel):
     job_id: Optional[str] = None
-    resume_content: str
+    # Either the text, or a job_id / document_ref from an earlier extraction
+    resume_content: Optional[str] = None
+    resume_ref: Optional[str] = None
     job_description: Optional[str] = None
     ai_provider: Optional[str] = "auto"
+    scoring: Optional[str] = None  # keyword | semantic; defaults to settings.MATCH_SCORING
+    callback_url: Optional[str] = None  # respond 202 now and POST the result here when done
+
+class MatchRequest(BaseModel):
+    resume_content: Optional[str] = None
+    resume_ref: Optional[str] = None
+    job_description: str
+    scoring: Optional[str] = None
+
+class IndexRequest(BaseModel):
+    item_id: str
+    content: str
+    metadata: Optional[Dict[str, Any]] = None
+
+class MatchSearchRequest(BaseModel):
+    # Query by text, or by the id of an already-indexed document (no embedding needed)
+    content: Optional[str] = None
+    query_id: Optional[str] = None
+    k: Optional[int] = Field(None, gt=0, le=settings.MATCH_MAX_K)  # defaults to settings.MATCH_TOP_K
 
 class EnhancementResponse(BaseModel):
     job_id: str
@@ -0,0 +1,90 @@
+from typing import Dict, Any, Optional, List, Iterable
+
+RESPONSE_PROFILES = ("minimal", "structured", "full")
+
+# Always returned so callers can correlate, check the outcome and reference the document later
+ALWAYS_FIELDS = ("job_id", "success", "status", "error", "document_ref", "refinement_job_id")
+
+# Fields that echo back text the caller already has (the uploaded resume or the
+# request payload); dropped by the "structured" profile
+ECHO_FIELDS = (
+    "original_text",
+    "raw_text",
+    "original_data",
+    "enhanced_content",
+    "enhanced_result.enhanced_content",
+)
+
+# Headline results returned by the "minimal" profile
+MINIMAL_FIELDS = (
+    "ai_provider",
+    "provider_used",
+    "structured_data.contact_info",
+    "structured_data.skills",
+    "structured_data.quality_tier",
+    "structured_data.upgrade_pending",
+    "match_score",
+    "suggestions",
+    "enhanced_result.match_score",
+    "enhanced_result.suggestions",
+    "enhancement.match_score",
+    "enhancement.suggestions",
+    "enhanced_result.quality_tier",
+    "enhancement.quality_tier",
+)
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Split a comma-separated `fields=` parameter into dotted paths"""
+    if not fields:
+        return []
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+def validate_profile(profile: str) -> None:
+    """Raise ValueError for an unknown response profile"""
+    if profile not in RESPONSE_PROFILES:
+        raise ValueError(f"Unknown response profile '{profile}', expected one of: {', '.join(RESPONSE_PROFILES)}")
+
+def select_fields(payload: Dict[str, Any], profile: str = "full", fields: Optional[str] = None) -> Dict[str, Any]:
+    """Trim a response payload to an explicit field list or a named profile"""
+    requested = parse_fields(fields)
+    if requested:
+        return _pick(payload, list(ALWAYS_FIELDS) + requested)
+
+    validate_profile(profile)
+    if profile == "minimal":
+        return _pick(payload, ALWAYS_FIELDS + MINIMAL_FIELDS)
+    if profile == "structured":
+        return _drop(payload, ECHO_FIELDS)
+    return payload
+
+def _pick(payload: Dict[str, Any], paths: Iterable[str]) -> Dict[str, Any]:
+    """Keep only the given dotted paths; paths missing from the payload are ignored"""
+    selected: Dict[str, Any] = {}
+    for path in paths:
+        source, target = payload, selected
+        keys = path.split(".")
+        for depth, key in enumerate(keys):
+            if not isinstance(source, dict) or key not in source:
+                break
+            if depth == len(keys) - 1:
+                target[key] = source[key]
+            else:
+                source = source[key]
+                target = target.setdefault(key, {})
+    return selected
+
+def _drop(payload: Dict[str, Any], paths: Iterable[str]) -> Dict[str, Any]:
+    """Return a copy of the payload without the given dotted paths"""
+    trimmed = dict(payload)
+    for path in paths:
+        *parents, leaf = path.split(".")
+        target = trimmed
+        for key in parents:
+            if not isinstance(target.get(key), dict):
+                target = None
+                break
+            target[key] = dict(target[key])
+            target = target[key]
+        if target is not None:
+            target.pop(leaf, None)
+    return trimmed
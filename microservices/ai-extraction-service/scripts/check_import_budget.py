@@ -0,0 +1,74 @@
+"""Fail if a cold `import main` takes longer than the configured budget, or loads a module meant to be lazy.
+
+Usage: python scripts/check_import_budget.py [--module main] [--budget-ms 1200] [--runs 3]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+from config import settings
+
+# Loaded with lazy_import on first use; timing alone is too noisy to notice one creeping back in
+DEFERRED_MODULES = ("httpx", "numpy", "PyPDF2", "docx", "prometheus_client", "redis", "pyarrow")
+
+def measure_import(module: str) -> Tuple[int, List[Tuple[int, str]]]:
+    """Import the module in a fresh interpreter and return (total_us, [(cumulative_us, name)])"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SERVICE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    entries = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        cumulative_us = int(cumulative.strip())
+        entries.append((cumulative_us, name.rstrip()))
+        if name.strip() == module:
+            total_us = cumulative_us
+
+    return total_us, entries
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=int, default=settings.IMPORT_TIME_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3, help="best of N runs, to ignore one-off disk stalls")
+    args = parser.parse_args()
+
+    best_us, best_entries = None, []
+    for _ in range(args.runs):
+        total_us, entries = measure_import(args.module)
+        if best_us is None or total_us < best_us:
+            best_us, best_entries = total_us, entries
+
+    total_ms = best_us / 1000
+    print(f"import {args.module}: {total_ms:.1f} ms (budget {args.budget_ms} ms)")
+    print(f"Slowest imports made directly by {args.module}:")
+    direct = [(us, name) for us, name in best_entries if name.startswith("   ") and not name.startswith("     ")]
+    for us, name in sorted(direct, reverse=True)[:10]:
+        print(f"  {us / 1000:8.1f} ms {name.strip()}")
+
+    failed = False
+    eager = sorted({name.strip() for _, name in best_entries} & set(DEFERRED_MODULES))
+    if eager:
+        print(f"FAIL: imported eagerly, should go through lazy_import: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: import time over budget by {total_ms - args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
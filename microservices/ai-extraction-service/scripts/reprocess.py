@@ -0,0 +1,336 @@
+"""Re-run extraction over a directory or archive of resumes, writing one JSON line per file.
+
+Parses across a process pool and keeps at most --llm-concurrency files in the
+LLM stage at once. The output file doubles as the checkpoint: with --resume,
+files it already has a record for are skipped, so an interrupted backfill
+picks up where it stopped. --parquet also writes the results as Parquet
+(requires pyarrow), keeping the latest record per file.
+
+Usage: python scripts/reprocess.py INPUT --output results.jsonl [--resume] [--provider ollama]
+           [--job-description jd.txt] [--parse-workers N] [--llm-concurrency N] [--parquet results.parquet]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+import orjson
+import structlog
+
+from config import settings
+from services.startup import configure_logging, lazy_import
+from services.ai_processor import AIProcessor
+from services.content_enhancer import ContentEnhancer
+from services.parse_pool import available_cpus, configure_parse_pool, shutdown_parse_pool
+from services.pdf_extractor import PDFExtractor
+from services.preflight import sniff_file_type
+from services.quality_tiers import forced_tier
+from services.tracing import tracer
+
+logger = structlog.get_logger()
+
+RESUME_SUFFIXES = (".pdf", ".docx")
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+PARQUET_BATCH_ROWS = 10000
+
+def load_checkpoint(output_path: str, retry_failed: bool) -> Set[str]:
+    """Paths already recorded in the output; drops a line left half-written by an interrupted run"""
+    done: Set[str] = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, "rb+") as f:
+        complete_bytes = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            complete_bytes += len(line)
+            record = orjson.loads(line)
+            if record["status"] == "ok" or not retry_failed:
+                done.add(record["path"])
+        f.truncate(complete_bytes)
+    return done
+
+def _is_archive(path: str) -> bool:
+    return os.path.isfile(path) and path.lower().endswith(ARCHIVE_SUFFIXES)
+
+def _archive_members(path: str):
+    """(name, read) for each resume in a zip or tar archive, in archive order"""
+    if path.lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(RESUME_SUFFIXES) and "__MACOSX/" not in info.filename:
+                    yield info.filename, lambda info=info: archive.read(info)
+    else:
+        # Streamed, so compressed tarballs are read once front to back
+        with tarfile.open(path, "r|*") as archive:
+            for member in archive:
+                if member.isfile() and member.name.lower().endswith(RESUME_SUFFIXES):
+                    yield member.name, lambda member=member: archive.extractfile(member).read()
+
+async def iter_sources(input_path: str, done: Set[str], stats: Dict[str, int]) -> AsyncIterator[Tuple[str, str, bool]]:
+    """(record path, file on disk, is temporary) for every resume not in `done`
+
+    Archive members are written to temporary files one at a time, as they are
+    consumed, so disk use stays bounded by how many files are in flight.
+    """
+    if not _is_archive(input_path):
+        paths = await asyncio.to_thread(lambda: sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(input_path)
+            for name in names
+            if name.lower().endswith(RESUME_SUFFIXES)
+        ))
+        for path in paths:
+            key = os.path.relpath(path, input_path)
+            if key in done:
+                stats["skipped"] += 1
+                continue
+            yield key, path, False
+        return
+
+    members = _archive_members(input_path)
+    while True:
+        member = await asyncio.to_thread(next, members, None)
+        if member is None:
+            return
+        name, read = member
+        if name in done:
+            stats["skipped"] += 1
+            continue
+        data = await asyncio.to_thread(read)
+        fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(name)[1].lower())
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        yield name, tmp_path, True
+
+class Reprocessor:
+    """Runs the service's own extraction pipeline on local files"""
+
+    def __init__(self, provider: str, job_description: Optional[str], llm_concurrency: int):
+        self.provider = provider
+        self.job_description = job_description
+        self.pdf_extractor = PDFExtractor()
+        self.ai_processor = AIProcessor()
+        self.content_enhancer = ContentEnhancer()
+        self.llm_slots = asyncio.Semaphore(llm_concurrency)
+
+    async def process_file(self, key: str, path: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        record: Dict[str, Any] = {"path": key, "bytes": os.path.getsize(path)}
+        timings: Dict[str, float] = {}
+        with tracer.span("reprocess.file", path=key):
+            try:
+                with open(path, "rb") as f:
+                    file_type = sniff_file_type(f.read(1024))
+                if file_type is None:
+                    raise ValueError("Not a PDF or DOCX file")
+                record["file_type"] = file_type
+
+                step = time.perf_counter()
+                text = (await self.pdf_extractor.extract_text(path, file_type))["text"]
+                timings["parse_ms"] = _elapsed_ms(step)
+                record["chars"] = len(text)
+
+                step = time.perf_counter()
+                async with self.llm_slots:
+                    timings["llm_wait_ms"] = _elapsed_ms(step)
+                    step = time.perf_counter()
+                    structured_data = await self.ai_processor.process_resume(text=text, provider=self.provider, job_id=key)
+                    timings["structure_ms"] = _elapsed_ms(step)
+                    record.update(
+                        provider=structured_data.get("provider_used"),
+                        extraction_method=structured_data.get("extraction_method"),
+                        structured_data=structured_data
+                    )
+
+                    if self.job_description is not None:
+                        step = time.perf_counter()
+                        record["enhancement"] = await self.content_enhancer.enhance_resume(
+                            resume_content=text,
+                            job_description=self.job_description,
+                            provider="basic" if self.provider == "basic" else "ollama",
+                            job_id=key
+                        )
+                        timings["enhance_ms"] = _elapsed_ms(step)
+                record["status"] = "ok"
+            except Exception as e:
+                logger.error("Reprocessing failed", path=key, error=str(e))
+                record.update(status="error", error=str(e))
+
+        timings["total_ms"] = _elapsed_ms(started)
+        record.update(timings=timings, processed_at=datetime.utcnow().isoformat())
+        return record
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+async def reprocess(args: argparse.Namespace) -> Dict[str, int]:
+    # Nobody is waiting on a backfill; never trade quality for latency
+    forced_tier.set("full")
+    done = load_checkpoint(args.output, args.retry_failed)
+    job_description = None
+    if args.job_description:
+        with open(args.job_description, encoding="utf-8") as f:
+            job_description = f.read()
+
+    reprocessor = Reprocessor(args.provider, job_description, args.llm_concurrency)
+    stats = {"processed": 0, "failed": 0, "skipped": 0}
+    # Enough files in flight to keep every parse process and LLM slot busy
+    workers = args.parse_workers + args.llm_concurrency
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers)
+    started = time.perf_counter()
+
+    await tracer.start()
+    with open(args.output, "ab") as output:
+        async def produce() -> None:
+            count = 0
+            async for source in iter_sources(args.input, done, stats):
+                if args.limit and count >= args.limit:
+                    if source[2]:
+                        os.unlink(source[1])
+                    break
+                await queue.put(source)
+                count += 1
+            for _ in range(workers):
+                await queue.put(None)
+
+        async def consume() -> None:
+            while (source := await queue.get()) is not None:
+                key, path, temporary = source
+                try:
+                    record = await reprocessor.process_file(key, path)
+                finally:
+                    if temporary:
+                        os.unlink(path)
+                # One write per record, flushed, so a crash loses at most the files in flight
+                output.write(orjson.dumps(record) + b"\n")
+                output.flush()
+
+                stats["processed"] += 1
+                if record["status"] != "ok":
+                    stats["failed"] += 1
+                if stats["processed"] % args.progress_every == 0:
+                    elapsed = time.perf_counter() - started
+                    logger.info(
+                        "Reprocessing progress",
+                        processed=stats["processed"],
+                        failed=stats["failed"],
+                        skipped=stats["skipped"],
+                        files_per_sec=round(stats["processed"] / elapsed, 2)
+                    )
+
+        try:
+            await asyncio.gather(produce(), *(consume() for _ in range(workers)))
+        finally:
+            await tracer.stop()
+
+    stats["elapsed_s"] = round(time.perf_counter() - started, 1)
+    return stats
+
+def write_parquet(jsonl_path: str, parquet_path: str) -> int:
+    """Convert the JSONL results to Parquet, keeping the latest record per path
+
+    Nested results are stored as JSON strings, so the schema doesn't depend
+    on which fields the model happened to return.
+    """
+    pa = lazy_import("pyarrow")
+    pq = lazy_import("pyarrow.parquet")
+    schema = pa.schema([
+        ("path", pa.string()),
+        ("status", pa.string()),
+        ("error", pa.string()),
+        ("file_type", pa.string()),
+        ("bytes", pa.int64()),
+        ("chars", pa.int64()),
+        ("provider", pa.string()),
+        ("extraction_method", pa.string()),
+        ("parse_ms", pa.float64()),
+        ("llm_wait_ms", pa.float64()),
+        ("structure_ms", pa.float64()),
+        ("enhance_ms", pa.float64()),
+        ("total_ms", pa.float64()),
+        ("processed_at", pa.string()),
+        ("structured_data", pa.string()),
+        ("enhancement", pa.string()),
+    ])
+
+    # Retried files have several records; find each path's last one first
+    latest: Dict[str, int] = {}
+    with open(jsonl_path, "rb") as f:
+        for number, line in enumerate(f):
+            latest[orjson.loads(line)["path"]] = number
+    keep = set(latest.values())
+
+    rows = 0
+    with open(jsonl_path, "rb") as f, pq.ParquetWriter(parquet_path, schema) as writer:
+        batch = []
+        for number, line in enumerate(f):
+            if number not in keep:
+                continue
+            record = orjson.loads(line)
+            row = {name: record.get(name) for name in schema.names if name not in ("structured_data", "enhancement")}
+            row.update(record.get("timings", {}))
+            for name in ("structured_data", "enhancement"):
+                row[name] = orjson.dumps(record[name]).decode() if name in record else None
+            batch.append(row)
+            if len(batch) >= PARQUET_BATCH_ROWS:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                rows += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            rows += len(batch)
+    return rows
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="directory of resumes (walked recursively) or a .zip/.tar/.tar.gz archive")
+    parser.add_argument("--output", required=True, help="JSONL results file, also the checkpoint")
+    parser.add_argument("--resume", action="store_true", help="skip files already in --output instead of refusing to run")
+    parser.add_argument("--retry-failed", action="store_true", help="with --resume, process files that failed last time again")
+    parser.add_argument("--provider", default="ollama", help="AI provider for structuring (ollama, openai, huggingface, basic, auto)")
+    parser.add_argument("--job-description", help="text file; also run enhancement against this job description")
+    parser.add_argument("--parse-workers", type=int, default=available_cpus(), help="parse processes (default: all usable CPUs)")
+    parser.add_argument("--llm-concurrency", type=int, default=settings.LLM_PARALLEL_SLOTS * len(settings.OLLAMA_BASE_URLS), help="files in the LLM stage at once")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many files (0 = all)")
+    parser.add_argument("--progress-every", type=int, default=100)
+    parser.add_argument("--parquet", help="also write the results to this Parquet file (requires pyarrow)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        parser.error(f"{args.input} does not exist")
+    if os.path.exists(args.output) and os.path.getsize(args.output) and not args.resume:
+        parser.error(f"{args.output} already has results; pass --resume to continue it")
+    if args.progress_every < 1:
+        parser.error("--progress-every must be at least 1")
+    if args.parquet:
+        try:
+            lazy_import("pyarrow.parquet")
+        except ImportError:
+            parser.error("--parquet requires pyarrow (pip install pyarrow)")
+
+    configure_logging()
+    configure_parse_pool(args.parse_workers)
+    try:
+        stats = asyncio.run(reprocess(args))
+    finally:
+        shutdown_parse_pool()
+
+    print(f"processed {stats['processed']} files ({stats['failed']} failed, {stats['skipped']} already done) in {stats['elapsed_s']} s")
+    if args.parquet:
+        rows = write_parquet(args.output, args.parquet)
+        print(f"wrote {rows} rows to {args.parquet}")
+    return 1 if stats["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
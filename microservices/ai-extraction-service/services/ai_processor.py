@@ -1,18 +1,36 @@
-import httpx
 import structlog
 import json
-import os
-from typing import Dict, Any, Optional, List
+import time
+from typing import Dict, Any, Optional
 from config import settings
+from services.basic_extractor import extract_basic
+from services.model_router import model_router, estimate_tokens
+from services.tracing import tracer, generation_attributes
+from services.ollama_stream import generate, token_budget
+from services.ollama_pool import ollama_pool
+from services.quality_tiers import quality_planner
+from services.startup import lazy_import
 
 logger = structlog.get_logger()
 
+# Reduced-tier extraction: a trimmed schema over the start of the resume, on the smallest model
+REDUCED_TEXT_CHARS = 1200
+REDUCED_NUM_PREDICT = 400
+
 class AIProcessor:
     """Service for AI-powered resume processing using local Ollama"""
     
     def __init__(self):
-        self.ollama_url = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
-        logger.info(f"AIProcessor initialized with Ollama at: {self.ollama_url}")
+        self._openai_client = None
+        logger.info(f"AIProcessor initialized with Ollama at: {', '.join(settings.OLLAMA_BASE_URLS)}")
+    
+    @property
+    def openai_client(self):
+        """OpenAI client, created on first use so the SDK is only imported when configured"""
+        if self._openai_client is None and settings.OPENAI_API_KEY:
+            openai = lazy_import("openai")
+            self._openai_client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        return self._openai_client
     
     async def get_provider_status(self) -> Dict[str, Any]:
         """Check the status of local Ollama and basic fallback"""
@@ -21,23 +39,19 @@ class AIProcessor:
             "recommended": "basic"
         }
         
-        # Check Ollama
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.ollama_url}/api/tags", timeout=5)
-                if response.status_code == 200:
-                    models = response.json().get('models', [])
-                    status["providers"]["ollama"] = {
-                        "available": True,
-                        "status": "ready",
-                        "cost": "free",
-                        "models_count": len(models)
-                    }
-                    if models:
-                        status["recommended"] = "ollama"
-                    if status["recommended"] == "basic":
-                        status["recommended"] = "ollama"
-        except Exception:
+        # Check Ollama: any healthy server in the pool, as of the last health check
+        models = await ollama_pool.models()
+        pool = ollama_pool.stats()
+        if pool["healthy"]:
+            status["providers"]["ollama"] = {
+                "available": True,
+                "status": "ready",
+                "cost": "free",
+                "models_count": len(models),
+                "servers": f"{pool['healthy']}/{len(pool['backends'])}"
+            }
+            status["recommended"] = "ollama"
+        else:
             status["providers"]["ollama"] = {
                 "available": False,
                 "status": "not_running",
@@ -68,22 +82,29 @@ class AIProcessor:
         
         logger.info("Processing resume with AI", provider=provider, job_id=job_id, text_length=len(text))
         
-        if provider == "auto":
-            provider = await self._select_best_provider()
-        
-        try:
-            if provider == "openai" and self.openai_client:
-                return await self._process_with_openai(text, job_id)
-            elif provider == "ollama":
-                return await self._process_with_ollama(text, job_id)
-            elif provider == "huggingface":
-                return await self._process_with_huggingface(text, job_id)
-            else:
-                return await self._process_with_basic(text, job_id)
-                
-        except Exception as e:
-            logger.error("AI processing failed, falling back to basic", error=str(e), provider=provider)
-            return await self._process_with_basic(text, job_id)
+        with tracer.span("structure", requested_provider=provider, chars=len(text)) as span:
+            if provider == "auto":
+                provider = await self._select_best_provider()
+            span.set_attributes(provider=provider)
+            
+            try:
+                if provider == "openai" and self.openai_client:
+                    result = await self._process_with_openai(text, job_id)
+                elif provider == "ollama":
+                    result = await self._process_with_ollama(text, job_id)
+                elif provider == "huggingface":
+                    result = await self._process_with_huggingface(text, job_id)
+                else:
+                    result = await self._process_with_basic(text, job_id)
+                    
+            except Exception as e:
+                logger.error("AI processing failed, falling back to basic", error=str(e), provider=provider)
+                span.set_attributes(fallback_reason=str(e))
+                result = await self._process_with_basic(text, job_id)
+            
+            result.setdefault("quality_tier", "basic" if result.get("provider_used") == "basic" else "full")
+            span.set_attributes(quality_tier=result["quality_tier"])
+            return result
     
     async def _select_best_provider(self) -> str:
         """Select the best available provider"""
@@ -119,32 +140,57 @@ class AIProcessor:
             raise
     
     async def _process_with_ollama(self, text: str, job_id: Optional[str]) -> Dict[str, Any]:
-        """Process with local Ollama"""
+        """Process with local Ollama, stopping generation as soon as the JSON object is complete
+        
+        Under load the quality planner may pick the reduced tier (smallest
+        model, shorter prompt) or basic extraction instead; the result's
+        quality_tier and degraded_reason say so.
+        """
         prompt = self._build_extraction_prompt(text)
+        prompt_tokens = estimate_tokens(prompt)
+        num_predict = token_budget.cap("extraction", prompt_tokens, 800)
+        
+        model = await model_router.choose("extraction", prompt, num_predict)
+        if model is None:
+            raise Exception("No Ollama models available")
         
-        async with httpx.AsyncClient() as client:
+        tier, model, degraded_reason = await quality_planner.plan("extraction", model)
+        if tier == "basic":
+            return dict(self._basic_structured(text), quality_tier="basic", degraded_reason=degraded_reason)
+        if tier == "reduced":
+            prompt = self._build_extraction_prompt(text, reduced=True)
+            prompt_tokens = estimate_tokens(prompt)
+            num_predict = min(num_predict, REDUCED_NUM_PREDICT)
+        
+        async with lazy_import("httpx").AsyncClient() as client:
             try:
-                response = await client.post(
-                    f"{settings.OLLAMA_BASE_URL}/api/generate",
-                    json={
-                        "model": "llama3.2:3b",
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
+                with tracer.span("llm.generate", task="extraction", model=model, prompt_tokens=prompt_tokens, num_predict=num_predict, quality_tier=tier) as span:
+                    started = time.perf_counter()
+                    result = await generate(
+                        client,
+                        "extraction",
+                        model,
+                        prompt,
+                        {
                             "temperature": 0.1,
                             "top_p": 0.9,
-                            "num_predict": 800
-                        }
-                    },
-                    timeout=60
-                )
+                            "num_predict": num_predict
+                        },
+                        timeout=60,
+                        json_object=True,
+                        headers=tracer.headers()
+                    )
+                    span.set_attributes(done_reason=result.get("done_reason"), **generation_attributes(result, (time.perf_counter() - started) * 1000))
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    content = result.get("response", "")
-                    return self._parse_ai_response(content, "ollama")
-                else:
-                    raise Exception(f"Ollama request failed: {response.status_code}")
+                model_router.record(model, result)
+                quality_planner.observe("extraction", tier, model, result)
+                if tier == "full":
+                    token_budget.observe("extraction", prompt_tokens, result)
+                parsed = self._parse_ai_response(result.get("response", ""), "ollama")
+                parsed.update(model_used=model, quality_tier=tier)
+                if degraded_reason:
+                    parsed["degraded_reason"] = degraded_reason
+                return parsed
                     
             except Exception as e:
                 logger.error("Ollama processing failed", error=str(e))
@@ -153,7 +199,7 @@ class AIProcessor:
     async def _process_with_huggingface(self, text: str, job_id: Optional[str]) -> Dict[str, Any]:
         """Process with Hugging Face"""
         # Using a summarization model for basic processing
-        async with httpx.AsyncClient() as client:
+        async with lazy_import("httpx").AsyncClient() as client:
             try:
                 response = await client.post(
                     f"{settings.HUGGINGFACE_BASE_URL}/facebook/bart-large-cnn",
@@ -181,23 +227,34 @@ class AIProcessor:
     
     async def _process_with_basic(self, text: str, job_id: Optional[str]) -> Dict[str, Any]:
         """Basic text processing without AI"""
-        from services.pdf_extractor import PDFExtractor
-        
-        extractor = PDFExtractor()
-        basic_info = extractor.extract_basic_info(text)
-        
-        return {
-            "contact_info": basic_info["contact_info"],
-            "skills": basic_info["skills"],
-            "education": self._extract_education_basic(text),
-            "experience": self._extract_experience_basic(text),
-            "summary": text[:300] + "..." if len(text) > 300 else text,
-            "provider_used": "basic",
-            "extraction_method": "basic_regex"
-        }
+        return self._basic_structured(text)
+    
+    def _basic_structured(self, text: str) -> Dict[str, Any]:
+        """Single-pass line classification; cheap enough to be the fallback under load"""
+        return dict(
+            extract_basic(text),
+            summary=text[:300] + "..." if len(text) > 300 else text,
+            provider_used="basic",
+            extraction_method="basic_regex"
+        )
     
-    def _build_extraction_prompt(self, text: str) -> str:
-        """Build extraction prompt for AI models"""
+    def _build_extraction_prompt(self, text: str, reduced: bool = False) -> str:
+        """Build extraction prompt for AI models; `reduced` asks for the headline fields of a shorter excerpt"""
+        if reduced:
+            return f"""
+Extract the following from this resume and return only JSON:
+
+{{
+  "contact_info": {{"name": "", "email": "", "phone": "", "location": ""}},
+  "summary": "One sentence",
+  "experience": [{{"company": "", "position": "", "duration": ""}}],
+  "education": [{{"institution": "", "degree": ""}}],
+  "skills": []
+}}
+
+Resume text:
+{text[:REDUCED_TEXT_CHARS]}
+"""
         return f"""
 Please extract structured information from the following resume text and return it as JSON with these fields:
 
@@ -265,42 +322,8 @@ Resume text:
     
     def _create_structured_from_summary(self, original_text: str, summary: str, provider: str) -> Dict[str, Any]:
         """Create structured data from AI summary"""
-        basic_result = self._process_with_basic(original_text, None)
+        basic_result = self._basic_structured(original_text)
         basic_result["summary"] = summary
         basic_result["provider_used"] = provider
         basic_result["extraction_method"] = "ai_summary"
         return basic_result
-    
-    def _extract_education_basic(self, text: str) -> List[Dict[str, str]]:
-        """Extract education information using basic patterns"""
-        education_keywords = ['university', 'college', 'bachelor', 'master', 'phd', 'degree']
-        lines = text.lower().split('\n')
-        
-        education_entries = []
-        for line in lines:
-            if any(keyword in line for keyword in education_keywords):
-                education_entries.append({
-                    "institution": line.strip(),
-                    "degree": "",
-                    "field": "",
-                    "year": ""
-                })
-        
-        return education_entries[:3]  # Limit to 3 entries
-    
-    def _extract_experience_basic(self, text: str) -> List[Dict[str, str]]:
-        """Extract work experience using basic patterns"""
-        experience_keywords = ['manager', 'developer', 'engineer', 'analyst', 'director', 'lead']
-        lines = text.split('\n')
-        
-        experience_entries = []
-        for line in lines:
-            if any(keyword.lower() in line.lower() for keyword in experience_keywords):
-                experience_entries.append({
-                    "company": "",
-                    "position": line.strip(),
-                    "duration": "",
-                    "description": line.strip()
-                })
-        
-        return experience_entries[:5]  # Limit to 5 entries
\ No newline at end of file
@@ -0,0 +1,155 @@
+import re
+from bisect import bisect_right
+from typing import Any, Dict, List
+
+from services.resume_sections import SECTION_HEADERS, match_section_header
+
+# Skills recognised by the basic (non-LLM) extractor
+TECH_SKILLS = (
+    'Python', 'Java', 'JavaScript', 'Ruby', 'Rails', 'React', 'Node.js',
+    'SQL', 'HTML', 'CSS', 'Git', 'AWS', 'Azure', 'Docker', 'Kubernetes',
+    'Machine Learning', 'AI', 'Data Science', 'Project Management'
+)
+
+# Line keywords used to spot education and experience entries
+EDUCATION_KEYWORDS = ('university', 'college', 'bachelor', 'master', 'phd', 'degree')
+EXPERIENCE_KEYWORDS = ('manager', 'developer', 'engineer', 'analyst', 'director', 'lead')
+
+MAX_EMAILS = 2
+MAX_PHONES = 2
+MAX_EDUCATION = 3
+MAX_EXPERIENCE = 5
+
+_MONTH = r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+'
+YEAR_PATTERN = re.compile(r'\b(?:19|20)\d{2}\b')
+DATE_RANGE_PATTERN = re.compile(
+    rf'\b(?:{_MONTH})?(?:19|20)\d{{2}}\s*(?:-|–|—|to)\s*(?:(?:{_MONTH})?(?:19|20)\d{{2}}|present|current|now)\b',
+    re.IGNORECASE
+)
+BULLET_PATTERN = re.compile(r'[ \t]*[-•*–·▪]')
+
+def _alternation(words) -> str:
+    # Longest first, so "javascript" wins over "java"
+    return '|'.join(re.escape(word).replace(r'\ ', r'\s+') for word in sorted(words, key=len, reverse=True))
+
+EMAIL_PATTERN = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+_EMAIL_LOCAL_PART = re.compile(r'[A-Za-z0-9._%+-]+$')
+
+# Everything the extractor looks for in one scan of the lower-cased text; each
+# match's group name says what it found. Most branches sit behind a single \b
+# so the engine only tries them at word starts, and emails are found from
+# their "@" rather than by trying every word as a local part.
+_BASIC_PATTERN_SOURCE = (
+    r'(?P<header>^[^\w\n]*(?:' + _alternation(s for spellings in SECTION_HEADERS.values() for s in spellings) + r')[^\w\n]*$)'
+    # One character-class test per position before the branches that lack a \b
+    r'|(?=[@(+1])(?:'
+    r'(?P<email>@)'
+    r'|(?P<phone>(?:\+?1[-.\s]?)?\([0-9]{3}\)[-.\s]?[0-9]{3}[-.\s]?[0-9]{4}\b)'
+    r')'
+    r'|\b(?:'
+    r'(?P<education>' + _alternation(EDUCATION_KEYWORDS) + r')'
+    r'|(?P<experience>' + _alternation(EXPERIENCE_KEYWORDS) + r')'
+    # Whole words only: "ai" must not hit "email"
+    r'|(?P<skill>' + _alternation(skill.lower() for skill in TECH_SKILLS) + r')(?![a-z0-9])'
+    r'|(?P<bare_phone>(?:1[-.\s]?)?[0-9]{3}[-.\s]?[0-9]{3}[-.\s]?[0-9]{4}\b)'
+    r')'
+)
+BASIC_PATTERN = re.compile(_BASIC_PATTERN_SOURCE, re.MULTILINE)
+# For the rare text whose lower-casing changes its length (so offsets wouldn't line up)
+BASIC_PATTERN_IGNORECASE = re.compile(_BASIC_PATTERN_SOURCE, re.MULTILINE | re.IGNORECASE)
+
+def extract_basic(text: str) -> Dict[str, Any]:
+    """Contact details, skills, education and experience from a single regex pass
+
+    Section headers give context: once the resume has them, keywords only
+    start entries inside their own section ("engineer" in the summary isn't
+    a job), bullet lines never start one, and an entry under Experience or
+    Education extends to the next entry or header, so dates and bullets below
+    its first line fill in duration, year and description.
+    """
+    emails: List[str] = []
+    phones: List[str] = []
+    skills = set()
+    entries: Dict[str, List[Dict[str, Any]]] = {"education": [], "experience": []}
+    # Line starts of headers and entries; an entry's text runs to the next one
+    boundaries: List[int] = []
+    section = ""
+
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        matches = BASIC_PATTERN.finditer(lowered)
+    else:
+        matches = BASIC_PATTERN_IGNORECASE.finditer(text)
+
+    for match in matches:
+        kind = match.lastgroup
+        if kind == "skill":
+            skills.add(match.group().lower())
+        elif kind == "email":
+            if len(emails) < MAX_EMAILS:
+                email = _email_at(text, match.start())
+                if email:
+                    emails.append(email)
+        elif kind in ("phone", "bare_phone"):
+            if len(phones) < MAX_PHONES:
+                phones.append(text[match.start():match.end()])
+        else:
+            line_start = text.rfind("\n", 0, match.start()) + 1
+            if kind == "header":
+                section = match_section_header(match.group())
+                boundaries.append(line_start)
+                continue
+
+            found = entries[kind]
+            if section not in ("", kind) or (found and found[-1]["start"] == line_start):
+                continue
+            if BULLET_PATTERN.match(text, line_start):
+                continue
+            if not boundaries or boundaries[-1] != line_start:
+                boundaries.append(line_start)
+            found.append({"start": line_start, "in_section": section == kind})
+
+    result = {
+        "contact_info": {"emails": emails, "phones": phones},
+        # Reported in TECH_SKILLS order, like the keyword scan this replaced
+        "skills": [skill for skill in TECH_SKILLS if skill.lower() in skills],
+        "education": [],
+        "experience": [],
+    }
+
+    for kind, limit in (("education", MAX_EDUCATION), ("experience", MAX_EXPERIENCE)):
+        for entry in entries[kind][:limit]:
+            start = entry["start"]
+            line_end = text.find("\n", start)
+            line_end = len(text) if line_end == -1 else line_end
+            line = text[start:line_end].strip()
+            if entry["in_section"]:
+                next_index = bisect_right(boundaries, start)
+                end = boundaries[next_index] if next_index < len(boundaries) else len(text)
+                block = text[start:end].strip()
+            else:
+                block = line
+
+            if kind == "education":
+                year = YEAR_PATTERN.search(block)
+                result["education"].append({"institution": line, "degree": "", "field": "", "year": year.group() if year else ""})
+            else:
+                duration = DATE_RANGE_PATTERN.search(block)
+                result["experience"].append({
+                    "company": "",
+                    "position": line,
+                    "duration": duration.group() if duration else "",
+                    "description": block
+                })
+
+    return result
+
+def _email_at(text: str, at: int) -> str:
+    """The email address around the "@" at offset `at`, or ''"""
+    line_start = text.rfind("\n", 0, at) + 1
+    # Local parts are at most 64 characters
+    local_part = _EMAIL_LOCAL_PART.search(text, max(line_start, at - 64), at)
+    if local_part is None:
+        return ""
+    email = EMAIL_PATTERN.match(text, local_part.start())
+    return email.group() if email else ""
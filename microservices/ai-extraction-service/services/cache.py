@@ -0,0 +1,143 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import structlog
+
+from services.startup import lazy_import
+
+logger = structlog.get_logger()
+
+class LRUCache:
+    """Bounded in-process cache with least-recently-used eviction and an optional TTL"""
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Like get, but without counting a hit or miss or refreshing the entry's recency"""
+        entry = self._entries.get(key)
+        if entry is None or (entry[1] is not None and entry[1] < time.monotonic()):
+            return None
+        return entry[0]
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+class SharedCache:
+    """An LRUCache per process in front of an optional Redis tier shared by all workers and replicas
+
+    Values must be JSON-serializable. Redis errors are logged and only cost
+    the shared tier; the in-memory one keeps working.
+    """
+
+    def __init__(self, name: str, key_prefix: str, max_entries: int, ttl_seconds: int, redis_url: Optional[str] = None):
+        self.name = name
+        self.key_prefix = key_prefix
+        self.ttl_seconds = ttl_seconds
+        self.memory = LRUCache(max_entries, ttl_seconds)
+        self.redis_url = redis_url
+        self._redis = None
+
+    @property
+    def redis(self):
+        """Async Redis client, created on first use"""
+        if self._redis is None and self.redis_url:
+            redis_asyncio = lazy_import("redis.asyncio")
+            self._redis = redis_asyncio.from_url(self.redis_url, socket_timeout=1)
+        return self._redis
+
+    async def set(self, items: Dict[str, Any]) -> None:
+        """Store each key's value in both tiers"""
+        for key, value in items.items():
+            self.memory.set(key, value)
+        if self.redis is None:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.setex(self.key_prefix + key, self.ttl_seconds, json.dumps(value))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"{self.name} Redis write failed", error=str(e))
+
+    async def set_if_absent(self, key: str, value: Any) -> Any:
+        """Store the value unless the key already holds one; returns whichever value the key ends up with"""
+        existing = self.memory.peek(key)
+        if existing is not None:
+            return existing
+        if self.redis is not None:
+            try:
+                if not await self.redis.set(self.key_prefix + key, json.dumps(value), ex=self.ttl_seconds, nx=True):
+                    raw = await self.redis.get(self.key_prefix + key)
+                    if raw is not None:
+                        value = json.loads(raw)
+            except Exception as e:
+                logger.warning(f"{self.name} Redis write failed", error=str(e))
+        self.memory.set(key, value)
+        return value
+
+    async def get(self, key: str, shared_first: bool = False) -> Optional[Any]:
+        """The key's value, or None if unknown or expired
+
+        Memory is tried first, and Redis on a miss (filling memory back in).
+        With `shared_first` Redis wins when it answers, for values another
+        worker may have changed since this one cached them.
+        """
+        if not shared_first:
+            value = self.memory.get(key)
+            if value is not None or self.redis is None:
+                return value
+        elif self.redis is None:
+            return self.memory.get(key)
+
+        try:
+            raw = await self.redis.get(self.key_prefix + key)
+        except Exception as e:
+            logger.warning(f"{self.name} Redis read failed", error=str(e))
+            return self.memory.get(key) if shared_first else None
+        if raw is None:
+            return self.memory.get(key) if shared_first else None
+
+        value = json.loads(raw)
+        self.memory.set(key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.memory.stats(), ttl_seconds=self.ttl_seconds, redis=bool(self.redis_url))
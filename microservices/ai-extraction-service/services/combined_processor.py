@@ -0,0 +1,155 @@
+import json
+import time
+from typing import Any, Dict, Optional
+
+import structlog
+
+from services.ai_processor import AIProcessor, REDUCED_NUM_PREDICT
+from services.content_enhancer import ContentEnhancer
+from services.model_router import model_router, estimate_tokens
+from services.tracing import tracer, generation_attributes
+from services.ollama_stream import generate, token_budget
+from services.quality_tiers import quality_planner
+from services.startup import lazy_import
+
+logger = structlog.get_logger()
+
+class CombinedProcessor:
+    """Structured extraction and enhancement of a resume from a single LLM generation
+
+    Replaces the /extract/structured + /enhance round trip, which ran two
+    generations over the same text. Falls back to the basic extractor and
+    enhancer when Ollama is unavailable or its output can't be parsed.
+    """
+
+    def __init__(self, ai_processor: AIProcessor, content_enhancer: ContentEnhancer):
+        self.ai_processor = ai_processor
+        self.content_enhancer = content_enhancer
+
+    async def process(
+        self,
+        text: str,
+        job_description: Optional[str] = None,
+        provider: str = "auto",
+        job_id: Optional[str] = None,
+        scoring: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Return {"structured_data": ..., "enhancement": ...} for the resume text"""
+
+        logger.info("Starting combined processing", job_id=job_id, provider=provider, text_length=len(text))
+
+        with tracer.span("extract_enhance", requested_provider=provider, chars=len(text)) as span:
+            if provider == "auto":
+                provider = await self.ai_processor._select_best_provider()
+            span.set_attributes(provider=provider)
+
+            result = None
+            if provider == "ollama":
+                try:
+                    result = await self._process_with_ollama(text, job_description, job_id)
+                except Exception as e:
+                    logger.error("Combined processing failed, falling back to basic", job_id=job_id, error=str(e))
+                    span.set_attributes(fallback_reason=str(e))
+
+            if result is None:
+                # Other providers only exist for extraction; the basic paths cost no LLM call
+                structured_data = await self.ai_processor.process_resume(text, "basic" if provider == "ollama" else provider, job_id)
+                enhancement = await self.content_enhancer._enhance_with_basic(text, job_description, job_id)
+                enhancement.pop("enhanced_content", None)
+                result = {"structured_data": structured_data, "enhancement": enhancement}
+
+            result["enhancement"]["quality_tier"] = result["structured_data"]["quality_tier"]
+            span.set_attributes(quality_tier=result["structured_data"]["quality_tier"])
+
+            if job_description:
+                result["enhancement"].update(await self.content_enhancer.score_match(text, job_description, scoring))
+            return result
+
+    async def _process_with_ollama(self, text: str, job_description: Optional[str], job_id: Optional[str]) -> Dict[str, Any]:
+        prompt = self._build_prompt(text, job_description)
+        prompt_tokens = estimate_tokens(prompt)
+        num_predict = token_budget.cap("combined", prompt_tokens, 1200)
+
+        model = await model_router.choose("combined", prompt, num_predict)
+        if model is None:
+            raise Exception("No Ollama models available")
+
+        tier, model, degraded_reason = await quality_planner.plan("combined", model)
+        if tier == "basic":
+            enhancement = await self.content_enhancer._enhance_with_basic(text, job_description, job_id)
+            enhancement.pop("enhanced_content", None)
+            structured_data = dict(self.ai_processor._basic_structured(text), quality_tier="basic", degraded_reason=degraded_reason)
+            return {"structured_data": structured_data, "enhancement": enhancement}
+        if tier == "reduced":
+            prompt = self._build_prompt(text, job_description, reduced=True)
+            prompt_tokens = estimate_tokens(prompt)
+            num_predict = min(num_predict, REDUCED_NUM_PREDICT + 200)
+
+        with tracer.span("llm.generate", task="combined", model=model, prompt_tokens=prompt_tokens, num_predict=num_predict, quality_tier=tier) as span:
+            started = time.perf_counter()
+            async with lazy_import("httpx").AsyncClient() as client:
+                result = await generate(
+                    client,
+                    "combined",
+                    model,
+                    prompt,
+                    {
+                        "temperature": 0.1,
+                        "top_p": 0.9,
+                        "num_predict": num_predict
+                    },
+                    timeout=120,
+                    json_object=True,
+                    headers=tracer.headers(),
+                    # Constrain decoding to valid JSON so both halves parse
+                    format="json"
+                )
+            span.set_attributes(done_reason=result.get("done_reason"), **generation_attributes(result, (time.perf_counter() - started) * 1000))
+        model_router.record(model, result)
+        quality_planner.observe("combined", tier, model, result)
+        if tier == "full":
+            token_budget.observe("combined", prompt_tokens, result)
+        parsed = json.loads(result.get("response", ""))
+        if not isinstance(parsed, dict):
+            raise Exception("Ollama returned non-object JSON")
+
+        enhancement = parsed.pop("enhancement", None) or {}
+        structured_data = dict(parsed, provider_used="ollama", extraction_method="ai_structured", model_used=model, quality_tier=tier)
+        if degraded_reason:
+            structured_data["degraded_reason"] = degraded_reason
+
+        suggestions = [str(s).strip() for s in enhancement.get("suggestions") or [] if str(s).strip()]
+        logger.info("Combined processing completed", job_id=job_id, model=model, suggestions=len(suggestions))
+        return {
+            "structured_data": structured_data,
+            "enhancement": {
+                "suggestions": suggestions[:7],
+                "match_rationale": enhancement.get("match_rationale"),
+                "match_score": self.content_enhancer.calculate_match_score(text, job_description),
+                "provider_used": f"ollama-{model}",
+                "enhancement_method": "ai_suggestions"
+            }
+        }
+
+    def _build_prompt(self, text: str, job_description: Optional[str], reduced: bool = False) -> str:
+        """Extraction schema plus an "enhancement" object, answered in one JSON document"""
+        prompt = self.ai_processor._build_extraction_prompt(text, reduced).rstrip()
+        prompt += """
+
+Also add an "enhancement" field to the same JSON object:
+
+  "enhancement": {
+    "suggestions": ["3-7 specific, actionable improvements: action verbs, quantified results, keywords"],
+    "match_rationale": "2-3 sentences on how well the resume fits the target job, or null without one"
+  }
+
+Return only the JSON object.
+"""
+        if job_description:
+            prompt += f"""
+Target Job Description:
+{job_description[:800]}
+
+Tailor the suggestions to this job: skills to emphasize, experience to highlight and missing keywords.
+"""
+        return prompt
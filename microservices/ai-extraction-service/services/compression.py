@@ -0,0 +1,91 @@
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best encoding the client accepts: br (if installed), then gzip"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip()] = quality
+
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+class CompressionMiddleware:
+    """Compress responses above a size threshold with brotli or gzip, per Accept-Encoding"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            encoding = negotiate_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+            if encoding == "br":
+                await BrotliResponder(self.app, self.minimum_size, self.brotli_quality)(scope, receive, send)
+                return
+            if encoding == "gzip":
+                await GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+class BrotliResponder:
+    """Brotli-compress single-message responses; streamed or pre-encoded bodies pass through"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.quality = quality
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.started = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_brotli)
+
+    async def send_with_brotli(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Hold the headers until the body shows whether we compress
+            self.initial_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.started:
+            await self.send(message)
+            return
+
+        self.started = True
+        body = message.get("body", b"")
+        headers = MutableHeaders(raw=self.initial_message["headers"])
+        if (
+            "content-encoding" not in headers
+            and not message.get("more_body", False)
+            and len(body) >= self.minimum_size
+        ):
+            body = brotli.compress(body, quality=self.quality)
+            headers["Content-Encoding"] = "br"
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            message["body"] = body
+
+        await self.send(self.initial_message)
+        await self.send(message)
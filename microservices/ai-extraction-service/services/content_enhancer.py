@@ -1,63 +1,99 @@
 import structlog
-import httpx
-import os
-from typing import Dict, Any, Optional
+import re
+import time
+from typing import Dict, Any, Optional, List, Tuple
 from config import settings
+from services.cache import LRUCache
+from services.resume_sections import split_sections, content_hash
+from services.embeddings import EmbeddingClient, semantic_match
+from services.model_router import model_router, estimate_tokens
+from services.tracing import tracer, annotate, generation_attributes
+from services.ollama_stream import generate, token_budget
+from services.quality_tiers import quality_planner
+from services.startup import lazy_import
 
 logger = structlog.get_logger()
 
+# Common stop words ignored by keyword extraction and match scoring
+STOP_WORDS = frozenset({
+    'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with',
+    'by', 'from', 'up', 'about', 'into', 'through', 'during', 'before',
+    'after', 'above', 'below', 'between', 'among', 'through', 'during',
+    'before', 'after', 'above', 'below', 'up', 'down', 'out', 'off', 'over',
+    'under', 'again', 'further', 'then', 'once', 'here', 'there', 'when',
+    'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more',
+    'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own',
+    'same', 'so', 'than', 'too', 'very', 'can', 'will', 'just', 'should'
+})
+
+# "### EXPERIENCE", "**Experience:**", "Experience:" etc. as echoed back by the model
+SECTION_HEADING_PATTERN = re.compile(r'^(?:#+\s*|\*\*)?([A-Za-z_ 0-9]+?)(?:\*\*)?:?(?:\*\*)?$')
+
 class ContentEnhancer:
     """Service for enhancing resume content using local Ollama - Simple and Reliable"""
     
     def __init__(self):
-        self.ollama_url = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
-        logger.info(f"ContentEnhancer initialized with Ollama at: {self.ollama_url}")
+        # Per-section suggestions keyed by model, section text hash and JD hash
+        self.section_cache = LRUCache(settings.ENHANCEMENT_CACHE_SIZE, settings.ENHANCEMENT_CACHE_TTL)
+        self.embedder = EmbeddingClient()
+        logger.info(f"ContentEnhancer initialized with Ollama at: {', '.join(settings.OLLAMA_BASE_URLS)}")
     
     async def enhance_resume(
         self, 
         resume_content: str, 
         job_description: Optional[str] = None,
         provider: str = "ollama",
-        job_id: Optional[str] = None
+        job_id: Optional[str] = None,
+        scoring: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Enhance resume content using local Ollama (with basic fallback)"""
+        """Enhance resume content using local Ollama (with basic fallback)
+        
+        `scoring` picks the match-score method ("keyword" or "semantic"),
+        defaulting to settings.MATCH_SCORING.
+        """
         
         logger.info("Starting content enhancement", job_id=job_id, provider=provider)
         
-        try:
-            if provider == "ollama":
-                return await self._enhance_with_ollama(resume_content, job_description, job_id)
-            else:
-                # For any other provider, use basic enhancement
-                return await self._enhance_with_basic(resume_content, job_description, job_id)
-                
-        except Exception as e:
-            logger.error("Enhancement failed, falling back to basic", error=str(e), provider=provider)
-            return await self._enhance_with_basic(resume_content, job_description, job_id)
-    
-    async def _check_ollama_availability(self) -> bool:
-        """Check if Ollama is available and has models"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.ollama_url}/api/tags", timeout=5)
-                if response.status_code == 200:
-                    models = response.json().get('models', [])
-                    return len(models) > 0
-        except Exception as e:
-            logger.warning(f"Ollama availability check failed: {e}")
-        return False
+        with tracer.span("enhance", provider=provider, chars=len(resume_content), has_job_description=bool(job_description)):
+            try:
+                if provider == "ollama":
+                    result = await self._enhance_with_ollama(resume_content, job_description, job_id)
+                else:
+                    # For any other provider, use basic enhancement
+                    result = await self._enhance_with_basic(resume_content, job_description, job_id)
+                    
+            except Exception as e:
+                logger.error("Enhancement failed, falling back to basic", error=str(e), provider=provider)
+                annotate(fallback_reason=str(e))
+                result = await self._enhance_with_basic(resume_content, job_description, job_id)
+            
+            result.setdefault("quality_tier", "full" if result.get("model_used") else "basic")
+            annotate(quality_tier=result["quality_tier"])
+            
+            # Both paths already carry the keyword score; only semantic scoring needs another pass
+            if job_description and (scoring or settings.MATCH_SCORING) == "semantic":
+                result.update(await self.score_match(resume_content, job_description, "semantic"))
+            return result
     
-    async def _get_available_models(self) -> list:
-        """Get list of available Ollama models"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.ollama_url}/api/tags", timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    return [model['name'] for model in data.get('models', [])]
-        except Exception as e:
-            logger.warning(f"Failed to get Ollama models: {e}")
-        return []
+    async def score_match(
+        self,
+        resume_content: str,
+        job_description: str,
+        scoring: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Score the resume against the JD, falling back to keyword overlap if embeddings are unavailable"""
+        scoring = scoring or settings.MATCH_SCORING
+        if scoring == "semantic":
+            try:
+                result = await semantic_match(self.embedder, resume_content, job_description)
+                return dict(result, scoring="semantic")
+            except Exception as e:
+                logger.warning("Semantic scoring failed, using keyword overlap", error=str(e))
+        
+        return {
+            "match_score": self.calculate_match_score(resume_content, job_description),
+            "scoring": "keyword"
+        }
     
     async def _enhance_with_ollama(
         self, 
@@ -67,70 +103,117 @@ class ContentEnhancer:
     ) -> Dict[str, Any]:
         """Enhance content using local Ollama"""
         
-        # Check if Ollama is available
-        if not await self._check_ollama_availability():
-            logger.warning("Ollama not available, falling back to basic enhancement")
-            return await self._enhance_with_basic(resume_content, job_description, job_id)
-        
-        # Get available models
-        available_models = await self._get_available_models()
-        if not available_models:
+        # Route on the full resume + JD size so the choice (and the section cache keys
+        # that depend on it) stays stable when only some sections change
+        model_to_use = await model_router.choose(
+            "enhancement",
+            self._build_enhancement_prompt([("resume", resume_content)], job_description),
+            800
+        )
+        if model_to_use is None:
             logger.warning("No Ollama models available, using basic enhancement")
+            annotate(fallback_reason="No Ollama models available")
             return await self._enhance_with_basic(resume_content, job_description, job_id)
         
-        # Preferred models in order of preference
-        preferred_models = ["llama3.2", "llama2", "mistral", "phi3", "gemma"]
-        model_to_use = None
+        # Reduced runs the same per-section prompt on the smallest model
+        tier, model_to_use, degraded_reason = await quality_planner.plan("enhancement", model_to_use)
+        if tier == "basic":
+            result = await self._enhance_with_basic(resume_content, job_description, job_id)
+            return dict(result, quality_tier="basic", degraded_reason=degraded_reason)
         
-        # Find the first available preferred model
-        for model in preferred_models:
-            if any(model in available_model for available_model in available_models):
-                model_to_use = next(m for m in available_models if model in m)
-                break
+        sections = split_sections(resume_content)
+        jd_hash = content_hash(job_description or "")
+        section_keys = {
+            name: f"{model_to_use}:{name}:{content_hash(body)}:{jd_hash}"
+            for name, body in sections
+        }
         
-        # If no preferred model found, use the first available model
-        if not model_to_use:
-            model_to_use = available_models[0]
-            
-        logger.info(f"Using Ollama model: {model_to_use}")
+        # Only sections whose text (or target JD) changed since the last run go to the model
+        section_results = {}
+        changed_sections = []
+        for name, body in sections:
+            cached = self.section_cache.get(section_keys[name])
+            if cached is not None:
+                section_results[name] = dict(cached, cached=True)
+            else:
+                changed_sections.append((name, body))
         
-        prompt = self._build_enhancement_prompt(resume_content, job_description)
+        logger.info(
+            f"Using Ollama model: {model_to_use}",
+            job_id=job_id,
+            sections=len(sections),
+            regenerated=len(changed_sections)
+        )
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.ollama_url}/api/generate",
-                    json={
-                        "model": model_to_use,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "temperature": 0.3,
-                            "top_p": 0.9,
-                            "num_predict": 800
-                        }
-                    },
-                    timeout=120  # 2 minutes for local processing
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    ai_response = result.get("response", "")
+        ai_response = None
+        if changed_sections:
+            prompt = self._build_enhancement_prompt(changed_sections, job_description)
+            
+            async with lazy_import("httpx").AsyncClient() as client:
+                try:
+                    prompt_tokens = estimate_tokens(prompt)
+                    num_predict = token_budget.cap("enhancement", prompt_tokens, min(800, 250 * len(changed_sections)))
+                    with tracer.span(
+                        "llm.generate",
+                        task="enhancement",
+                        model=model_to_use,
+                        prompt_tokens=prompt_tokens,
+                        num_predict=num_predict,
+                        sections=len(changed_sections),
+                        quality_tier=tier
+                    ) as span:
+                        started = time.perf_counter()
+                        result = await generate(
+                            client,
+                            "enhancement",
+                            model_to_use,
+                            prompt,
+                            {
+                                "temperature": 0.3,
+                                "top_p": 0.9,
+                                "num_predict": num_predict
+                            },
+                            timeout=120,  # 2 minutes for local processing
+                            headers=tracer.headers()
+                        )
+                        span.set_attributes(done_reason=result.get("done_reason"), **generation_attributes(result, (time.perf_counter() - started) * 1000))
                     
+                    model_router.record(model_to_use, result)
+                    quality_planner.observe("enhancement", tier, model_to_use, result)
+                    token_budget.observe("enhancement", prompt_tokens, result)
+                    ai_response = result.get("response", "")
                     if not ai_response:
                         logger.warning("Empty response from Ollama, using basic enhancement")
+                        annotate(fallback_reason="Empty response from Ollama")
                         return await self._enhance_with_basic(resume_content, job_description, job_id)
-                    
-                    enhanced_result = self._parse_enhancement_response(ai_response, resume_content, job_description, f"ollama-{model_to_use}")
-                    enhanced_result["model_used"] = model_to_use
-                    return enhanced_result
-                else:
-                    logger.error(f"Ollama request failed with status: {response.status_code}")
+                        
+                except Exception as e:
+                    logger.error("Ollama enhancement failed", error=str(e))
+                    annotate(fallback_reason=str(e))
                     return await self._enhance_with_basic(resume_content, job_description, job_id)
-                    
-            except Exception as e:
-                logger.error("Ollama enhancement failed", error=str(e))
-                return await self._enhance_with_basic(resume_content, job_description, job_id)
+            
+            by_section = self._split_suggestions_by_section(ai_response, [name for name, _ in changed_sections])
+            for name, body in changed_sections:
+                result = {
+                    "suggestions": by_section.get(name, []),
+                    "match_score": self.calculate_match_score(body, job_description) if job_description else 0
+                }
+                # Suggestions we couldn't attribute to a section aren't cached, so that section is retried next time
+                if name in by_section:
+                    self.section_cache.set(section_keys[name], result)
+                section_results[name] = dict(result, cached=False)
+        
+        enhanced_result = self._parse_enhancement_response(
+            ai_response or "",
+            resume_content,
+            job_description,
+            f"ollama-{model_to_use}",
+            section_results=[dict(section_results[name], section=name) for name, _ in sections]
+        )
+        enhanced_result.update(model_used=model_to_use, quality_tier=tier)
+        if degraded_reason:
+            enhanced_result["degraded_reason"] = degraded_reason
+        return enhanced_result
     
     async def _enhance_with_basic(
         self, 
@@ -186,20 +269,25 @@ class ContentEnhancer:
         score = (matches / total_keywords) * 100
         return round(score, 2)
     
-    def _build_enhancement_prompt(self, resume_content: str, job_description: Optional[str]) -> str:
-        """Build enhancement prompt for AI models"""
+    def _build_enhancement_prompt(self, sections: List[Tuple[str, str]], job_description: Optional[str]) -> str:
+        """Build enhancement prompt for AI models over the given resume sections"""
+        
+        # Split the resume budget evenly so a long early section can't crowd out the rest
+        per_section_chars = max(300, 1500 // len(sections))
+        resume_content = "\n\n".join(
+            f"### {name.upper()}\n{body[:per_section_chars]}" for name, body in sections
+        )
         
         base_prompt = f"""
-Please analyze the following resume and provide specific suggestions for improvement:
+Please analyze the following resume sections and provide specific suggestions for improvement:
 
-Resume Content:
-{resume_content[:1500]}
+{resume_content}
 
-Please provide:
-1. 3-5 specific suggestions for improving this resume
-2. Ways to better highlight relevant experience and skills
-3. Suggestions for strengthening the professional summary
-4. Tips for better keyword optimization
+For each section above, repeat its heading exactly (for example "### {sections[0][0].upper()}")
+and list 2-3 specific suggestions as bullet points, covering:
+1. Ways to better highlight relevant experience and skills
+2. Stronger wording with action verbs and quantifiable results
+3. Tips for better keyword optimization
 
 Focus on actionable, practical advice.
 """
@@ -209,7 +297,7 @@ Focus on actionable, practical advice.
 Target Job Description:
 {job_description[:800]}
 
-Additionally, suggest how to better align the resume with this specific job:
+Additionally, suggest how to better align each section with this specific job:
 - Which skills should be emphasized more
 - What experience should be highlighted
 - How to incorporate relevant keywords naturally
@@ -222,12 +310,16 @@ Additionally, suggest how to better align the resume with this specific job:
         ai_response: str, 
         original_content: str, 
         job_description: Optional[str],
-        provider: str
+        provider: str,
+        section_results: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """Parse AI enhancement response into structured format"""
         
-        # Extract suggestions from AI response
-        suggestions = self._extract_suggestions_from_text(ai_response)
+        # Extract suggestions from AI response, merging in cached per-section results
+        if section_results:
+            suggestions = [s for result in section_results for s in result["suggestions"]][:7]
+        else:
+            suggestions = self._extract_suggestions_from_text(ai_response)
         
         # Calculate match score if job description provided
         match_score = 0
@@ -239,10 +331,34 @@ Additionally, suggest how to better align the resume with this specific job:
             "suggestions": suggestions,
             "match_score": match_score,
             "ai_feedback": ai_response,
+            "section_results": section_results or [],
             "provider_used": provider,
             "enhancement_method": "ai_suggestions"
         }
     
+    def _split_suggestions_by_section(self, ai_response: str, section_names: List[str]) -> Dict[str, list]:
+        """Attribute suggestions in the AI response to the section headings it repeated"""
+        wanted = {name.lower(): name for name in section_names}
+        buffers: Dict[str, List[str]] = {}
+        current = None
+        
+        for line in ai_response.split('\n'):
+            heading = SECTION_HEADING_PATTERN.match(line.strip())
+            if heading and heading.group(1).strip().lower() in wanted:
+                current = wanted[heading.group(1).strip().lower()]
+                buffers.setdefault(current, [])
+            elif current:
+                buffers[current].append(line)
+        
+        # A single section needs no headings to be attributed
+        if not buffers and len(section_names) == 1:
+            buffers[section_names[0]] = [ai_response]
+        
+        return {
+            name: self._extract_suggestions_from_text('\n'.join(lines))[:5]
+            for name, lines in buffers.items()
+        }
+    
     def _extract_suggestions_from_text(self, text: str) -> list:
         """Extract actionable suggestions from AI response text"""
         suggestions = []
@@ -258,7 +374,7 @@ Additionally, suggest how to better align the resume with this specific job:
                 if len(cleaned_line) > 20:  # Only meaningful suggestions
                     suggestions.append(cleaned_line)
             
-            elif cleaned_line.startswith(('•', '-', '*')) or cleaned_line.match(r'^\d+\.'):
+            elif cleaned_line.startswith(('•', '-', '*')) or re.match(r'^\d+\.', cleaned_line):
                 cleaned_line = cleaned_line.lstrip('•-*123456789. ')
                 if len(cleaned_line) > 15:
                     suggestions.append(cleaned_line)
@@ -272,25 +388,11 @@ Additionally, suggest how to better align the resume with this specific job:
     
     def _extract_keywords(self, text: str) -> list:
         """Extract relevant keywords from text"""
-        import re
-        
-        # Remove common stop words
-        stop_words = {
-            'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with',
-            'by', 'from', 'up', 'about', 'into', 'through', 'during', 'before',
-            'after', 'above', 'below', 'between', 'among', 'through', 'during',
-            'before', 'after', 'above', 'below', 'up', 'down', 'out', 'off', 'over',
-            'under', 'again', 'further', 'then', 'once', 'here', 'there', 'when',
-            'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more',
-            'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own',
-            'same', 'so', 'than', 'too', 'very', 'can', 'will', 'just', 'should'
-        }
-        
         # Extract words (2+ characters, alphanumeric)
         words = re.findall(r'\b[a-zA-Z][a-zA-Z0-9]*\b', text.lower())
         
         # Filter out stop words and short words
-        keywords = [word for word in words if len(word) >= 3 and word not in stop_words]
+        keywords = [word for word in words if len(word) >= 3 and word not in STOP_WORDS]
         
         # Return unique keywords
         return list(set(keywords))
\ No newline at end of file
@@ -0,0 +1,56 @@
+import re
+from typing import Any, Dict, Optional
+
+import structlog
+
+from config import settings
+from services.cache import SharedCache
+from services.resume_sections import content_hash
+from services.tenancy import current_tenant
+
+logger = structlog.get_logger()
+
+REDIS_KEY_PREFIX = "ai-extraction:doc:"
+CONTENT_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+class DocumentStore:
+    """TTL-bounded store of extracted documents, so later calls can pass a reference instead of the text
+
+    Documents are keyed by content hash; a job_id is an alias for the hash.
+    Both are scoped to the caller's tenant (X-Tenant-Id), so a reference or
+    guessed job_id never resolves to another tenant's document, and an
+    alias, once set, is never re-pointed at different content. Entries live
+    in process memory and, when DOCUMENT_STORE_REDIS is set, in Redis too,
+    so a reference resolves on any worker or replica.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[int] = None, redis_url: Optional[str] = None):
+        self.cache = SharedCache(
+            "Document store",
+            REDIS_KEY_PREFIX,
+            max_entries or settings.DOCUMENT_STORE_SIZE,
+            ttl_seconds or settings.DOCUMENT_STORE_TTL,
+            redis_url if redis_url is not None else (settings.REDIS_URL if settings.DOCUMENT_STORE_REDIS else None)
+        )
+
+    async def put(self, text: str, structured_data: Optional[Dict[str, Any]] = None, job_id: Optional[str] = None) -> str:
+        """Store a document and return its reference (the content hash)"""
+        tenant = current_tenant.get()
+        ref = content_hash(text)
+        await self.cache.set({f"{tenant}:{ref}": {"content_hash": ref, "text": text, "structured_data": structured_data}})
+        if job_id:
+            aliased = await self.cache.set_if_absent(f"job:{tenant}:{job_id}", ref)
+            if aliased != ref:
+                logger.warning("Kept existing job_id alias for different content", job_id=job_id, tenant=tenant)
+        return ref
+
+    async def get(self, ref: str) -> Optional[Dict[str, Any]]:
+        """Look a document of the caller's tenant up by content hash or job_id; None if unknown or expired"""
+        tenant = current_tenant.get()
+        content_ref = ref if CONTENT_HASH_PATTERN.match(ref) else await self.cache.get(f"job:{tenant}:{ref}")
+        if content_ref is None:
+            return None
+        return await self.cache.get(f"{tenant}:{content_ref}")
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
@@ -0,0 +1,86 @@
+import re
+import zipfile
+from typing import Iterator, List
+from xml.etree.ElementTree import iterparse
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+_HEADER_PART = re.compile(r'^word/header\d*\.xml$')
+
+def iter_docx_lines(file_path: str) -> Iterator[str]:
+    """Yield the text of a DOCX in reading order without building the python-docx object model
+
+    Headers come first (names and contact details often live there), then the
+    body. Paragraphs (including those in text boxes) are yielded as lines;
+    table rows are yielded as their cell texts joined with " | ". Parts are
+    streamed out of the zip and parsed incrementally, so memory stays flat
+    regardless of document size.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        header_parts = sorted(name for name in archive.namelist() if _HEADER_PART.match(name))
+        for part in header_parts + ["word/document.xml"]:
+            with archive.open(part) as stream:
+                yield from _iter_part_lines(stream)
+
+def _iter_part_lines(stream) -> Iterator[str]:
+    paragraphs: List[List[str]] = []  # text runs of the paragraphs being read (text boxes nest)
+    rows: List[List[str]] = []        # cells of the table rows being read (tables nest)
+    cells: List[List[str]] = []       # paragraphs of the table cells being read
+    skip_depth = 0                    # > 0 inside mc:Fallback, which duplicates the mc:Choice content
+    depth = 0
+    container = None                  # w:body or w:hdr, cleared as each top-level block finishes
+    container_depth = 0
+
+    for event, elem in iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            depth += 1
+            if skip_depth or tag == MC_FALLBACK:
+                skip_depth += 1
+            elif tag == W_NS + "p":
+                paragraphs.append([])
+            elif tag == W_NS + "tr":
+                rows.append([])
+            elif tag == W_NS + "tc":
+                cells.append([])
+            elif tag in (W_NS + "body", W_NS + "hdr"):
+                container, container_depth = elem, depth
+            continue
+
+        depth -= 1
+        if skip_depth:
+            skip_depth -= 1
+            elem.clear()
+            continue
+
+        if tag == W_NS + "t" and paragraphs:
+            paragraphs[-1].append(elem.text or "")
+        elif tag == W_NS + "tab" and paragraphs:
+            paragraphs[-1].append("\t")
+        elif tag in (W_NS + "br", W_NS + "cr") and paragraphs:
+            paragraphs[-1].append(" ")
+        elif tag == W_NS + "p":
+            text = "".join(paragraphs.pop()).strip()
+            if text:
+                if cells:
+                    cells[-1].append(text)
+                else:
+                    yield text
+        elif tag == W_NS + "tc":
+            cell_text = " ".join(cells.pop())
+            if rows:
+                rows[-1].append(cell_text)
+        elif tag == W_NS + "tr":
+            row_text = " | ".join(cell for cell in rows.pop() if cell)
+            if row_text:
+                if cells:
+                    cells[-1].append(row_text)
+                else:
+                    yield row_text
+
+        # Drop finished top-level blocks so the tree never holds more than one
+        if container is not None and depth == container_depth:
+            container.clear()
+        else:
+            elem.clear()
@@ -0,0 +1,149 @@
+import re
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from config import settings
+from services.cache import LRUCache
+from services.ollama_pool import ollama_pool
+from services.resume_sections import split_sections, content_hash
+from services.startup import lazy_import
+from services.tracing import tracer
+
+logger = structlog.get_logger()
+
+# JD lines shorter than this are headings or filler, not requirements
+MIN_REQUIREMENT_CHARS = 15
+MAX_REQUIREMENTS = 40
+MAX_CHUNK_CHARS = 500
+
+_BULLET_PREFIX = re.compile(r'^[\s•\-\*\d\.\)]+')
+
+class EmbeddingClient:
+    """Embeddings from Ollama, cached by content hash; from `base_url` if given, else the server pool"""
+
+    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None):
+        self.base_url = base_url
+        self.model = model or settings.EMBEDDING_MODEL
+        self.cache = LRUCache(settings.EMBEDDING_CACHE_SIZE)
+
+    async def embed(self, texts: List[str]):
+        """Return an (n, dim) float32 matrix of L2-normalized embeddings, one row per text"""
+        np = lazy_import("numpy")
+
+        keys = [f"{self.model}:{content_hash(text)}" for text in texts]
+        vectors: Dict[str, Any] = {}
+        missing = []
+        for key, text in zip(keys, texts):
+            if key in vectors:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                vectors[key] = cached
+            else:
+                vectors[key] = None
+                missing.append((key, text))
+
+        if missing:
+            with tracer.span("embed", model=self.model, texts=len(missing), cached=len(texts) - len(missing)):
+                fetched = await self._fetch([text for _, text in missing])
+            matrix = np.asarray(fetched, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.where(norms == 0, 1, norms)
+            for (key, _), row in zip(missing, matrix):
+                self.cache.set(key, row)
+                vectors[key] = row
+            logger.info("Embeddings computed", model=self.model, computed=len(missing), cached=len(texts) - len(missing))
+
+        return np.stack([vectors[key] for key in keys])
+
+    async def _fetch(self, texts: List[str]) -> List[List[float]]:
+        if self.base_url:
+            return await self._fetch_from(self.base_url, texts)
+        return await ollama_pool.request(self.model, lambda base_url: self._fetch_from(base_url, texts))
+
+    async def _fetch_from(self, base_url: str, texts: List[str]) -> List[List[float]]:
+        async with lazy_import("httpx").AsyncClient() as client:
+            # Batched endpoint (Ollama >= 0.3)
+            response = await client.post(
+                f"{base_url}/api/embed",
+                json={"model": self.model, "input": texts},
+                timeout=settings.AI_TIMEOUT
+            )
+            if response.status_code == 200:
+                return response.json()["embeddings"]
+            if response.status_code != 404:
+                raise Exception(f"Ollama embed request failed: {response.status_code}")
+
+            # Older servers only embed one prompt per request
+            embeddings = []
+            for text in texts:
+                response = await client.post(
+                    f"{base_url}/api/embeddings",
+                    json={"model": self.model, "prompt": text},
+                    timeout=settings.AI_TIMEOUT
+                )
+                if response.status_code != 200:
+                    raise Exception(f"Ollama embeddings request failed: {response.status_code}")
+                embeddings.append(response.json()["embedding"])
+            return embeddings
+
+def resume_chunks(resume_content: str) -> List[Dict[str, str]]:
+    """Split a resume into section chunks small enough to embed meaningfully"""
+    chunks = []
+    for name, body in split_sections(resume_content):
+        current = []
+        size = 0
+        for line in body.split("\n"):
+            if current and size + len(line) > MAX_CHUNK_CHARS:
+                chunks.append({"section": name, "text": "\n".join(current)})
+                current, size = [], 0
+            current.append(line)
+            size += len(line) + 1
+        if current:
+            chunks.append({"section": name, "text": "\n".join(current)})
+    return chunks
+
+def job_requirements(job_description: str) -> List[str]:
+    """Split a job description into individual requirement lines"""
+    requirements = []
+    for line in re.split(r'[\n;]|(?<=\.)\s', job_description):
+        line = _BULLET_PREFIX.sub("", line).strip()
+        if len(line) >= MIN_REQUIREMENT_CHARS:
+            requirements.append(line)
+    return requirements[:MAX_REQUIREMENTS] or [job_description.strip()]
+
+async def semantic_match(embedder: EmbeddingClient, resume_content: str, job_description: str) -> Dict[str, Any]:
+    """Score a resume against a JD by embedding similarity of requirements to resume sections
+
+    Each requirement counts as covered when its best-matching resume chunk has
+    cosine similarity >= SEMANTIC_MATCH_THRESHOLD; the score is the covered
+    percentage, comparable to the keyword-overlap score.
+    """
+    chunks = resume_chunks(resume_content)
+    requirements = job_requirements(job_description)
+    if not chunks:
+        return {"match_score": 0.0, "requirements": []}
+
+    resume_matrix = await embedder.embed([chunk["text"] for chunk in chunks])
+    requirement_matrix = await embedder.embed(requirements)
+
+    # Rows are unit vectors, so one matrix product gives every cosine similarity
+    similarities = requirement_matrix @ resume_matrix.T
+    best_chunk = similarities.argmax(axis=1)
+    best_similarity = similarities.max(axis=1)
+    covered = best_similarity >= settings.SEMANTIC_MATCH_THRESHOLD
+
+    return {
+        "match_score": round(float(covered.mean()) * 100, 2),
+        "requirements": [
+            {
+                "requirement": requirement,
+                "best_section": chunks[int(chunk_index)]["section"],
+                "similarity": round(float(similarity), 4),
+                "covered": bool(is_covered)
+            }
+            for requirement, chunk_index, similarity, is_covered
+            in zip(requirements, best_chunk, best_similarity, covered)
+        ]
+    }
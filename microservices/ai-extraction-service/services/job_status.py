@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from config import settings
+from services.cache import SharedCache
+
+REDIS_KEY_PREFIX = "ai-extraction:job:"
+JOB_STATUSES = ("queued", "running", "completed", "failed")
+
+class JobStatusStore:
+    """Status and result of background jobs, for /job/{job_id}/status
+
+    Sized, expired and shared like the document store: process memory, plus
+    Redis when DOCUMENT_STORE_REDIS is set, so whichever worker a poll lands
+    on can answer it.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[int] = None, redis_url: Optional[str] = None):
+        self.cache = SharedCache(
+            "Job status",
+            REDIS_KEY_PREFIX,
+            max_entries or settings.DOCUMENT_STORE_SIZE,
+            ttl_seconds or settings.DOCUMENT_STORE_TTL,
+            redis_url if redis_url is not None else (settings.REDIS_URL if settings.DOCUMENT_STORE_REDIS else None)
+        )
+
+    async def set(self, job_id: str, status: str, **fields: Any) -> Dict[str, Any]:
+        """Record the job's status; `fields` (result, error, parent_job_id...) replace the previous ones"""
+        if status not in JOB_STATUSES:
+            raise ValueError(f"Unknown job status '{status}'")
+        job = dict(fields, job_id=job_id, status=status, timestamp=datetime.utcnow().isoformat())
+        await self.cache.set({job_id: job})
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job's latest status; None if unknown or expired"""
+        # Redis first when shared: another worker may have moved the job on since we last saw it
+        return await self.cache.get(job_id, shared_first=True)
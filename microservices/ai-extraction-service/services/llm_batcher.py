@@ -0,0 +1,183 @@
+import asyncio
+import contextvars
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import structlog
+
+from config import settings
+from services.ollama_pool import ollama_pool
+from services.tenancy import TENANT_STATE_PRUNE_SIZE, current_tenant, tenant_quotas
+from services.tracing import annotate
+
+logger = structlog.get_logger()
+
+class _Pending:
+    __slots__ = ("call", "future", "tenant", "start_tag", "finish_tag", "context", "queued_at", "task")
+
+    def __init__(self, call: Callable[[], Awaitable[Any]], future: asyncio.Future, tenant: str, start_tag: float, finish_tag: float):
+        self.call = call
+        self.future = future
+        self.tenant = tenant
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        # Run the call in the submitter's context, so its trace span and headers carry over
+        self.context = contextvars.copy_context()
+        self.queued_at = time.perf_counter()
+        self.task: Optional[asyncio.Task] = None
+
+class GenerationBatcher:
+    """Admits generations into Ollama's parallel slots, per model, in fair order across tenants
+
+    Ollama decodes concurrent requests for a loaded model as one batch, up to
+    OLLAMA_NUM_PARALLEL slots, and a request arriving mid-generation joins
+    the running batch at its next step; beyond that, requests queue
+    server-side in arrival order. So there is nothing to gain from holding
+    requests back to start them together. Instead this keeps at most
+    LLM_PARALLEL_SLOTS in flight per model and healthy server that has it,
+    starting a request as soon as a slot is free, and decides here - not in
+    Ollama's FIFO - who gets the next free slot.
+
+    Waiting requests are served by weighted fair queuing across tenants: each
+    gets a virtual finish tag of its tenant's previous tag (or the current
+    virtual time, if later) plus its cost in tokens over the tenant's weight,
+    and free slots go to the smallest tags. A tenant with a deep backlog thus
+    gets its weighted share of slots, not all of them, and a tenant sending
+    its first request goes straight to the front. Requests of a tenant at its
+    concurrency or rate quota wait without holding up anyone else's. Once
+    nothing is waiting, virtual time jumps past every tag handed out and the
+    per-tenant tags are dropped, as in start-time fair queuing at the end of
+    a busy period.
+    """
+
+    def __init__(self, slots: Optional[int] = None):
+        self.slots = slots or settings.LLM_PARALLEL_SLOTS
+        self.pending: Dict[str, List[_Pending]] = {}
+        self.in_flight: Dict[str, int] = {}
+        # Re-dispatch once a rate-limited tenant's quota refills
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self.virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self.dispatched = 0
+
+    async def submit(self, model: str, call: Callable[[], Awaitable[Any]], cost: float = 1.0) -> Any:
+        """Run `call` (one generation on `model`, costing about `cost` tokens) once it gets a slot"""
+        tenant = current_tenant.get()
+        if tenant not in self._last_finish and len(self._last_finish) >= TENANT_STATE_PRUNE_SIZE:
+            # A tag virtual time has passed counts the same as none
+            self._last_finish = {name: tag for name, tag in self._last_finish.items() if tag > self.virtual_time}
+        start_tag = max(self.virtual_time, self._last_finish.get(tenant, 0.0))
+        finish_tag = start_tag + cost / tenant_quotas.weight(tenant)
+        self._last_finish[tenant] = finish_tag
+        item = _Pending(call, asyncio.get_running_loop().create_future(), tenant, start_tag, finish_tag)
+        queue = self.pending.setdefault(model, [])
+        queue.append(item)
+        self._dispatch(model)
+
+        try:
+            return await item.future
+        except asyncio.CancelledError:
+            if item.task is not None:
+                item.task.cancel()
+            raise
+
+    def _quota_refilled(self, model: str) -> None:
+        self._timers.pop(model, None)
+        self._dispatch(model)
+
+    def _dispatch(self, model: str) -> None:
+        timer = self._timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+
+        queue = self.pending.get(model, [])
+        # The caller gave up while waiting
+        queue[:] = [item for item in queue if not item.future.done()]
+        free = self.capacity(model) - self.in_flight.get(model, 0)
+        if not queue or free <= 0:
+            return
+
+        batch: List[_Pending] = []
+        blocked = set()
+        retry_after: Optional[float] = None
+        for item in sorted(queue, key=lambda item: item.finish_tag):
+            if len(batch) >= free:
+                break
+            if item.tenant in blocked:
+                continue
+            reason = tenant_quotas.try_acquire(item.tenant)
+            if reason is None:
+                batch.append(item)
+                continue
+            # Keep the tenant's own requests in order behind the one that was refused
+            blocked.add(item.tenant)
+            if reason == "rate":
+                wait = tenant_quotas.retry_after(item.tenant)
+                retry_after = wait if retry_after is None else min(retry_after, wait)
+
+        if retry_after is not None:
+            self._timers[model] = asyncio.get_running_loop().call_later(retry_after, self._quota_refilled, model)
+        if not batch:
+            return
+
+        dispatched = set(map(id, batch))
+        queue[:] = [item for item in queue if id(item) not in dispatched]
+        self.virtual_time = max(self.virtual_time, max(item.start_tag for item in batch))
+        if not any(self.pending.values()):
+            # No contention left to arbitrate; also keeps the tags from growing with every tenant id seen
+            self.virtual_time = max(self.virtual_time, max(self._last_finish.values(), default=0.0))
+            self._last_finish.clear()
+        self.in_flight[model] = self.in_flight.get(model, 0) + len(batch)
+        self.dispatched += len(batch)
+        loop = asyncio.get_running_loop()
+        for item in batch:
+            item.task = loop.create_task(self._run(model, item), context=item.context)
+
+    async def _run(self, model: str, item: _Pending) -> None:
+        wait = time.perf_counter() - item.queued_at
+        tenant_quotas.record_queue_time(item.tenant, model, wait)
+        annotate(**{"llm.slot_wait_ms": round(wait * 1000, 2)})
+        try:
+            result = await item.call()
+            if not item.future.done():
+                item.future.set_result(result)
+        except BaseException as e:
+            if not item.future.done():
+                if isinstance(e, asyncio.CancelledError):
+                    item.future.cancel()
+                else:
+                    item.future.set_exception(e)
+        finally:
+            self.in_flight[model] -= 1
+            tenant_quotas.release(item.tenant)
+            # A freed slot goes to whoever is waiting now.
+            # Other models too: a request there may have waited on this tenant's concurrency quota
+            for waiting_model in [name for name, queue in self.pending.items() if queue]:
+                self._dispatch(waiting_model)
+
+    def capacity(self, model: str) -> int:
+        """Generations the model can have in flight across the Ollama servers"""
+        return self.slots * ollama_pool.capacity(model)
+
+    def load(self, model: str) -> Tuple[int, int]:
+        """(waiting, in flight) generations for the model"""
+        waiting = sum(1 for item in self.pending.get(model, ()) if not item.future.done())
+        return waiting, self.in_flight.get(model, 0)
+
+    def idle(self) -> bool:
+        """True when nothing is waiting for a slot and some model has one free"""
+        return not any(self.pending.values()) and sum(self.in_flight.values()) < self.slots * ollama_pool.healthy_count()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "slots": self.slots,
+            "dispatched": self.dispatched,
+            "waiting": {model: len(queue) for model, queue in self.pending.items() if queue},
+            "waiting_by_tenant": dict(Counter(tenant_quotas.metric_label(item.tenant) for queue in self.pending.values() for item in queue)),
+            "in_flight": {model: count for model, count in self.in_flight.items() if count},
+            "capacity": {model: self.capacity(model) for model in self.in_flight},
+            "tenants": tenant_quotas.stats()
+        }
+
+generation_batcher = GenerationBatcher()
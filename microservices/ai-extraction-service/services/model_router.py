@@ -0,0 +1,161 @@
+import time
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from config import settings
+from services.cache import LRUCache
+from services.ollama_pool import ollama_pool
+
+logger = structlog.get_logger()
+
+# Rough chars-per-token for English prose; only used to size requests
+CHARS_PER_TOKEN = 4
+# Weight of the newest observation in the per-model throughput averages
+THROUGHPUT_EWMA_ALPHA = 0.3
+
+TASK_SLO_MS = {
+    "extraction": settings.EXTRACTION_LATENCY_SLO_MS,
+    "enhancement": settings.ENHANCEMENT_LATENCY_SLO_MS,
+    # One generation doing both jobs replaces two sequential calls
+    "combined": settings.EXTRACTION_LATENCY_SLO_MS + settings.ENHANCEMENT_LATENCY_SLO_MS,
+}
+# Inputs at or under this many tokens are simple enough for the smallest model that meets the SLO
+TASK_SIMPLE_MAX_TOKENS = {
+    "extraction": settings.EXTRACTION_SIMPLE_MAX_TOKENS,
+    "enhancement": settings.ENHANCEMENT_SIMPLE_MAX_TOKENS,
+    "combined": settings.EXTRACTION_SIMPLE_MAX_TOKENS,
+}
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+class ModelRouter:
+    """Picks an Ollama model per task and input size against a latency SLO
+
+    Latency is predicted from each model's observed prompt and generation
+    throughput (Ollama reports token counts and durations with every
+    response), falling back to a size-based prior until a model has been
+    seen. Simple inputs go to the smallest model that meets the SLO; larger
+    ones to the largest (best quality) model that still does. If none does,
+    the fastest wins. Decisions are cached per task and token bucket.
+    """
+
+    def __init__(self):
+        self.throughput: Dict[str, Dict[str, float]] = {}
+        self._reset_decisions()
+        self._models: List[Dict[str, Any]] = []
+        self._models_fetched_at = 0.0
+
+    async def available_models(self) -> List[Dict[str, Any]]:
+        """Routable models (name, size in bytes), smallest first; refreshed every ROUTING_TABLE_TTL seconds"""
+        if time.monotonic() - self._models_fetched_at < settings.ROUTING_TABLE_TTL:
+            return self._models
+
+        # Pulled on any healthy server; the pool sends each generation to one that has the model
+        models = [
+            {"name": name, "size": size}
+            for name, size in (await ollama_pool.models()).items()
+            # Embedding models can't generate
+            if "embed" not in name
+            and (not settings.ROUTING_MODEL_FAMILIES or any(family in name for family in settings.ROUTING_MODEL_FAMILIES))
+        ]
+        if not models:
+            logger.warning("No routable Ollama models on any healthy server")
+            # Retry soon rather than routing nothing for a whole TTL after a blip
+            self._models_fetched_at = time.monotonic() - settings.ROUTING_TABLE_TTL + 5
+            return []
+
+        models.sort(key=lambda model: model["size"])
+        if [m["name"] for m in models] != [m["name"] for m in self._models]:
+            self._reset_decisions()
+        self._models = models
+        self._models_fetched_at = time.monotonic()
+        return models
+
+    def predict_latency_ms(self, model: Dict[str, Any], prompt_tokens: int, output_tokens: int) -> float:
+        observed = self.throughput.get(model["name"])
+        if observed:
+            prompt_tps, generate_tps, overhead_ms = observed["prompt_tps"], observed["generate_tps"], observed["overhead_ms"]
+        else:
+            size_gb = max(model["size"] / 1e9, 0.1)
+            generate_tps = settings.ROUTING_PRIOR_TOKENS_PER_SEC_GB / size_gb
+            prompt_tps = generate_tps * 10
+            overhead_ms = 0.0
+        return overhead_ms + 1000 * (prompt_tokens / prompt_tps + output_tokens / generate_tps)
+
+    async def choose(self, task: str, prompt: str, max_output_tokens: int) -> Optional[str]:
+        """Name of the model to run `prompt` on, or None if Ollama has no routable models"""
+        models = await self.available_models()
+        if not models:
+            return None
+
+        prompt_tokens = estimate_tokens(prompt)
+        # Power-of-two buckets keep the decision table small
+        bucket = 1 << max(0, prompt_tokens - 1).bit_length()
+        key = f"{task}:{bucket}:{max_output_tokens}"
+        cached = self.decisions.get(key)
+        if cached is not None:
+            return cached
+
+        slo_ms = TASK_SLO_MS[task]
+        predictions = [(model, self.predict_latency_ms(model, bucket, max_output_tokens)) for model in models]
+        within_slo = [model for model, latency in predictions if latency <= slo_ms]
+        if not within_slo:
+            choice = min(predictions, key=lambda p: p[1])[0]
+        elif prompt_tokens <= TASK_SIMPLE_MAX_TOKENS[task]:
+            choice = within_slo[0]
+        else:
+            choice = within_slo[-1]
+
+        logger.info(
+            "Model routed",
+            task=task,
+            model=choice["name"],
+            prompt_tokens=prompt_tokens,
+            slo_ms=slo_ms,
+            predicted_ms={model["name"]: round(latency) for model, latency in predictions}
+        )
+        self.decisions.set(key, choice["name"])
+        return choice["name"]
+
+    def record(self, model: str, result: Dict[str, Any]) -> None:
+        """Fold the timing fields of an Ollama /api/generate response into the model's throughput"""
+        prompt_count, prompt_ns = result.get("prompt_eval_count"), result.get("prompt_eval_duration")
+        eval_count, eval_ns = result.get("eval_count"), result.get("eval_duration")
+        if not (prompt_count and prompt_ns and eval_count and eval_ns):
+            return
+
+        sample = {
+            "prompt_tps": prompt_count / (prompt_ns / 1e9),
+            "generate_tps": eval_count / (eval_ns / 1e9),
+            "overhead_ms": (result.get("load_duration") or 0) / 1e6,
+        }
+        observed = self.throughput.get(model)
+        if observed is None:
+            self.throughput[model] = dict(sample, samples=1)
+        else:
+            for field, value in sample.items():
+                observed[field] += THROUGHPUT_EWMA_ALPHA * (value - observed[field])
+            observed["samples"] += 1
+
+        # A model's first sample replaces its prior and can flip decisions; gradual
+        # drift is picked up as table entries expire
+        if observed is None:
+            self._reset_decisions()
+
+    def _reset_decisions(self) -> None:
+        self.decisions = LRUCache(256, ttl_seconds=settings.ROUTING_TABLE_TTL)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "models": [model["name"] for model in self._models],
+            "slo_ms": TASK_SLO_MS,
+            "throughput": {
+                model: {field: round(value, 2) for field, value in observed.items()}
+                for model, observed in self.throughput.items()
+            },
+            "decisions": self.decisions.stats()
+        }
+
+model_router = ModelRouter()
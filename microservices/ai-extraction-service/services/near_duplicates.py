@@ -0,0 +1,204 @@
+import copy
+import difflib
+import re
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import structlog
+
+from config import settings
+from services.basic_extractor import extract_basic
+from services.startup import lazy_import
+from services.tenancy import current_tenant
+
+logger = structlog.get_logger()
+
+NUM_PERMUTATIONS = 128
+# 16 bands of 8 rows: resumes above ~0.7 Jaccard almost always share a band;
+# candidates are then checked against NEAR_DUPLICATE_THRESHOLD on the full signature
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_WORDS = 3
+# Smallest prime above 2**32, so (a * x + b) for 32-bit x stays inside uint64
+_HASH_PRIME = 4294967311
+# Changed phrases shorter than this are too ambiguous to substitute into prior output
+MIN_SUBSTITUTION_CHARS = 3
+
+_WORD = re.compile(r'[a-z0-9+#.]+')
+
+def _shingles(text: str) -> Set[int]:
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {zlib.crc32(" ".join(words).encode())}
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode())
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+class NearDuplicateIndex:
+    """MinHash signatures of processed resumes with an LSH index over them
+
+    Signatures are over word 3-grams of the normalized text, so a changed
+    date or a reordered skill list moves the estimated Jaccard similarity
+    only slightly. Entries map to document-store references, where the text
+    and structured result live; the index itself holds only signatures and
+    is bounded to NEAR_DUPLICATE_INDEX_SIZE, least recently added first out.
+    Entries and buckets are per tenant (X-Tenant-Id), so a resume is only
+    ever matched against the same tenant's earlier ones.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.NEAR_DUPLICATE_INDEX_SIZE
+        self._permutations = None
+        self.signatures: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self.buckets: Dict[Tuple[str, int, bytes], Set[str]] = {}
+        self.lookups = 0
+        self.matches = 0
+
+    def signature(self, text: str):
+        """MinHash signature (NUM_PERMUTATIONS uint64 values) of the text"""
+        np = lazy_import("numpy")
+        if self._permutations is None:
+            # Fixed seed, so signatures are comparable across workers and restarts
+            rng = np.random.default_rng(20240611)
+            self._permutations = (
+                rng.integers(1, 2 ** 32 - 1, NUM_PERMUTATIONS, dtype=np.uint64)[:, None],
+                rng.integers(0, 2 ** 32 - 1, NUM_PERMUTATIONS, dtype=np.uint64)[:, None]
+            )
+        a, b = self._permutations
+        shingles = np.fromiter(_shingles(text), dtype=np.uint64)
+        return ((a * shingles[None, :] + b) % _HASH_PRIME).min(axis=1)
+
+    def _bands(self, tenant: str, signature) -> List[Tuple[str, int, bytes]]:
+        return [(tenant, band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()) for band in range(LSH_BANDS)]
+
+    def add(self, ref: str, signature) -> None:
+        """Index the caller's tenant's document `ref`"""
+        entry = (current_tenant.get(), ref)
+        if entry in self.signatures:
+            self._remove(entry)
+        self.signatures[entry] = signature
+        for key in self._bands(entry[0], signature):
+            self.buckets.setdefault(key, set()).add(ref)
+        while len(self.signatures) > self.max_entries:
+            self._remove(next(iter(self.signatures)))
+
+    def _remove(self, entry: Tuple[str, str]) -> None:
+        tenant, ref = entry
+        signature = self.signatures.pop(entry)
+        for key in self._bands(tenant, signature):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(ref)
+                if not bucket:
+                    del self.buckets[key]
+
+    def find(self, signature, threshold: Optional[float] = None) -> List[Tuple[str, float]]:
+        """The caller's tenant's indexed refs with estimated Jaccard similarity >= threshold, most similar first"""
+        threshold = settings.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        tenant = current_tenant.get()
+        self.lookups += 1
+        candidates = set()
+        for key in self._bands(tenant, signature):
+            candidates.update(self.buckets.get(key, ()))
+
+        scored = []
+        for ref in candidates:
+            similarity = float((self.signatures[(tenant, ref)] == signature).mean())
+            if similarity >= threshold:
+                scored.append((ref, similarity))
+        if scored:
+            self.matches += 1
+        return sorted(scored, key=lambda item: item[1], reverse=True)
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.signatures),
+            "max_entries": self.max_entries,
+            "threshold": settings.NEAR_DUPLICATE_THRESHOLD,
+            "lookups": self.lookups,
+            "matches": self.matches
+        }
+
+def _lines(text: str) -> List[str]:
+    return [line.strip() for line in text.split("\n") if line.strip()]
+
+def _phrase_changes(old_line: str, new_line: str) -> List[Tuple[str, str]]:
+    """Word-level (old phrase, new phrase) replacements between two versions of a line"""
+    old_words, new_words = old_line.split(), new_line.split()
+    matcher = difflib.SequenceMatcher(None, old_words, new_words, autojunk=False)
+    return [
+        (" ".join(old_words[i1:i2]), " ".join(new_words[j1:j2]))
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag == "replace"
+    ]
+
+def _substitute(value: Any, replacements: List[Tuple[re.Pattern, str]]) -> Any:
+    if isinstance(value, str):
+        for pattern, new in replacements:
+            value = pattern.sub(lambda _: new, value)
+        return value
+    if isinstance(value, list):
+        return [_substitute(item, replacements) for item in value]
+    if isinstance(value, dict):
+        return {key: _substitute(item, replacements) for key, item in value.items()}
+    return value
+
+def edited_line_count(prior_text: str, text: str) -> Optional[int]:
+    """Lines edited in place between two versions, or None if lines were added or removed
+
+    apply_basic_diff can only patch phrases within lines; an added job or a
+    dropped section needs the model, so such resubmissions are not reusable.
+    """
+    matcher = difflib.SequenceMatcher(None, _lines(prior_text), _lines(text), autojunk=False)
+    edited = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        if tag != "replace" or i2 - i1 != j2 - j1:
+            return None
+        edited += i2 - i1
+    return edited
+
+def apply_basic_diff(prior_text: str, prior_data: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """Carry a prior structured result over to a lightly edited version of the same resume
+
+    Meant for versions that differ only by lines edited in place (see
+    edited_line_count). Phrases changed within a line (a date, a title) are substituted wherever
+    the prior result quotes them; skills, emails and phones the basic
+    extractor finds only in one version are added or dropped. Everything
+    else is kept as the model produced it.
+    """
+    old_lines, new_lines = _lines(prior_text), _lines(text)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    replacements = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "replace" and i2 - i1 == j2 - j1:
+            for old_line, new_line in zip(old_lines[i1:i2], new_lines[j1:j2]):
+                replacements.extend(
+                    # Whole words only: "Jan" -> "Feb" must leave "Jane" alone
+                    (re.compile(rf'(?<!\w){re.escape(old)}(?!\w)'), new)
+                    for old, new in _phrase_changes(old_line, new_line)
+                    if len(old) >= MIN_SUBSTITUTION_CHARS
+                )
+
+    data = _substitute(copy.deepcopy(prior_data), replacements)
+
+    old_basic, new_basic = extract_basic(prior_text), extract_basic(text)
+    removed_skills = {skill.lower() for skill in old_basic["skills"]} - {skill.lower() for skill in new_basic["skills"]}
+    skills = [skill for skill in data.get("skills") or [] if str(skill).lower() not in removed_skills]
+    known = {str(skill).lower() for skill in skills}
+    skills.extend(skill for skill in new_basic["skills"] if skill.lower() not in known and skill not in old_basic["skills"])
+    data["skills"] = skills
+
+    contact_info = data.get("contact_info")
+    if isinstance(contact_info, dict):
+        for field, basic_field in (("email", "emails"), ("phone", "phones")):
+            old_values, new_values = old_basic["contact_info"][basic_field], new_basic["contact_info"][basic_field]
+            if contact_info.get(field) in old_values and contact_info.get(field) not in new_values:
+                contact_info[field] = new_values[0] if new_values else ""
+    return data
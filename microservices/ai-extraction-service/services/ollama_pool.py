@@ -0,0 +1,188 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import structlog
+
+from config import settings
+from services.startup import lazy_import
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+# httpx exception names, resolved on first use so importing this module doesn't load httpx.
+# Raised before the request reached the server, so it is safe to send it to another one
+RETRYABLE_ERRORS = ("ConnectError", "ConnectTimeout")
+# Count against a server's health. Not read timeouts: a busy server is slow on long generations, not down
+HEALTH_FAILURE_ERRORS = ("ConnectTimeout", "NetworkError")
+
+def _httpx_errors(names: Tuple[str, ...]) -> Tuple[type, ...]:
+    httpx = lazy_import("httpx")
+    return tuple(getattr(httpx, name) for name in names)
+
+class OllamaBackend:
+    """One Ollama server: its pulled models, health and this worker's requests to it"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        # Trusted until the first probe says otherwise, so a cold worker can serve straight away
+        self.healthy = True
+        self.models: Dict[str, int] = {}
+        self.outstanding = 0
+        self.failures = 0
+        self.good_probes = 0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+        self.checked_at = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "models": sorted(self.models),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejections": self.ejections
+        }
+
+class OllamaPool:
+    """Spreads Ollama requests across OLLAMA_BASE_URLS
+
+    Each request goes to the server with the fewest requests outstanding
+    from this worker, among the healthy ones that have the model pulled (per
+    /api/tags); if none has it, any healthy server, and if none is healthy,
+    any server at all rather than failing outright. A server is ejected
+    after OLLAMA_EJECT_AFTER_FAILURES consecutive failed probes or requests
+    that could not connect or lost the connection (slow ones don't count),
+    and re-admitted after OLLAMA_READMIT_AFTER_PROBES consecutive good ones.
+    Requests that could not connect are retried once on another server.
+    """
+
+    def __init__(self, urls: Optional[List[str]] = None):
+        self.backends = [OllamaBackend(url) for url in (urls or settings.OLLAMA_BASE_URLS)]
+        self._checker: Optional[asyncio.Task] = None
+        self._refreshing: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._checker is None:
+            self._checker = asyncio.create_task(self._check_periodically())
+
+    async def stop(self) -> None:
+        if self._checker is not None:
+            self._checker.cancel()
+            await asyncio.gather(self._checker, return_exceptions=True)
+            self._checker = None
+
+    async def _check_periodically(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(settings.OLLAMA_HEALTH_INTERVAL)
+
+    async def refresh(self) -> None:
+        """Probe every server's /api/tags; concurrent callers share one round of probes"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._probe_all())
+        await asyncio.shield(self._refreshing)
+
+    async def _probe_all(self) -> None:
+        async with lazy_import("httpx").AsyncClient() as client:
+            await asyncio.gather(*(self._probe(client, backend) for backend in self.backends))
+
+    async def _probe(self, client: "httpx.AsyncClient", backend: OllamaBackend) -> None:
+        try:
+            response = await client.get(f"{backend.url}/api/tags", timeout=settings.OLLAMA_HEALTH_TIMEOUT)
+            if response.status_code != 200:
+                raise Exception(f"Ollama tags request failed: {response.status_code}")
+            backend.models = {model["name"]: model.get("size") or 0 for model in response.json().get("models", [])}
+        except Exception as e:
+            backend.good_probes = 0
+            self._failed(backend, e)
+            return
+        finally:
+            backend.checked_at = time.monotonic()
+
+        backend.failures = 0
+        if not backend.healthy:
+            backend.good_probes += 1
+            if backend.good_probes >= settings.OLLAMA_READMIT_AFTER_PROBES:
+                backend.healthy = True
+                logger.info("Ollama backend re-admitted", url=backend.url, models=len(backend.models))
+
+    async def models(self) -> Dict[str, int]:
+        """Models pulled on any healthy server (name -> size in bytes); probes first if the last check is stale
+
+        With none healthy, the models of all of them, as requests then still go to any server (see choose).
+        """
+        if time.monotonic() - min(backend.checked_at for backend in self.backends) > settings.OLLAMA_HEALTH_INTERVAL:
+            await self.refresh()
+        backends = [backend for backend in self.backends if backend.healthy] or self.backends
+        models: Dict[str, int] = {}
+        for backend in backends:
+            models.update(backend.models)
+        return models
+
+    def capacity(self, model: str) -> int:
+        """Healthy servers that have the model; at least 1, so work can still be attempted"""
+        return max(1, sum(1 for backend in self.backends if backend.healthy and model in backend.models))
+
+    def healthy_count(self) -> int:
+        return max(1, sum(1 for backend in self.backends if backend.healthy))
+
+    def choose(self, model: Optional[str] = None, exclude: Optional[OllamaBackend] = None) -> Optional[OllamaBackend]:
+        """The least-loaded server for `model`, or None if `exclude` was the only one"""
+        candidates = [backend for backend in self.backends if backend is not exclude]
+        healthy = [backend for backend in candidates if backend.healthy]
+        with_model = [backend for backend in healthy if model in backend.models]
+        candidates = with_model or healthy or candidates
+        if not candidates:
+            return None
+        # Fewest in flight; among equals, whichever has served least, so idle servers take turns
+        return min(candidates, key=lambda backend: (backend.outstanding, backend.requests))
+
+    async def request(self, model: Optional[str], call: Callable[[str], Awaitable[T]]) -> T:
+        """Run `call(base_url)` against the chosen server, retrying once elsewhere if it can't connect"""
+        backend = self.choose(model)
+        try:
+            return await self._call(backend, call)
+        except _httpx_errors(RETRYABLE_ERRORS) as e:
+            retry = self.choose(model, exclude=backend)
+            if retry is None:
+                raise
+            logger.warning("Ollama backend unreachable, retrying on another", url=backend.url, retry_url=retry.url, error=str(e))
+            return await self._call(retry, call)
+
+    async def _call(self, backend: OllamaBackend, call: Callable[[str], Awaitable[T]]) -> T:
+        backend.outstanding += 1
+        backend.requests += 1
+        try:
+            result = await call(backend.url)
+        except _httpx_errors(HEALTH_FAILURE_ERRORS) as e:
+            self._failed(backend, e)
+            raise
+        finally:
+            backend.outstanding -= 1
+        backend.failures = 0
+        return result
+
+    def _failed(self, backend: OllamaBackend, error: Exception) -> None:
+        backend.errors += 1
+        backend.failures += 1
+        if backend.healthy and backend.failures >= settings.OLLAMA_EJECT_AFTER_FAILURES:
+            backend.healthy = False
+            backend.good_probes = 0
+            backend.ejections += 1
+            logger.warning("Ollama backend ejected", url=backend.url, failures=backend.failures, error=str(error))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": sum(1 for backend in self.backends if backend.healthy),
+            "backends": [backend.stats() for backend in self.backends]
+        }
+
+ollama_pool = OllamaPool()
@@ -0,0 +1,231 @@
+import json
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import structlog
+
+from config import settings
+from services.llm_batcher import generation_batcher
+from services.model_router import estimate_tokens
+from services.ollama_pool import ollama_pool
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = structlog.get_logger()
+
+# Model chatter after the answer ("Note: ..."); a raw newline can't occur inside a JSON
+# string, so these are safe mid-object too. JSON tasks only need them with LLM_EARLY_STOP
+# off, since the scanner otherwise ends the stream when the object closes. No code fences:
+# a bare opening fence after a preface would end the generation before the object starts.
+TASK_STOP_SEQUENCES = {
+    "extraction": ["\n\nNote:", "\n\nExplanation:"],
+    "combined": ["\n\nNote:", "\n\nExplanation:"],
+    "enhancement": ["\n\nNote:"],
+}
+
+# Token caps need this many finished generations of a task before they adapt
+TOKEN_BUDGET_MIN_SAMPLES = 20
+TOKEN_BUDGET_WINDOW = 200
+TOKEN_BUDGET_PERCENTILE = 0.95
+TOKEN_BUDGET_HEADROOM = 1.25
+TOKEN_BUDGET_FLOOR = 128
+
+class JsonObjectScanner:
+    """Finds the first complete, valid top-level JSON object in text fed a piece at a time
+
+    Tracks brace depth outside strings, so braces inside string values don't
+    count. Text before the object (a code fence, "Here is the JSON:") is
+    skipped, and a balanced "{...}" that doesn't parse is passed over.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, piece: str) -> Optional[str]:
+        """Add generated text; returns the object's text once it is complete"""
+        self.text += piece
+        text, i = self.text, self._pos
+        while i < len(text):
+            if self._start is None:
+                i = text.find("{", i)
+                if i == -1:
+                    i = len(text)
+                    break
+                self._start, self._depth = i, 0
+
+            char = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = text[self._start:i + 1]
+                    try:
+                        if isinstance(json.loads(candidate), dict):
+                            self._pos = i + 1
+                            return candidate
+                    except ValueError:
+                        pass
+                    # Braces in prose, not JSON; look for an object after this one's "{"
+                    i, self._start, self._in_string, self._escaped = self._start + 1, None, False, False
+                    continue
+            i += 1
+        self._pos = i
+        return None
+
+class TokenBudget:
+    """Adaptive num_predict per task, from the output lengths generations actually needed
+
+    Keeps a window of output/prompt token ratios per task and caps new
+    generations at the 95th percentile ratio (plus headroom) times the
+    prompt size, never above the task's fixed ceiling. A generation that hit
+    its cap counts double, so a too-tight cap loosens again.
+    """
+
+    def __init__(self):
+        self.ratios: Dict[str, deque] = {}
+
+    def cap(self, task: str, prompt_tokens: int, ceiling: int) -> int:
+        if not settings.LLM_ADAPTIVE_NUM_PREDICT:
+            return ceiling
+        ratios = self.ratios.get(task)
+        if ratios is None or len(ratios) < TOKEN_BUDGET_MIN_SAMPLES:
+            return ceiling
+        ratio = sorted(ratios)[int(TOKEN_BUDGET_PERCENTILE * (len(ratios) - 1))]
+        return max(TOKEN_BUDGET_FLOOR, min(ceiling, int(prompt_tokens * ratio * TOKEN_BUDGET_HEADROOM)))
+
+    def observe(self, task: str, prompt_tokens: int, result: Dict[str, Any]) -> None:
+        output_tokens = result.get("eval_count")
+        if not output_tokens:
+            return
+        ratio = output_tokens / max(1, prompt_tokens)
+        if result.get("done_reason") == "length":
+            ratio *= 2
+        self.ratios.setdefault(task, deque(maxlen=TOKEN_BUDGET_WINDOW)).append(ratio)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            task: {
+                "samples": len(ratios),
+                "p95_ratio": round(sorted(ratios)[int(TOKEN_BUDGET_PERCENTILE * (len(ratios) - 1))], 3)
+            }
+            for task, ratios in self.ratios.items() if ratios
+        }
+
+token_budget = TokenBudget()
+
+async def generate(
+    client: "httpx.AsyncClient",
+    task: str,
+    model: str,
+    prompt: str,
+    options: Dict[str, Any],
+    timeout: float,
+    json_object: bool = False,
+    headers: Optional[Dict[str, str]] = None,
+    **payload: Any
+) -> Dict[str, Any]:
+    """Run an Ollama generation, streamed, and return it shaped like a non-streaming /api/generate response
+
+    The task's stop sequences are added to `options`. With `json_object` the
+    output is scanned as it arrives and the stream is closed as soon as it
+    holds a complete JSON object, which makes Ollama stop generating; the
+    response is then just that object, with "done_reason": "early_stop" and
+    timings measured here (Ollama only reports them once done). Generations
+    go through the per-model batcher, so concurrent ones share Ollama's
+    parallel slots, scheduled fairly across tenants by their tokens, and
+    each is sent to the least-loaded Ollama server that has the model.
+    """
+    return await generation_batcher.submit(
+        model,
+        lambda: ollama_pool.request(
+            model,
+            lambda base_url: _generate(client, base_url, task, model, prompt, options, timeout, json_object, headers, payload)
+        ),
+        cost=estimate_tokens(prompt) + options.get("num_predict", 0)
+    )
+
+async def _generate(
+    client: "httpx.AsyncClient",
+    base_url: str,
+    task: str,
+    model: str,
+    prompt: str,
+    options: Dict[str, Any],
+    timeout: float,
+    json_object: bool,
+    headers: Optional[Dict[str, str]],
+    payload: Dict[str, Any]
+) -> Dict[str, Any]:
+    scanner = JsonObjectScanner() if json_object and settings.LLM_EARLY_STOP else None
+    options = dict(options, stop=[] if scanner is not None else TASK_STOP_SEQUENCES.get(task, []))
+    pieces: List[str] = []
+    final: Optional[Dict[str, Any]] = None
+    complete: Optional[str] = None
+    started = time.perf_counter_ns()
+    first_token_at: Optional[int] = None
+
+    async with client.stream(
+        "POST",
+        f"{base_url}/api/generate",
+        json=dict(payload, model=model, prompt=prompt, stream=True, options=options),
+        headers=headers,
+        timeout=timeout
+    ) as response:
+        if response.status_code != 200:
+            raise Exception(f"Ollama request failed: {response.status_code}")
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise Exception(f"Ollama generation failed: {chunk['error']}")
+            piece = chunk.get("response", "")
+            if piece:
+                first_token_at = first_token_at or time.perf_counter_ns()
+                pieces.append(piece)
+                if scanner is not None:
+                    complete = scanner.feed(piece)
+                    if complete is not None:
+                        break
+            if chunk.get("done"):
+                final = chunk
+                break
+        # Leaving the block closes the connection, which cancels the rest of the generation
+
+    if final is not None:
+        return dict(final, response="".join(pieces))
+
+    if complete is None:
+        raise Exception("Ollama stream ended before the generation was done")
+    finished = time.perf_counter_ns()
+    first_token_at = first_token_at or finished
+    logger.info("Generation stopped early", task=task, model=model, output_tokens=len(pieces), num_predict=options.get("num_predict"))
+    return {
+        "model": model,
+        "response": complete,
+        "done": False,
+        "done_reason": "early_stop",
+        "prompt_eval_count": estimate_tokens(prompt),
+        # Includes any model load and queueing; it's all the client can see
+        "prompt_eval_duration": first_token_at - started,
+        "eval_count": len(pieces),
+        "eval_duration": max(1, finished - first_token_at),
+        "total_duration": finished - started
+    }
@@ -0,0 +1,72 @@
+import asyncio
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+import structlog
+from config import settings
+from services.tracing import tracer
+
+logger = structlog.get_logger()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_size: int = settings.PARSE_POOL_SIZE
+
+def available_cpus() -> int:
+    """Number of CPUs this process may actually use (affinity and cgroup quota aware)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    # Containers report the host's cores; the CFS quota is the real limit
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+
+    return max(1, cpus)
+
+def configure_parse_pool(max_workers: int) -> None:
+    """Set the size of this process's parse pool (0 parses inline on the event loop)"""
+    global _pool_size
+    _pool_size = max_workers
+
+def parse_pool_size() -> int:
+    """Processes in this process's parse pool; 0 when parsing inline"""
+    return _pool_size
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Return this process's parse pool, creating it on first use"""
+    global _pool
+    if _pool is None and _pool_size > 0:
+        _pool = ProcessPoolExecutor(max_workers=_pool_size)
+        logger.info("Parse pool started", pid=os.getpid(), max_workers=_pool_size)
+    return _pool
+
+def _timed_call(func: Callable[..., Any], *args: Any):
+    """Run func in a pool process, returning (wall-clock start, result) so the caller can see queueing"""
+    return time.time(), func(*args)
+
+async def run_in_parse_pool(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a CPU-bound parse function in the pool, or inline when no pool is configured"""
+    pool = get_parse_pool()
+    if pool is None:
+        return func(*args)
+    with tracer.span("parse_pool.task", function=func.__name__) as span:
+        submitted = time.time()
+        started, result = await asyncio.get_running_loop().run_in_executor(pool, _timed_call, func, *args)
+        span.set_attributes(queue_ms=round(max(0.0, started - submitted) * 1000, 2))
+        return result
+
+def shutdown_parse_pool() -> None:
+    """Stop the parse pool, letting queued parses finish"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
@@ -0,0 +1,64 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+from services.startup import lazy_import
+
+class PDFBackend:
+    """Text extraction backend for PDFs; implementations must be importable in parse-pool processes"""
+
+    name = ""
+
+    def extract_pages(self, file_path: str, start: int, stop: Optional[int]) -> Tuple[int, List[Tuple[str, float]]]:
+        """Return (total page count, [(text, elapsed_ms)]) for pages start..stop-1, or start to the end if stop is None"""
+        raise NotImplementedError
+
+class PyPDF2Backend(PDFBackend):
+    """Pure-Python backend; always available"""
+
+    name = "pypdf2"
+
+    def extract_pages(self, file_path: str, start: int, stop: Optional[int]) -> Tuple[int, List[Tuple[str, float]]]:
+        PyPDF2 = lazy_import("PyPDF2")
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            return len(pdf_reader.pages), _timed_pages(pdf_reader.pages, start, stop, lambda page: page.extract_text())
+
+class PdfiumBackend(PDFBackend):
+    """PDFium (Chrome's PDF engine) via the optional pypdfium2 package; several times faster than PyPDF2"""
+
+    name = "pdfium"
+
+    def extract_pages(self, file_path: str, start: int, stop: Optional[int]) -> Tuple[int, List[Tuple[str, float]]]:
+        pdfium = lazy_import("pypdfium2")
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            return len(pdf), _timed_pages(pdf, start, stop, lambda page: page.get_textpage().get_text_range())
+        finally:
+            pdf.close()
+
+def _timed_pages(pages, start: int, stop: Optional[int], extract) -> List[Tuple[str, float]]:
+    results = []
+    for page_num in range(start, len(pages) if stop is None else min(stop, len(pages))):
+        started = time.perf_counter()
+        text = extract(pages[page_num]) or ""
+        results.append((text, round((time.perf_counter() - started) * 1000, 2)))
+    return results
+
+PDF_BACKENDS: Dict[str, PDFBackend] = {}
+
+def register_pdf_backend(backend: PDFBackend) -> None:
+    """Make a backend selectable through settings.PDF_BACKEND"""
+    PDF_BACKENDS[backend.name] = backend
+
+def get_pdf_backend(name: str) -> PDFBackend:
+    try:
+        return PDF_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown PDF backend '{name}', available: {', '.join(PDF_BACKENDS)}")
+
+def extract_page_range(backend_name: str, file_path: str, start: int, stop: Optional[int]) -> Tuple[int, List[Tuple[str, float]]]:
+    """Module-level entry point so page ranges can be shipped to the parse pool"""
+    return get_pdf_backend(backend_name).extract_pages(file_path, start, stop)
+
+register_pdf_backend(PyPDF2Backend())
+register_pdf_backend(PdfiumBackend())
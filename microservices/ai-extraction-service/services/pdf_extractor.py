@@ -1,87 +1,160 @@
-import PyPDF2
-import docx
+import asyncio
+import math
+import time
 import structlog
-from typing import Optional
+import zipfile
+from typing import Optional, Dict, Any, Tuple
+from xml.etree.ElementTree import ParseError
+
+from config import settings
+from services.startup import lazy_import
+from services.docx_stream import iter_docx_lines
+from services.parse_pool import run_in_parse_pool, parse_pool_size
+from services.pdf_backends import extract_page_range, get_pdf_backend
+from services.basic_extractor import extract_basic
+from services.tracing import tracer
 
 logger = structlog.get_logger()
 
+def _read_docx_paragraphs(file_path: str) -> list:
+    """Parse a DOCX and return its non-empty lines (runs in the parse pool)
+
+    Streams the XML parts directly, which also picks up tables, text boxes and
+    headers. Falls back to python-docx (body paragraphs only) if the package
+    can't be streamed.
+    """
+    if settings.DOCX_STREAMING:
+        try:
+            return list(iter_docx_lines(file_path))
+        except (zipfile.BadZipFile, KeyError, ParseError) as e:
+            logger.warning(f"Streaming DOCX parse failed, falling back to python-docx: {str(e)}")
+    
+    docx = lazy_import("docx")
+    doc = docx.Document(file_path)
+    return [paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()]
+
 class PDFExtractor:
     """Service for extracting text from PDF and DOCX files"""
     
+    async def extract_text(self, file_path: str, file_type: Optional[str] = None) -> Dict[str, Any]:
+        """Extract text from a PDF or DOCX file, returning the text and extraction metadata
+        
+        `file_type` ("pdf" or "docx") defaults to the file extension.
+        """
+        file_type = file_type or ("pdf" if file_path.lower().endswith('.pdf') else "docx")
+        if file_type == "pdf":
+            text, metadata = await self._extract_pdf(file_path)
+            return {"text": text, "metadata": metadata}
+        
+        started = time.perf_counter()
+        text = await self.extract_from_docx(file_path)
+        return {
+            "text": text,
+            "metadata": {"backend": "docx", "timings": {"total_ms": round((time.perf_counter() - started) * 1000, 2)}}
+        }
+    
+    async def extract_pdf_pages(self, file_path: str) -> Dict[str, Any]:
+        """Extract PDF text with the configured backend, fanning large documents out across the parse pool
+        
+        Only fans out when the pool has more than one process: the pages left
+        after the first range are split into one contiguous range per process,
+        so each process opens the document once. Otherwise the whole document
+        is read in a single pass.
+        
+        Returns the raw text with the backend name, page count and per-page timings.
+        """
+        backend = get_pdf_backend(settings.PDF_BACKEND)
+        pages_per_task = settings.PDF_PAGES_PER_TASK
+        workers = parse_pool_size()
+        started = time.perf_counter()
+        
+        if workers <= 1:
+            page_count, pages = await run_in_parse_pool(extract_page_range, backend.name, file_path, 0, None)
+        else:
+            # The first range also tells us how many pages there are
+            page_count, pages = await run_in_parse_pool(extract_page_range, backend.name, file_path, 0, pages_per_task)
+            remaining = page_count - pages_per_task
+            if remaining > 0:
+                if page_count >= settings.PDF_PARALLEL_MIN_PAGES:
+                    tasks = min(workers, math.ceil(remaining / pages_per_task))
+                else:
+                    tasks = 1
+                size = math.ceil(remaining / tasks)
+                ranges = [(start, start + size) for start in range(pages_per_task, page_count, size)]
+                chunks = await asyncio.gather(*(
+                    run_in_parse_pool(extract_page_range, backend.name, file_path, start, stop)
+                    for start, stop in ranges
+                ))
+                for _, chunk_pages in chunks:
+                    pages.extend(chunk_pages)
+        
+        timings = {
+            "total_ms": round((time.perf_counter() - started) * 1000, 2),
+            "per_page_ms": [elapsed_ms for _, elapsed_ms in pages]
+        }
+        logger.info(
+            "PDF pages extracted",
+            backend=backend.name,
+            pages=page_count,
+            total_ms=timings["total_ms"],
+            slowest_page_ms=max(timings["per_page_ms"], default=0)
+        )
+        return {
+            "text": "".join(text + "\n" for text, _ in pages),
+            "backend": backend.name,
+            "pages": page_count,
+            "timings": timings
+        }
+    
     async def extract_from_pdf(self, file_path: str) -> str:
         """Extract text from PDF file"""
-        try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text += page.extract_text() + "\n"
-                
+        text, _ = await self._extract_pdf(file_path)
+        return text
+    
+    async def _extract_pdf(self, file_path: str) -> Tuple[str, Dict[str, Any]]:
+        """Extract text from PDF file, along with backend, page count and timings"""
+        with tracer.span("parse", file_type="pdf") as span:
+            try:
+                metadata = await self.extract_pdf_pages(file_path)
+                text = metadata.pop("text")
+                span.set_attributes(backend=metadata["backend"], pages=metadata["pages"], chars=len(text))
+
                 if not text.strip():
-                    return "Unable to extract text from PDF - file may be image-based"
-                
+                    return "Unable to extract text from PDF - file may be image-based", metadata
+
                 logger.info(f"Extracted {len(text)} characters from PDF")
-                return text.strip()
-                
-        except Exception as e:
-            logger.error(f"PDF extraction failed: {str(e)}")
-            raise Exception(f"PDF processing failed: {str(e)}")
+                return text.strip(), metadata
+
+            except Exception as e:
+                logger.error(f"PDF extraction failed: {str(e)}")
+                raise Exception(f"PDF processing failed: {str(e)}")
     
     async def extract_from_docx(self, file_path: str) -> str:
         """Extract text from DOCX file"""
-        try:
-            doc = docx.Document(file_path)
-            text = []
-            
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    text.append(paragraph.text)
-            
-            extracted_text = "\n".join(text)
-            
-            if not extracted_text.strip():
-                return "Unable to extract text from DOCX file"
-            
-            logger.info(f"Extracted {len(extracted_text)} characters from DOCX")
-            return extracted_text.strip()
-            
-        except Exception as e:
-            logger.error(f"DOCX extraction failed: {str(e)}")
-            raise Exception(f"DOCX processing failed: {str(e)}")
+        with tracer.span("parse", file_type="docx") as span:
+            try:
+                text = await run_in_parse_pool(_read_docx_paragraphs, file_path)
+                
+                extracted_text = "\n".join(text)
+                span.set_attributes(lines=len(text), chars=len(extracted_text))
+                
+                if not extracted_text.strip():
+                    return "Unable to extract text from DOCX file"
+                
+                logger.info(f"Extracted {len(extracted_text)} characters from DOCX")
+                return extracted_text.strip()
+                
+            except Exception as e:
+                logger.error(f"DOCX extraction failed: {str(e)}")
+                raise Exception(f"DOCX processing failed: {str(e)}")
     
     def extract_basic_info(self, text: str) -> dict:
         """Extract basic information using regex patterns"""
-        import re
-        
-        # Email extraction
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, text)
-        
-        # Phone extraction
-        phone_pattern = r'\b(?:\+?1[-.\s]?)?\(?[0-9]{3}\)?[-.\s]?[0-9]{3}[-.\s]?[0-9]{4}\b'
-        phones = re.findall(phone_pattern, text)
-        
-        # Skills extraction (basic keyword matching)
-        tech_skills = [
-            'Python', 'Java', 'JavaScript', 'Ruby', 'Rails', 'React', 'Node.js',
-            'SQL', 'HTML', 'CSS', 'Git', 'AWS', 'Azure', 'Docker', 'Kubernetes',
-            'Machine Learning', 'AI', 'Data Science', 'Project Management'
-        ]
-        
-        found_skills = []
-        text_lower = text.lower()
-        for skill in tech_skills:
-            if skill.lower() in text_lower:
-                found_skills.append(skill)
+        basic_info = extract_basic(text)
         
         return {
-            "contact_info": {
-                "emails": emails[:2],  # Limit to 2 emails
-                "phones": phones[:2]   # Limit to 2 phone numbers
-            },
-            "skills": found_skills,
+            "contact_info": basic_info["contact_info"],
+            "skills": basic_info["skills"],
             "text_length": len(text),
             "extraction_method": "basic_regex"
-        }
\ No newline at end of file
+        }
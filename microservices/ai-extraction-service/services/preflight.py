@@ -0,0 +1,177 @@
+import asyncio
+import os
+import tempfile
+import zipfile
+from typing import Optional, Tuple
+
+import structlog
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import settings
+from services.parse_pool import run_in_parse_pool
+from services.startup import lazy_import
+
+logger = structlog.get_logger()
+
+FILE_TYPE_MIME = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+class PreflightError(Exception):
+    """Upload rejected before parsing; carries the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+    def __reduce__(self):
+        # Raised in the parse pool; the default pickling would re-create it from `detail` alone
+        return type(self), (self.status_code, self.detail)
+
+def sniff_file_type(head: bytes) -> Optional[str]:
+    """Identify an upload from its leading bytes: "pdf", "docx" (any zip, verified later) or None"""
+    # The PDF header may follow a little junk; readers accept it within the first 1 KiB
+    if b"%PDF-" in head[:1024]:
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        return "docx"
+    return None
+
+# Multipart boundaries, headers and the other form fields sent with the file
+UPLOAD_FORM_OVERHEAD = 1024 * 1024
+
+class UploadLimitMiddleware:
+    """Answers 413 to multipart uploads whose Content-Length is over MAX_FILE_SIZE, before the body is read
+
+    Starlette spools the whole multipart body before the endpoint runs, so
+    the size check in receive_upload can only skip the copy; this one saves
+    the read. Bodies without a Content-Length (chunked) are still bounded by
+    receive_upload.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            length = headers.get("content-length", "")
+            if (
+                headers.get("content-type", "").startswith("multipart/form-data")
+                and length.isdigit()
+                and int(length) > settings.MAX_FILE_SIZE + UPLOAD_FORM_OVERHEAD
+            ):
+                response = JSONResponse({"detail": _too_large()}, status_code=413)
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+def _too_large() -> str:
+    return f"File exceeds the {settings.MAX_FILE_SIZE // (1024 * 1024)}MB limit"
+
+def pdf_has_text_layer(file_path: str) -> bool:
+    """Cheaply check whether any page references a font, without decoding content streams
+
+    Pages built only from images (scans, photos) have no fonts in their
+    resources, directly or through form XObjects, so text extraction can't
+    produce anything. Walks the page tree itself and stops at the first page
+    with a font, so a text PDF costs the cross-reference table and one page,
+    not a pass over every page ahead of the real extraction. Runs in the
+    parse pool; raises PreflightError for files that need a password to
+    open (an owner password alone only restricts editing, and opens with "").
+    """
+    PyPDF2 = lazy_import("PyPDF2")
+    reader = PyPDF2.PdfReader(file_path)
+    if reader.is_encrypted and not reader.decrypt(""):
+        raise PreflightError(422, "Encrypted PDF: password-protected files are not supported")
+    return _page_tree_has_font(reader.trailer["/Root"]["/Pages"], None)
+
+def _page_tree_has_font(node, inherited_resources, depth: int = 0) -> bool:
+    node = node.get_object()
+    # Resources are inherited from ancestor /Pages nodes unless a node sets its own
+    resources = node.get("/Resources", inherited_resources)
+    if node.get("/Type") != "/Pages":
+        return _resources_have_font(resources)
+    if depth > 32:
+        return False
+    return any(_page_tree_has_font(kid, resources, depth + 1) for kid in node.get("/Kids", ()))
+
+def _resources_have_font(resources, depth: int = 0) -> bool:
+    if resources is None or depth > 3:
+        return False
+    resources = resources.get_object()
+    if resources.get("/Font"):
+        return True
+    xobjects = resources.get("/XObject")
+    if xobjects:
+        for xobject in xobjects.get_object().values():
+            xobject = xobject.get_object()
+            if xobject.get("/Subtype") == "/Form" and _resources_have_font(xobject.get("/Resources"), depth + 1):
+                return True
+    return False
+
+async def receive_upload(file: UploadFile) -> Tuple[str, str]:
+    """Sniff, size-check and spool an upload to a temp file
+
+    Returns (temp_path, file_type). Raises PreflightError for unsupported,
+    oversized, corrupt, encrypted or text-less files; the caller owns the
+    temp file only when this returns. By the time this runs Starlette has
+    already received the body, so the size check only stops the copy (see
+    UploadLimitMiddleware for rejecting by Content-Length up front).
+    """
+    head = await file.read(settings.PREFLIGHT_SNIFF_BYTES)
+    file_type = sniff_file_type(head)
+    if file_type is None:
+        raise PreflightError(415, "Unsupported file type: only PDF and DOCX files are supported")
+
+    suffix = ".pdf" if file_type == "pdf" else ".docx"
+    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        size = len(head)
+        await asyncio.to_thread(tmp_file.write, head)
+        while True:
+            chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > settings.MAX_FILE_SIZE:
+                raise PreflightError(413, _too_large())
+            await asyncio.to_thread(tmp_file.write, chunk)
+        tmp_file.close()
+
+        if file_type == "docx":
+            _check_docx(tmp_file.name)
+        else:
+            await _check_pdf(tmp_file.name)
+
+        return tmp_file.name, file_type
+
+    except BaseException:
+        tmp_file.close()
+        os.unlink(tmp_file.name)
+        raise
+
+def _check_docx(file_path: str) -> None:
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            if "word/document.xml" not in archive.namelist():
+                raise PreflightError(415, "Unsupported file type: zip archive is not a DOCX document")
+    except zipfile.BadZipFile:
+        raise PreflightError(422, "Corrupt DOCX file")
+
+async def _check_pdf(file_path: str) -> None:
+    try:
+        has_text = await run_in_parse_pool(pdf_has_text_layer, file_path)
+    except PreflightError:
+        raise
+    except Exception as e:
+        logger.warning("PDF pre-flight failed", error=str(e))
+        raise PreflightError(422, f"Corrupt PDF file: {str(e)}")
+
+    if not has_text:
+        raise PreflightError(422, "Unable to extract text from PDF - file is image-based (no text layer)")
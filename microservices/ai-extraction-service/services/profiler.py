@@ -0,0 +1,166 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from config import settings
+
+logger = structlog.get_logger()
+
+PROFILE_MODES = ("cpu", "alloc")
+# Innermost Python functions of a thread blocked waiting (event loop selector, idle
+# thread-pool workers, Condition.wait); their samples are counted as idle
+IDLE_FUNCTIONS = frozenset({"select", "_worker", "wait"})
+TOP_ALLOCATION_SITES = 25
+
+class ProfileBusyError(Exception):
+    """Another profile is already running in this process"""
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """Samples every thread's Python stack from a background thread
+
+    The event loop keeps serving while samples are taken; each sample briefly
+    takes the GIL, so at the default 10 ms interval the overhead is a few
+    percent. Stacks are aggregated into flamegraph.pl's collapsed format,
+    one "thread;outer;...;leaf count" line per distinct stack.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                self.samples += 1
+                if frame.f_code.co_name in IDLE_FUNCTIONS:
+                    self.idle_samples += 1
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def collapsed(self) -> List[str]:
+        return [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+
+def _collect_allocations(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> Dict[str, Any]:
+    """Top allocation sites and collapsed allocation stacks (weighted by bytes) between two snapshots"""
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    before, after = before.filter_traces(filters), after.filter_traces(filters)
+
+    top = [
+        {
+            "site": f"{stat.traceback[-1].filename}:{stat.traceback[-1].lineno}",
+            "size_diff_bytes": stat.size_diff,
+            "count_diff": stat.count_diff,
+            "size_bytes": stat.size
+        }
+        for stat in after.compare_to(before, "lineno")[:TOP_ALLOCATION_SITES]
+    ]
+
+    stacks: Counter = Counter()
+    for stat in after.compare_to(before, "traceback"):
+        if stat.size_diff <= 0:
+            continue
+        # tracemalloc frames run oldest first
+        stack = ";".join(f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in stat.traceback)
+        stacks[stack] += stat.size_diff
+    return {
+        "top_allocations": top,
+        "collapsed": [f"{stack} {size}" for stack, size in stacks.most_common()]
+    }
+
+class Profiler:
+    """On-demand CPU or allocation profile of this worker process, one at a time
+
+    Parses running in the parse pool happen in other processes and aren't
+    seen; with PARSE_POOL_SIZE=0 they run here and are.
+    """
+
+    def __init__(self):
+        self._running = False
+
+    async def profile(self, seconds: float, mode: str) -> Dict[str, Any]:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'; expected one of {', '.join(PROFILE_MODES)}")
+        if not 0 < seconds <= settings.DEBUG_PROFILE_MAX_SECONDS:
+            raise ValueError(f"seconds must be between 0 and {settings.DEBUG_PROFILE_MAX_SECONDS}")
+        if self._running:
+            raise ProfileBusyError("A profile is already running in this worker")
+
+        self._running = True
+        started = time.perf_counter()
+        logger.info("Profiling started", mode=mode, seconds=seconds, pid=os.getpid())
+        try:
+            if mode == "cpu":
+                result = await self._profile_cpu(seconds)
+            else:
+                result = await self._profile_alloc(seconds)
+        finally:
+            self._running = False
+
+        logger.info("Profiling finished", mode=mode, seconds=seconds, pid=os.getpid())
+        return dict(result, mode=mode, seconds=seconds, pid=os.getpid(), elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+
+    async def _profile_cpu(self, seconds: float) -> Dict[str, Any]:
+        sampler = StackSampler(settings.DEBUG_PROFILE_INTERVAL_MS / 1000)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.to_thread(sampler.stop)
+        return {
+            "interval_ms": settings.DEBUG_PROFILE_INTERVAL_MS,
+            "samples": sampler.samples,
+            "idle_samples": sampler.idle_samples,
+            "collapsed": sampler.collapsed()
+        }
+
+    async def _profile_alloc(self, seconds: float) -> Dict[str, Any]:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(settings.DEBUG_PROFILE_ALLOC_FRAMES)
+        try:
+            # Snapshots copy every live trace; take them off the event loop
+            before = await asyncio.to_thread(tracemalloc.take_snapshot)
+            await asyncio.sleep(seconds)
+            after = await asyncio.to_thread(tracemalloc.take_snapshot)
+            traced_current, traced_peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+        result = await asyncio.to_thread(_collect_allocations, before, after)
+        return dict(result, traced_bytes=traced_current, traced_peak_bytes=traced_peak)
+
+profiler = Profiler()
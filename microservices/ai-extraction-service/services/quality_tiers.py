@@ -0,0 +1,224 @@
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import structlog
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import settings
+from services.llm_batcher import generation_batcher
+from services.model_router import model_router
+
+logger = structlog.get_logger()
+
+QUALITY_TIERS = ("full", "reduced", "basic")
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+# Weight of the newest sample in the recent-latency averages
+LATENCY_EWMA_ALPHA = 0.3
+
+# Absolute time.monotonic() by which the caller needs its answer
+request_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+# Set for background upgrades, which have no caller waiting and always want the full tier
+forced_tier: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("forced_tier", default=None)
+
+class QualityPlanner:
+    """Picks a quality tier per LLM call from queue depth, recent latency and the caller's deadline
+
+    "full" runs the routed model with the full prompt, "reduced" the smallest
+    model with a shorter prompt, "basic" no LLM at all. A tier is used if its
+    expected time - the wait for a parallel slot given who is queued for that
+    model, plus the recent service time of that task on it - fits within
+    QUALITY_DEADLINE_HEADROOM of the time left before the caller's deadline.
+    Without a deadline (no X-Request-Timeout-Ms, or background work nobody
+    is waiting on) there is nothing to trade quality for, so the full tier
+    always runs. A tier without latency samples yet is assumed to fit, so a
+    cold service starts at full quality. The full tier is only re-measured
+    when it runs, so once every QUALITY_PROBE_SECONDS a request that would
+    be degraded runs it anyway as a probe; otherwise one slow spell would
+    degrade the task for good.
+    """
+
+    def __init__(self):
+        self.latency_ms: Dict[Tuple[str, str, str], float] = {}
+        self.model_latency_ms: Dict[str, float] = {}
+        self.sampled_at: Dict[Tuple[str, str, str], float] = {}
+        self.chosen: Dict[str, Dict[str, int]] = {}
+        self.probes = 0
+
+    def observe(self, task: str, tier: str, model: str, result: Dict[str, Any]) -> None:
+        """Fold a finished generation's service time (Ollama's total_duration, no client-side queueing) in"""
+        total_ns = result.get("total_duration")
+        if not total_ns:
+            return
+        elapsed_ms = total_ns / 1e6
+        for table, key in ((self.latency_ms, (task, tier, model)), (self.model_latency_ms, model)):
+            previous = table.get(key)
+            table[key] = elapsed_ms if previous is None else previous + LATENCY_EWMA_ALPHA * (elapsed_ms - previous)
+        self.sampled_at[(task, tier, model)] = time.monotonic()
+
+    def queue_wait_ms(self, model: str) -> float:
+        """Expected wait for a parallel slot on the model, from the generations ahead of a new one"""
+        waiting, in_flight = generation_batcher.load(model)
+        slots = generation_batcher.capacity(model)
+        ahead = waiting + in_flight - slots
+        if ahead < 0:
+            return 0.0
+        return (ahead + 1) / slots * self.model_latency_ms.get(model, 0.0)
+
+    def budget_ms(self) -> Optional[float]:
+        """Time an LLM call may be expected to take, or None if no caller deadline bounds it"""
+        deadline = request_deadline.get()
+        if deadline is None:
+            return None
+        return (deadline - time.monotonic()) * 1000 * settings.QUALITY_DEADLINE_HEADROOM
+
+    def expected_ms(self, task: str, tier: str, model: str) -> Optional[float]:
+        latency = self.latency_ms.get((task, tier, model))
+        if latency is None:
+            return None
+        return self.queue_wait_ms(model) + latency
+
+    async def plan(self, task: str, model: str) -> Tuple[str, str, Optional[str]]:
+        """(tier, model to run it on, why it was degraded) for a generation the router sent to `model`"""
+        if not settings.QUALITY_TIERS or forced_tier.get() is not None:
+            return self._chose(task, forced_tier.get() or "full", model, None)
+
+        budget = self.budget_ms()
+        expected = self.expected_ms(task, "full", model)
+        if budget is None or expected is None or expected <= budget:
+            return self._chose(task, "full", model, None)
+        reason = f"full tier expected {expected:.0f} ms on {model}, {budget:.0f} ms available"
+        if self._probe_due(task, model):
+            self.probes += 1
+            logger.info("Quality tier probe", task=task, model=model, reason=reason)
+            return self._chose(task, "full", model, None)
+
+        models = await model_router.available_models()
+        small = models[0]["name"] if models else model
+        reduced = self.expected_ms(task, "reduced", small)
+        if reduced is None or reduced <= budget:
+            return self._chose(task, "reduced", small, reason)
+        return self._chose(task, "basic", small, f"{reason}; reduced tier expected {reduced:.0f} ms on {small}")
+
+    def _probe_due(self, task: str, model: str) -> bool:
+        """True (and the probe claimed) if the full tier hasn't run on the model for QUALITY_PROBE_SECONDS"""
+        if settings.QUALITY_PROBE_SECONDS <= 0:
+            return False
+        key, now = (task, "full", model), time.monotonic()
+        if now - self.sampled_at.get(key, 0.0) < settings.QUALITY_PROBE_SECONDS:
+            return False
+        # Counts as sampled now, so concurrent requests don't all probe while this one runs
+        self.sampled_at[key] = now
+        return True
+
+    def _chose(self, task: str, tier: str, model: str, reason: Optional[str]) -> Tuple[str, str, Optional[str]]:
+        counts = self.chosen.setdefault(task, dict.fromkeys(QUALITY_TIERS, 0))
+        counts[tier] += 1
+        if reason:
+            logger.info("Quality tier degraded", task=task, tier=tier, model=model, reason=reason)
+        return tier, model, reason
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.QUALITY_TIERS,
+            "chosen": self.chosen,
+            "probes": self.probes,
+            "latency_ms": {f"{task}/{tier}/{model}": round(ms) for (task, tier, model), ms in self.latency_ms.items()},
+            "queue_wait_ms": {model: round(self.queue_wait_ms(model)) for model in self.model_latency_ms},
+            "upgrades": quality_upgrades.stats()
+        }
+
+quality_planner = QualityPlanner()
+
+class QualityUpgrades:
+    """Re-runs degraded extractions at full quality once the LLM has spare capacity
+
+    Upgrades wait in a bounded queue and run one at a time, each only when no
+    generation is waiting for a slot, so they never compete with live
+    requests. They run in the context of the request that queued them
+    (tenant, trace) with the tier forced to "full".
+    """
+
+    def __init__(self, max_pending: Optional[int] = None):
+        self.max_pending = settings.QUALITY_UPGRADE_QUEUE_SIZE if max_pending is None else max_pending
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        if self.max_pending > 0 and self._worker is None:
+            self.queue = asyncio.Queue(self.max_pending)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the worker; upgrades still queued are dropped, their degraded results stand"""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    def schedule(self, job_id: Optional[str], upgrade: Callable[[], Awaitable[Any]]) -> bool:
+        """Queue `upgrade` to run at full quality later; False if upgrades are off or the queue is full"""
+        if self.queue is None:
+            return False
+        try:
+            self.queue.put_nowait((job_id, upgrade, contextvars.copy_context()))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            job_id, upgrade, context = await self.queue.get()
+            while not generation_batcher.idle():
+                await asyncio.sleep(settings.QUALITY_UPGRADE_POLL_SECONDS)
+
+            context.run(forced_tier.set, "full")
+            try:
+                await asyncio.get_running_loop().create_task(upgrade(), context=context)
+                self.completed += 1
+                logger.info("Quality upgrade completed", job_id=job_id)
+            except Exception as e:
+                self.failed += 1
+                logger.warning("Quality upgrade failed", job_id=job_id, error=str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.queue.qsize() if self.queue is not None else 0,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped
+        }
+
+quality_upgrades = QualityUpgrades()
+
+class DeadlineMiddleware:
+    """Sets the request deadline from X-Request-Timeout-Ms, the caller's own timeout for this request"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timeout_ms = Headers(scope=scope).get(DEADLINE_HEADER)
+        deadline = None
+        if timeout_ms:
+            try:
+                deadline = time.monotonic() + float(timeout_ms) / 1000
+            except ValueError:
+                logger.warning("Ignoring malformed request timeout", timeout_ms=timeout_ms[:40])
+
+        token = request_deadline.set(deadline)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_deadline.reset(token)
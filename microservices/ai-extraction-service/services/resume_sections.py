@@ -0,0 +1,64 @@
+import hashlib
+import re
+from typing import List, Tuple
+
+# Canonical section name -> header spellings seen in resumes
+SECTION_HEADERS = {
+    "summary": ("summary", "professional summary", "profile", "objective", "about me"),
+    "experience": ("experience", "work experience", "professional experience", "employment", "employment history", "work history"),
+    "education": ("education", "academic background", "qualifications"),
+    "skills": ("skills", "technical skills", "core competencies", "technologies"),
+    "projects": ("projects", "personal projects", "key projects"),
+    "certifications": ("certifications", "certificates", "licenses"),
+}
+
+_HEADER_LOOKUP = {
+    spelling: section
+    for section, spellings in SECTION_HEADERS.items()
+    for spelling in spellings
+}
+
+_HEADER_CLEANUP = re.compile(r'[^a-z ]+')
+
+def match_section_header(line: str) -> str:
+    """Return the canonical section name if the line is a section header, else ''"""
+    stripped = line.strip()
+    if not stripped or len(stripped) > 40:
+        return ""
+    normalized = " ".join(_HEADER_CLEANUP.sub(" ", stripped.lower()).split())
+    return _HEADER_LOOKUP.get(normalized, "")
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """Split resume text into (section_name, body) pairs in document order
+
+    Text before the first recognised header is returned as the "header" section
+    (usually name and contact details). A resume without any recognised
+    headers comes back as a single "resume" section.
+    """
+    sections: List[Tuple[str, List[str]]] = []
+    current_name, current_lines = "header", []
+    seen = {}
+
+    for line in text.split("\n"):
+        section = match_section_header(line)
+        if section:
+            if current_lines:
+                sections.append((current_name, current_lines))
+            # Repeated headers (e.g. two "Projects" blocks) get distinct names
+            seen[section] = seen.get(section, 0) + 1
+            current_name = section if seen[section] == 1 else f"{section}_{seen[section]}"
+            current_lines = []
+        elif line.strip():
+            current_lines.append(line.strip())
+
+    if current_lines:
+        sections.append((current_name, current_lines))
+
+    if not seen:
+        return [("resume", "\n".join(line for _, lines in sections for line in lines))]
+    return [(name, "\n".join(lines)) for name, lines in sections]
+
+def content_hash(text: str) -> str:
+    """Stable hash of whitespace- and case-normalized text"""
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
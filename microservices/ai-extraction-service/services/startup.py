@@ -0,0 +1,79 @@
+import importlib
+import sys
+import time
+from typing import Dict, Any, Optional
+from types import ModuleType
+
+import structlog
+
+logger = structlog.get_logger()
+
+class StartupTimer:
+    """Records how long each startup phase and each lazily imported module took"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self._last_mark = self.started_at
+        self.phases: Dict[str, float] = {}
+        self.lazy_imports: Dict[str, float] = {}
+        self.ready_ms: Optional[float] = None
+
+    def mark(self, phase: str) -> None:
+        """Close the current phase under the given name"""
+        now = time.perf_counter()
+        self.phases[phase] = round((now - self._last_mark) * 1000, 2)
+        self._last_mark = now
+
+    def mark_ready(self) -> None:
+        """Record the total time until the app is ready to serve requests"""
+        self.mark("app_startup")
+        self.ready_ms = round((time.perf_counter() - self.started_at) * 1000, 2)
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the startup breakdown in milliseconds"""
+        return {
+            "phases_ms": dict(self.phases),
+            "lazy_imports_ms": dict(self.lazy_imports),
+            "ready_ms": self.ready_ms
+        }
+
+startup_timer = StartupTimer()
+
+def lazy_import(module_name: str) -> ModuleType:
+    """Import a heavy or optional module on first use and record its import cost"""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+    startup_timer.lazy_imports[module_name] = elapsed_ms
+    logger.info("Lazily imported module", module=module_name, import_ms=elapsed_ms)
+    return module
+
+def preload_for_fork() -> None:
+    """Import parsers and keyword tables up front so forked workers share them copy-on-write"""
+    for module_name in ("PyPDF2", "docx", "services.pdf_extractor", "services.ai_processor", "services.content_enhancer"):
+        lazy_import(module_name)
+
+def configure_logging() -> None:
+    """Configure structlog for JSON output"""
+    structlog.configure(
+        processors=[
+            structlog.contextvars.merge_contextvars,  # trace_id of the request being served
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.processors.UnicodeDecoder(),
+            structlog.processors.JSONRenderer()
+        ],
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
@@ -0,0 +1,173 @@
+import contextvars
+import re
+import time
+from typing import Any, Dict, Optional
+
+import structlog
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import settings
+from services.tracing import annotate
+
+logger = structlog.get_logger()
+
+TENANT_HEADER = "X-Tenant-Id"
+DEFAULT_TENANT = "default"
+TENANT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+# Rate quotas allow bursts of this many seconds' worth of generations
+RATE_BURST_SECONDS = 10
+# Metric label and stats key for tenants with no TENANT_* settings, so arbitrary header values can't add entries
+OTHER_TENANT_LABEL = "other"
+# Per-tenant scheduling state is pruned of entries equivalent to a fresh tenant once it holds this many
+TENANT_STATE_PRUNE_SIZE = 1024
+
+current_tenant: contextvars.ContextVar[str] = contextvars.ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+def parse_tenant_map(value: str) -> Dict[str, float]:
+    """"acme=3,bulk=0.5" -> {"acme": 3.0, "bulk": 0.5}"""
+    result = {}
+    for part in value.split(","):
+        tenant, _, number = part.partition("=")
+        if tenant.strip() and number.strip():
+            result[tenant.strip()] = float(number)
+    return result
+
+class TenantQuotas:
+    """Per-tenant scheduling weight, LLM concurrency limit and generation rate limit, for this worker
+
+    Limits come from TENANT_* settings: a per-tenant map with a default for
+    tenants not listed; 0 means unlimited. Also keeps queue time per tenant
+    (tenants without settings pooled as "other") so backfills and
+    interactive traffic can be told apart.
+    """
+
+    def __init__(self):
+        self.weights = parse_tenant_map(settings.TENANT_WEIGHTS)
+        self.max_concurrency = parse_tenant_map(settings.TENANT_MAX_CONCURRENCY)
+        self.rates = parse_tenant_map(settings.TENANT_RATE_PER_MINUTE)
+        self.in_flight: Dict[str, int] = {}
+        self._buckets: Dict[str, list] = {}  # tenant -> [tokens, refilled_at]
+        self.queue_stats: Dict[str, Dict[str, float]] = {}
+        self._histogram = None
+
+    def metric_label(self, tenant: str) -> str:
+        """The tenant in metrics and stats: itself if it has TENANT_* settings or is the default, else OTHER_TENANT_LABEL"""
+        if tenant == DEFAULT_TENANT or tenant in self.weights or tenant in self.max_concurrency or tenant in self.rates:
+            return tenant
+        return OTHER_TENANT_LABEL
+
+    def weight(self, tenant: str) -> float:
+        return self.weights.get(tenant, 1.0) or 1.0
+
+    def _rate_per_second(self, tenant: str) -> float:
+        return self.rates.get(tenant, settings.TENANT_DEFAULT_RATE_PER_MINUTE) / 60
+
+    def _refill(self, tenant: str) -> Optional[list]:
+        rate = self._rate_per_second(tenant)
+        if rate <= 0:
+            return None
+        capacity = max(1.0, rate * RATE_BURST_SECONDS)
+        now = time.monotonic()
+        if tenant not in self._buckets and len(self._buckets) >= TENANT_STATE_PRUNE_SIZE:
+            self._prune_buckets(now)
+        bucket = self._buckets.setdefault(tenant, [capacity, now])
+        bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        return bucket
+
+    def _prune_buckets(self, now: float) -> None:
+        """Drop buckets that have refilled completely; a new one starts full anyway"""
+        for tenant, (tokens, refilled_at) in list(self._buckets.items()):
+            rate = self._rate_per_second(tenant)
+            if rate <= 0 or tokens + (now - refilled_at) * rate >= max(1.0, rate * RATE_BURST_SECONDS):
+                del self._buckets[tenant]
+
+    def try_acquire(self, tenant: str) -> Optional[str]:
+        """Take a generation slot for the tenant; returns why not ("concurrency" or "rate"), or None on success"""
+        limit = self.max_concurrency.get(tenant, settings.TENANT_DEFAULT_MAX_CONCURRENCY)
+        if limit and self.in_flight.get(tenant, 0) >= limit:
+            return "concurrency"
+        bucket = self._refill(tenant)
+        if bucket is not None:
+            if bucket[0] < 1:
+                return "rate"
+            bucket[0] -= 1
+        self.in_flight[tenant] = self.in_flight.get(tenant, 0) + 1
+        return None
+
+    def release(self, tenant: str) -> None:
+        self.in_flight[tenant] -= 1
+        if not self.in_flight[tenant]:
+            del self.in_flight[tenant]
+
+    def retry_after(self, tenant: str) -> float:
+        """Seconds until the tenant's rate quota admits another generation"""
+        bucket = self._refill(tenant)
+        if bucket is None or bucket[0] >= 1:
+            return 0.0
+        return (1 - bucket[0]) / self._rate_per_second(tenant)
+
+    def record_queue_time(self, tenant: str, model: str, seconds: float) -> None:
+        label = self.metric_label(tenant)
+        stats = self.queue_stats.setdefault(label, {"generations": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0})
+        stats["generations"] += 1
+        stats["total_wait_ms"] += seconds * 1000
+        stats["max_wait_ms"] = max(stats["max_wait_ms"], seconds * 1000)
+
+        if self._histogram is None:
+            from services.startup import lazy_import
+            prometheus_client = lazy_import("prometheus_client")
+            self._histogram = prometheus_client.Histogram(
+                "llm_queue_wait_seconds",
+                "Time generations waited for an LLM slot, by tenant (tenants without TENANT_* settings as other)",
+                ["tenant", "model"],
+                buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+            )
+        self._histogram.labels(tenant=label, model=model).observe(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        in_flight: Dict[str, int] = {}
+        for tenant, count in self.in_flight.items():
+            label = self.metric_label(tenant)
+            in_flight[label] = in_flight.get(label, 0) + count
+        return {
+            tenant: {
+                "weight": self.weight(tenant),
+                "in_flight": in_flight.get(tenant, 0),
+                "generations": int(stats["generations"]),
+                "mean_wait_ms": round(stats["total_wait_ms"] / stats["generations"], 2),
+                "max_wait_ms": round(stats["max_wait_ms"], 2)
+            }
+            for tenant, stats in self.queue_stats.items()
+        }
+
+tenant_quotas = TenantQuotas()
+
+class TenantMiddleware:
+    """Sets the current tenant from the X-Tenant-Id header (the Rails app's Apartment tenant)
+
+    Requests without one, or with a malformed one, run as the "default" tenant.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tenant = Headers(scope=scope).get(TENANT_HEADER) or DEFAULT_TENANT
+        if not TENANT_ID_PATTERN.match(tenant):
+            logger.warning("Ignoring malformed tenant id", tenant=tenant[:80])
+            tenant = DEFAULT_TENANT
+
+        token = current_tenant.set(tenant)
+        log_tokens = structlog.contextvars.bind_contextvars(tenant=tenant)
+        annotate(tenant=tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            structlog.contextvars.reset_contextvars(**log_tokens)
+            current_tenant.reset(token)
@@ -0,0 +1,326 @@
+import asyncio
+import contextvars
+import json
+import os
+import random
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+import structlog
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+from services.startup import lazy_import
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = structlog.get_logger()
+
+TRACEPARENT_HEADER = "traceparent"
+TRACEPARENT_PATTERN = re.compile(r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, parent span_id, sampled) from a W3C traceparent header, or None if absent or malformed"""
+    match = TRACEPARENT_PATTERN.match((value or "").strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    # All-zero ids are invalid, and version ff is forbidden
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+class Span:
+    """One timed stage of a request, with attributes; ended by Tracer.span or end()"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled", "attributes", "status", "start_ns", "end_ns", "_tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str], sampled: bool, attributes: Dict[str, Any]):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "error"
+        self.attributes["error"] = str(error) or type(error).__name__
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self._tracer._finish(self)
+
+    def to_record(self) -> Dict[str, Any]:
+        """The span as one line of TRACE_FILE"""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 2),
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 2 if "http.method" in self.attributes else 1,  # server / internal
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+            "status": {"code": 2 if self.status == "error" else 1}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+class Tracer:
+    """Records request spans and exports them to TRACE_FILE and/or an OTLP/HTTP collector
+
+    Context follows the current asyncio task, so a span opened in an endpoint
+    is the parent of spans opened in the services it awaits. Traces continue
+    the caller's W3C traceparent (e.g. from the Rails ResumeProcessingJob);
+    sampling is decided once per trace. Finished spans are buffered and
+    exported every TRACE_EXPORT_INTERVAL seconds, off the request path.
+    """
+
+    def __init__(self, file_path: Optional[str] = None, endpoint: Optional[str] = None, sample_ratio: Optional[float] = None):
+        self.file_path = file_path if file_path is not None else settings.TRACE_FILE
+        self.endpoint = endpoint if endpoint is not None else settings.TRACE_OTLP_ENDPOINT
+        self.sample_ratio = settings.TRACE_SAMPLE_RATIO if sample_ratio is None else sample_ratio
+        self.buffer: deque = deque(maxlen=settings.TRACE_BUFFER_SIZE)
+        self.dropped = 0
+        self._flusher: Optional[asyncio.Task] = None
+        self._client: Optional["httpx.AsyncClient"] = None
+
+    @property
+    def exporting(self) -> bool:
+        return bool(self.file_path or self.endpoint)
+
+    def start_span(self, name: str, parent: Optional[Any] = None, **attributes: Any) -> Span:
+        """Start a span under `parent` (a Span or traceparent string), else the current span, else a new trace"""
+        if parent is None:
+            parent = _current_span.get()
+        if isinstance(parent, str):
+            parent = parse_traceparent(parent)
+            if parent is not None:
+                return Span(self, name, parent[0], parent[1], parent[2], attributes)
+        elif parent is not None:
+            return Span(self, name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+        sampled = self.exporting and random.random() < self.sample_ratio
+        return Span(self, name, f"{random.getrandbits(128):032x}", None, sampled, attributes)
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Any] = None, **attributes: Any) -> Iterator[Span]:
+        """Run the block as a span that is current for everything it awaits"""
+        span = self.start_span(name, parent, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def headers(self) -> Dict[str, str]:
+        """traceparent header for an outgoing request, continuing the current trace"""
+        span = _current_span.get()
+        return {TRACEPARENT_HEADER: span.traceparent} if span is not None else {}
+
+    def _finish(self, span: Span) -> None:
+        if not (span.sampled and self.exporting):
+            return
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(span)
+
+    async def start(self) -> None:
+        if self.exporting and self._flusher is None:
+            self._client = lazy_import("httpx").AsyncClient(timeout=10) if self.endpoint else None
+            self._flusher = asyncio.create_task(self._flush_periodically())
+            logger.info("Trace export started", file=self.file_path or None, endpoint=self.endpoint or None, sample_ratio=self.sample_ratio)
+
+    async def stop(self) -> None:
+        """Stop the flusher and export whatever is still buffered"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.TRACE_EXPORT_INTERVAL)
+            await self.flush()
+
+    async def flush(self) -> None:
+        spans: List[Span] = []
+        while self.buffer:
+            spans.append(self.buffer.popleft())
+        if not spans:
+            return
+
+        if self.file_path:
+            try:
+                await asyncio.to_thread(self._write_file, spans)
+            except OSError as e:
+                logger.warning("Trace file export failed", error=str(e), spans=len(spans))
+        if self.endpoint and self._client is not None:
+            try:
+                response = await self._client.post(self.endpoint, json=self._otlp_payload(spans))
+                if response.status_code >= 300:
+                    raise Exception(f"collector returned {response.status_code}")
+            except Exception as e:
+                logger.warning("Trace collector export failed", error=str(e), spans=len(spans))
+
+    def _write_file(self, spans: List[Span]) -> None:
+        data = "".join(json.dumps(span.to_record(), default=str) + "\n" for span in spans).encode()
+        # One O_APPEND write per flush keeps workers sharing the file from interleaving lines
+        fd = os.open(self.file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def _otlp_payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    _otlp_attribute("service.name", settings.SERVICE_NAME),
+                    _otlp_attribute("service.version", settings.SERVICE_VERSION),
+                    _otlp_attribute("process.pid", os.getpid())
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": settings.SERVICE_NAME},
+                    "spans": [span.to_otlp() for span in spans]
+                }]
+            }]
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "file": self.file_path or None,
+            "endpoint": self.endpoint or None,
+            "sample_ratio": self.sample_ratio,
+            "buffered": len(self.buffer),
+            "dropped": self.dropped
+        }
+
+tracer = Tracer()
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def annotate(**attributes: Any) -> None:
+    """Add attributes (e.g. fallback_reason) to the current span, if any"""
+    span = _current_span.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+def generation_attributes(result: Dict[str, Any], elapsed_ms: float) -> Dict[str, Any]:
+    """Span attributes from the timing fields of an Ollama /api/generate response
+
+    `llm.wait_ms` is what the client saw beyond Ollama's own total: time
+    queued behind other generations plus the network.
+    """
+    attributes = {"llm.elapsed_ms": round(elapsed_ms, 2)}
+    if result.get("prompt_eval_count") is not None:
+        attributes["llm.prompt_tokens"] = result["prompt_eval_count"]
+    if result.get("eval_count") is not None:
+        attributes["llm.output_tokens"] = result["eval_count"]
+    for field in ("load_duration", "prompt_eval_duration", "eval_duration"):
+        if result.get(field) is not None:
+            attributes[f"llm.{field[:-len('_duration')]}_ms"] = round(result[field] / 1e6, 2)
+    if result.get("total_duration"):
+        attributes["llm.wait_ms"] = round(max(0.0, elapsed_ms - result["total_duration"] / 1e6), 2)
+    return attributes
+
+class TracingMiddleware:
+    """Opens the root span of each HTTP request, continuing the caller's traceparent
+
+    The span ends when the response body has been sent; background tasks the
+    request scheduled (callbacks, indexing) still record their spans in the
+    same trace. The response carries a traceparent naming the root span, and
+    log lines written during the request carry its trace_id.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        route = scope["path"]
+        span = tracer.start_span(
+            f"{scope['method']} {route}",
+            headers.get(TRACEPARENT_HEADER),
+            **{"http.method": scope["method"], "http.target": route, "http.request_bytes": int(headers.get("content-length") or 0)}
+        )
+        response_bytes = 0
+
+        async def send_traced(message: Message) -> None:
+            nonlocal response_bytes
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[TRACEPARENT_HEADER] = span.traceparent
+                span.attributes["http.status_code"] = message["status"]
+                if message["status"] >= 500:
+                    span.status = "error"
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    span.attributes["http.response_bytes"] = response_bytes
+                    span.end()
+            await send(message)
+
+        token = _current_span.set(span)
+        log_tokens = structlog.contextvars.bind_contextvars(trace_id=span.trace_id)
+        try:
+            await self.app(scope, receive, send_traced)
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            structlog.contextvars.reset_contextvars(**log_tokens)
+            _current_span.reset(token)
+            span.end()
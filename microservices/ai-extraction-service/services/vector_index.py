@@ -0,0 +1,216 @@
+import asyncio
+import fcntl
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from services.embeddings import EmbeddingClient, resume_chunks, job_requirements
+from services.startup import lazy_import
+
+logger = structlog.get_logger()
+
+# Rows scored per matrix product; bounds the temporary score buffer on large indexes
+QUERY_BLOCK_ROWS = 65536
+
+class VectorIndex:
+    """Append-only, memory-mapped float32 vector index with an id map
+
+    Layout in `directory`:
+      meta.json     {"dim": ..., "model": ...}
+      vectors.f32   row-major float32 matrix, one L2-normalized row per entry
+      ids.jsonl     one {"id": ..., "meta": {...}} line per row
+
+    Re-adding an id appends a new row that supersedes the old one. Appends
+    are serialized with an flock so several worker processes can share one
+    index; each process picks up rows written by others on its next query.
+    Methods block on file I/O and are thread-safe, so async callers run them
+    with asyncio.to_thread.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._ids_path = os.path.join(directory, "ids.jsonl")
+        self._lock_path = os.path.join(directory, ".lock")
+
+        self.dim: Optional[int] = None
+        self.model: Optional[str] = None
+        self._matrix = None
+        self._rows: List[Dict[str, Any]] = []
+        self._latest_row: Dict[str, int] = {}
+        self._ids_offset = 0
+        self._lock = threading.RLock()
+
+        # Rows are mapped on first use (see MatchIndex.load); the metadata is enough to check the model
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            self.dim, self.model = meta["dim"], meta.get("model")
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._latest_row)
+
+    def add(self, item_id: str, vector, meta: Optional[Dict[str, Any]] = None, model: Optional[str] = None) -> None:
+        """Append (or replace) the vector stored for item_id"""
+        np = lazy_import("numpy")
+        row = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(row)
+        if norm:
+            row = row / norm
+
+        with self._lock, open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if self.dim is None:
+                    self.dim, self.model = int(row.shape[0]), model
+                    with open(self._meta_path, "w") as f:
+                        json.dump({"dim": self.dim, "model": self.model}, f)
+                elif row.shape[0] != self.dim:
+                    raise ValueError(f"Vector has {row.shape[0]} dimensions, index expects {self.dim}")
+
+                # Vectors first: a row without an id line is dropped (the file is cut
+                # back to the id count here), never the reverse
+                self._refresh()
+                with open(self._vectors_path, "ab") as f:
+                    f.truncate(len(self._rows) * self.dim * 4)
+                    f.write(row.tobytes())
+                with open(self._ids_path, "a") as f:
+                    f.write(json.dumps({"id": item_id, "meta": meta or {}}) + "\n")
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def get(self, item_id: str):
+        """Stored (normalized) vector for item_id, or None"""
+        with self._lock:
+            self._refresh()
+            row = self._latest_row.get(item_id)
+            return None if row is None else self._matrix[row]
+
+    def search(self, query, k: int = 10, exclude_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Top-k entries by cosine similarity to the query vector"""
+        np = lazy_import("numpy")
+        with self._lock:
+            self._refresh()
+            return self._search(np, query, k, exclude_id)
+
+    def _search(self, np, query, k: int, exclude_id: Optional[str]) -> List[Dict[str, Any]]:
+        if self._matrix is None or not self._latest_row:
+            return []
+
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        # Superseded and id-less rows never make it into the results
+        live = np.zeros(len(self._rows), dtype=bool)
+        live[list(self._latest_row.values())] = True
+        if exclude_id is not None and exclude_id in self._latest_row:
+            live[self._latest_row[exclude_id]] = False
+
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for start in range(0, len(self._rows), QUERY_BLOCK_ROWS):
+            stop = min(start + QUERY_BLOCK_ROWS, len(self._rows))
+            scores = self._matrix[start:stop] @ query
+            scores[~live[start:stop]] = -np.inf
+            take = min(k, stop - start)
+            top = np.argpartition(-scores, take - 1)[:take]
+            best_scores = np.concatenate([best_scores, scores[top]])
+            best_rows = np.concatenate([best_rows, top + start])
+
+        order = np.argsort(-best_scores)[:k]
+        return [
+            {"id": self._rows[row]["id"], "score": round(float(score), 4), "meta": self._rows[row]["meta"]}
+            for row, score in zip(best_rows[order], best_scores[order])
+            if np.isfinite(score)
+        ]
+
+    def _refresh(self) -> None:
+        """Map rows appended since the last call (by this or another process)"""
+        if self.dim is None:
+            if not os.path.exists(self._meta_path):
+                return
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            self.dim, self.model = meta["dim"], meta.get("model")
+
+        if not os.path.exists(self._ids_path):
+            return
+
+        with open(self._ids_path) as f:
+            f.seek(self._ids_offset)
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # partially written; picked up next time
+                entry = json.loads(line)
+                self._latest_row[entry["id"]] = len(self._rows)
+                self._rows.append(entry)
+                self._ids_offset += len(line.encode("utf-8"))
+
+        if self._rows and (self._matrix is None or self._matrix.shape[0] != len(self._rows)):
+            np = lazy_import("numpy")
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._rows), self.dim))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            return {"entries": len(self._latest_row), "rows": len(self._rows), "dim": self.dim, "model": self.model}
+
+class MatchIndex:
+    """Resume and job-description indexes side by side, for top-k retrieval in either direction
+
+    Each document is stored as the mean of its chunk embeddings (resume
+    sections, JD requirement lines), so a search embeds only the query -
+    or nothing at all when the query is already indexed.
+    """
+
+    def __init__(self, directory: str, embedder: Optional[EmbeddingClient] = None):
+        self.embedder = embedder or EmbeddingClient()
+        self.indexes = {
+            "resume": VectorIndex(os.path.join(directory, "resumes")),
+            "job": VectorIndex(os.path.join(directory, "jobs")),
+        }
+        for kind, index in self.indexes.items():
+            if index.model and index.model != self.embedder.model:
+                logger.warning("Vector index was built with a different embedding model", kind=kind, index_model=index.model, embedding_model=self.embedder.model)
+
+    async def load(self) -> None:
+        """Read the id maps written so far, off the event loop"""
+        counts = {kind: await asyncio.to_thread(len, index) for kind, index in self.indexes.items()}
+        logger.info("Vector index loaded", **counts)
+
+    async def count(self, kind: str) -> int:
+        return await asyncio.to_thread(len, self.indexes[kind])
+
+    async def document_vector(self, kind: str, content: str):
+        chunks = [chunk["text"] for chunk in resume_chunks(content)] if kind == "resume" else job_requirements(content)
+        if not chunks:
+            raise ValueError(f"No {kind} content to embed")
+        return (await self.embedder.embed(chunks)).mean(axis=0)
+
+    async def add(self, kind: str, item_id: str, content: str, meta: Optional[Dict[str, Any]] = None) -> None:
+        vector = await self.document_vector(kind, content)
+        await asyncio.to_thread(self.indexes[kind].add, item_id, vector, meta, self.embedder.model)
+
+    async def search(self, kind: str, query_kind: str, k: int, content: Optional[str] = None, query_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Top-k `kind` documents for a `query_kind` document given as text or by its indexed id"""
+        if query_id is not None:
+            vector = await asyncio.to_thread(self.indexes[query_kind].get, query_id)
+            if vector is None:
+                raise KeyError(f"{query_kind} '{query_id}' is not indexed")
+        elif content:
+            vector = await self.document_vector(query_kind, content)
+        else:
+            raise ValueError("Provide either query content or a query id")
+        return await asyncio.to_thread(self.indexes[kind].search, vector, k)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {kind: await asyncio.to_thread(index.stats) for kind, index in self.indexes.items()}
@@ -0,0 +1,232 @@
+import asyncio
+import fcntl
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import random
+import socket
+import time
+import uuid
+from typing import TYPE_CHECKING, Any, Dict, Optional
+from urllib.parse import urlparse
+
+import structlog
+
+from config import settings
+from services.startup import lazy_import
+from services.tracing import TRACEPARENT_HEADER, current_span, tracer
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = structlog.get_logger()
+
+SIGNATURE_HEADER = "X-Signature"
+TIMESTAMP_HEADER = "X-Signature-Timestamp"
+DELIVERY_HEADER = "X-Delivery-Id"
+
+def sign_payload(body: bytes, timestamp: str, secret: Optional[str] = None) -> str:
+    """HMAC-SHA256 over "<timestamp>.<body>", formatted as "sha256=<hex>"
+
+    Receivers recompute it with the shared WEBHOOK_SECRET and should reject
+    stale timestamps to stop replays.
+    """
+    secret = settings.WEBHOOK_SECRET if secret is None else secret
+    digest = hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+class CallbackNotAllowed(Exception):
+    """The callback URL may not receive webhooks"""
+
+async def check_callback_url(callback_url: str) -> None:
+    """Raise CallbackNotAllowed unless webhooks may be POSTed to `callback_url`
+
+    Hosts listed in WEBHOOK_ALLOWED_HOSTS are trusted as configured, and with
+    a list set no other host is. Without one, the host must resolve only to
+    public addresses, so callers can't point the service at loopback,
+    link-local (cloud metadata) or private-network endpoints. Raises OSError
+    if the host can't be resolved.
+    """
+    parsed = urlparse(callback_url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise CallbackNotAllowed("callback_url must be an absolute http(s) URL")
+    if settings.WEBHOOK_ALLOWED_HOSTS:
+        if parsed.hostname not in settings.WEBHOOK_ALLOWED_HOSTS:
+            raise CallbackNotAllowed(f"callback_url host '{parsed.hostname}' is not allowed")
+        return
+
+    infos = await asyncio.get_running_loop().getaddrinfo(parsed.hostname, parsed.port or 0, type=socket.SOCK_STREAM)
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise CallbackNotAllowed(f"callback_url host '{parsed.hostname}' resolves to a non-public address")
+
+class WebhookDispatcher:
+    """Delivers job results to callback URLs from a local, file-backed queue
+
+    Each pending delivery is a JSON file in WEBHOOK_SPOOL_DIR, flock-ed by the
+    process that owns it. Deliveries are retried with exponential backoff and
+    jitter; files whose owner died (lock released) are picked up by the next
+    process to start, so results survive restarts.
+    """
+
+    def __init__(self, spool_dir: Optional[str] = None):
+        self.spool_dir = spool_dir or settings.WEBHOOK_SPOOL_DIR
+        self.failed_dir = os.path.join(self.spool_dir, "failed")
+        os.makedirs(self.failed_dir, exist_ok=True)
+        self.queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._client: Optional["httpx.AsyncClient"] = None
+
+    async def start(self) -> None:
+        if not settings.WEBHOOK_SECRET:
+            logger.error("WEBHOOK_SECRET is not set; requests with a callback_url will be refused")
+        self.queue = asyncio.Queue()
+        self._client = lazy_import("httpx").AsyncClient(timeout=settings.WEBHOOK_TIMEOUT)
+        recovered = self._recover_orphans()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(settings.WEBHOOK_CONCURRENCY)]
+        logger.info("Webhook dispatcher started", spool_dir=self.spool_dir, recovered=recovered)
+
+    async def stop(self) -> None:
+        """Stop delivering; undelivered files stay spooled for the next process"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._client is not None:
+            await self._client.aclose()
+
+    def enqueue(self, callback_url: str, event: str, payload: Dict[str, Any]) -> str:
+        """Spool a delivery and queue it; returns the delivery id"""
+        delivery_id = str(uuid.uuid4())
+        delivery = {
+            "id": delivery_id,
+            "callback_url": callback_url,
+            "event": event,
+            "payload": payload,
+            "attempts": 0,
+            "created_at": time.time(),
+            # Deliveries run outside the request, so carry its trace along
+            "traceparent": current_span().traceparent if current_span() else None
+        }
+        path = os.path.join(self.spool_dir, f"{delivery_id}.json")
+
+        # Lock before the file becomes visible under its final name, so no
+        # other process can mistake it for an orphan
+        tmp_path = path + ".tmp"
+        handle = open(tmp_path, "w")
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        json.dump(delivery, handle, default=str)
+        handle.flush()
+        os.replace(tmp_path, path)
+
+        self.queue.put_nowait((path, handle, delivery))
+        logger.info("Webhook queued", delivery_id=delivery_id, webhook_event=event, callback_url=callback_url)
+        return delivery_id
+
+    def _recover_orphans(self) -> int:
+        recovered = 0
+        for name in os.listdir(self.spool_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            try:
+                handle = open(path, "r+")
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                delivery = json.load(handle)
+            except (BlockingIOError, ValueError):
+                handle.close()  # owned by a live process, or half-written
+                continue
+            self.queue.put_nowait((path, handle, delivery))
+            recovered += 1
+        return recovered
+
+    async def _worker(self) -> None:
+        while True:
+            path, handle, delivery = await self.queue.get()
+            try:
+                await self._deliver(path, handle, delivery)
+            except Exception as e:
+                logger.error("Webhook worker error", delivery_id=delivery["id"], error=str(e))
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, path: str, handle, delivery: Dict[str, Any]) -> None:
+        # Checked again at delivery: the secret may have been unset since, or the host re-pointed
+        try:
+            if not settings.WEBHOOK_SECRET:
+                raise CallbackNotAllowed("WEBHOOK_SECRET is not set")
+            await check_callback_url(delivery["callback_url"])
+        except CallbackNotAllowed as e:
+            self._abandon(path, handle, delivery, None, str(e))
+            return
+        except OSError as e:
+            # Resolution failures are usually transient; retried like a network error
+            delivery["attempts"] += 1
+            self._retry_or_abandon(path, handle, delivery, None, f"callback host lookup failed: {e}")
+            return
+
+        body = json.dumps(
+            {"delivery_id": delivery["id"], "event": delivery["event"], **delivery["payload"]},
+            default=str
+        ).encode()
+
+        delivery["attempts"] += 1
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            SIGNATURE_HEADER: sign_payload(body, timestamp),
+            TIMESTAMP_HEADER: timestamp,
+            DELIVERY_HEADER: delivery["id"]
+        }
+        with tracer.span("webhook.deliver", delivery.get("traceparent"), delivery_id=delivery["id"], attempt=delivery["attempts"]) as span:
+            headers[TRACEPARENT_HEADER] = span.traceparent
+            try:
+                response = await self._client.post(delivery["callback_url"], content=body, headers=headers)
+                status, error = response.status_code, None
+            except lazy_import("httpx").HTTPError as e:
+                status, error = None, str(e) or type(e).__name__
+            span.set_attributes(status_code=status, error=error)
+
+        if status is not None and 200 <= status < 300:
+            os.unlink(path)
+            handle.close()
+            logger.info("Webhook delivered", delivery_id=delivery["id"], attempts=delivery["attempts"], status=status)
+            return
+
+        self._retry_or_abandon(path, handle, delivery, status, error)
+
+    def _retry_or_abandon(self, path: str, handle, delivery: Dict[str, Any], status: Optional[int], error: Optional[str]) -> None:
+        # Client errors other than throttling won't succeed on retry
+        retryable = status is None or status >= 500 or status in (408, 429)
+        if not retryable or delivery["attempts"] >= settings.WEBHOOK_MAX_ATTEMPTS:
+            self._abandon(path, handle, delivery, status, error)
+            return
+
+        delay = min(settings.WEBHOOK_BACKOFF_MAX, settings.WEBHOOK_BACKOFF_BASE * 2 ** (delivery["attempts"] - 1))
+        delay *= random.uniform(0.5, 1.0)
+        logger.warning(
+            "Webhook delivery failed, retrying",
+            delivery_id=delivery["id"], attempts=delivery["attempts"], status=status, error=error, retry_in=round(delay, 1)
+        )
+        handle.seek(0)
+        handle.truncate()
+        json.dump(delivery, handle, default=str)
+        handle.flush()
+        # Re-queue after the backoff instead of sleeping, so one dead receiver doesn't hold a worker
+        asyncio.get_running_loop().call_later(delay, self.queue.put_nowait, (path, handle, delivery))
+
+    def _abandon(self, path: str, handle, delivery: Dict[str, Any], status: Optional[int], error: Optional[str]) -> None:
+        os.replace(path, os.path.join(self.failed_dir, os.path.basename(path)))
+        handle.close()
+        logger.error(
+            "Webhook delivery abandoned",
+            delivery_id=delivery["id"], attempts=delivery["attempts"], status=status, error=error
+        )